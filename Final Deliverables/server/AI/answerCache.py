@@ -0,0 +1,182 @@
+"""Reuse chat answers for near-duplicate single-turn questions.
+
+Questions are normalized (lowercase, punctuation and filler words removed,
+plural 's' stripped) and compared as TF-IDF vectors of words and word pairs.
+A cached answer is reused only for users in the same profile bucket (gender,
+age and weight bands, activity level, diet, goal, allergies), so figures such
+as grams of protein carry over only between similar users, and only when the cosine similarity reaches
+``ANSWER_CACHE_THRESHOLD``. Entries expire after ``ANSWER_CACHE_TTL``
+seconds and the least recently used ones are evicted beyond
+``ANSWER_CACHE_SIZE``.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, Counter
+
+from AI.planCache import normalize_allergies, band
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.9))
+
+AGE_BAND = 10
+WEIGHT_BAND = 10
+
+STOPWORDS = frozenset("""
+a an the i me my we our you your is are am was were be been do does did can could should would will
+to of in on for with and or but if so it its this that these those there what which how much many
+please tell know want need about just really any some get eat eating
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text):
+    """Lowercased content words with plural 's' stripped."""
+    words = []
+    for word in _WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def features(text):
+    """Word and adjacent word-pair counts of a normalized question."""
+    words = normalize(text)
+    return Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def profile_bucket(user_info):
+    user_info = user_info or {}
+    return '|'.join(str(part).strip().lower() for part in [
+        user_info.get('gender', ''),
+        band(user_info.get('age'), AGE_BAND),
+        band(user_info.get('weight'), WEIGHT_BAND),
+        user_info.get('activityLevel', ''),
+        user_info.get('dietPreference', ''),
+        user_info.get('goal', ''),
+        normalize_allergies(user_info.get('allergies', '')),
+    ])
+
+
+class _Entry:
+    __slots__ = ('bucket', 'question', 'vector', 'answer', 'latency', 'expires_at')
+
+    def __init__(self, bucket, question, vector, answer, latency, expires_at):
+        self.bucket = bucket
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.latency = latency
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    def __init__(self, maxsize=2048, ttl=24 * 3600, threshold=ANSWER_CACHE_THRESHOLD):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()
+        # bucket -> feature -> entry ids, and feature -> number of entries having it
+        self._index = {}
+        self._df = Counter()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.latency_saved = 0.0
+
+    def _idf(self, feature):
+        return math.log((1 + len(self._entries)) / (1 + self._df.get(feature, 0))) + 1
+
+    def _vector(self, counts):
+        vector = {feature: count * self._idf(feature) for feature, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {feature: v / norm for feature, v in vector.items()}
+
+    def lookup(self, question, user_info=None):
+        """``(answer, similarity)`` of the closest cached question, or ``(None, best_similarity)``."""
+        counts = features(question)
+        bucket = profile_bucket(user_info)
+        with self._lock:
+            index = self._index.get(bucket) or {}
+            # Accumulate cosine similarity over the postings of the query's features
+            scores = Counter()
+            for feature, weight in self._vector(counts).items():
+                for entry_id in index.get(feature, ()):
+                    scores[entry_id] += weight * self._entries[entry_id].vector[feature]
+
+            now = time.monotonic()
+            best, best_score = None, 0.0
+            for entry_id, score in scores.most_common():
+                if self._entries[entry_id].expires_at > now:
+                    best, best_score = entry_id, score
+                    break
+                self._remove(entry_id)
+
+            if best is not None and best_score >= self.threshold:
+                entry = self._entries[best]
+                self._entries.move_to_end(best)
+                self.hits += 1
+                self.latency_saved += entry.latency
+                return entry.answer, best_score
+            self.misses += 1
+            return None, best_score
+
+    def store(self, question, user_info, answer, latency=0.0):
+        """Cache ``answer``; ``latency`` is what generating it took, in seconds."""
+        counts = features(question)
+        if not counts or not answer:
+            return
+        bucket = profile_bucket(user_info)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            for feature in counts:
+                self._df[feature] += 1
+            # Weighted with the IDF at insert time; later inserts shift IDF only slightly
+            vector = self._vector(counts)
+            self._entries[entry_id] = _Entry(bucket, question, vector, answer, latency, time.monotonic() + self.ttl)
+            index = self._index.setdefault(bucket, {})
+            for feature in counts:
+                index.setdefault(feature, set()).add(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        index = self._index[entry.bucket]
+        for feature in entry.vector:
+            ids = index[feature]
+            ids.discard(entry_id)
+            if not ids:
+                del index[feature]
+            self._df[feature] -= 1
+            if not self._df[feature]:
+                del self._df[feature]
+        if not index:
+            del self._index[entry.bucket]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'latency_saved_seconds': round(self.latency_saved, 3),
+        }
+
+
+answer_cache = AnswerCache(
+    maxsize=int(os.getenv('ANSWER_CACHE_SIZE', 2048)),
+    ttl=int(os.getenv('ANSWER_CACHE_TTL', 24 * 3600)),
+)
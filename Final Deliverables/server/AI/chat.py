@@ -1,13 +1,17 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+import logging
+import time
+from AI.chatContext import ChatContext
+from AI.answerCache import answer_cache
+from AI.llm import get_model
+from metrics import span, record_llm_usage, llm_time_to_first_token
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-model = ChatGoogleGenerativeAI(model="gemini-1.5-flash")
+CHAT_MODEL = "gemini-1.5-flash"
 
-def get_ai_response(chat_history, user_info=None):
-    system_prompt = """
+ERROR_REPLY = "I'm sorry, I encountered an error while processing your request. Please try again later."
+
+SYSTEM_PROMPT = """
 You are Nutrition assistant, a helpful, evidence-based and friendly AI nutrition assistant. Your goal is to help users make informed and healthy dietary choices based on their individual needs, preferences, and goals.
 
 Use language that is clear, supportive, and encouraging. Always consider the user's profile before making suggestions.
@@ -23,33 +27,147 @@ Never make medical diagnoses or override professional medical advice. When in do
 If you are asked about anything other than health or nutrition, please gently reply back saying that you are a health assistant and please ask me about health related stuff
 """
 
-    if user_info:
-        health_context = f"""
-User Health Profile:
-- Age: {user_info.get('age', 'Not specified')}
-- Gender: {user_info.get('gender', 'Not specified')}
-- Height: {user_info.get('height', 'Not specified')} cm
-- Weight: {user_info.get('weight', 'Not specified')} kg
-- Diet Preference: {user_info.get('dietPreference', 'Not specified')}
-- Goal: {user_info.get('goal', 'Not specified')}
-- Activity Level: {user_info.get('activityLevel', 'Not specified')}
-- Allergies: {user_info.get('allergies', 'None')}
-
-When providing nutrition advice, always consider these details to give personalized recommendations.
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a nutrition assistant.
+Keep the user's questions, stated preferences, constraints and any advice or plans already given.
+Write at most 120 words of plain text.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
 """
-        system_prompt = health_context + system_prompt
 
-    messages = [SystemMessage(content=system_prompt)]
+def summarize_conversation(summary, messages):
+    transcript = "\n".join(f"{m['role']}: {m.get('content', '')}" for m in messages)
+    prompt = SUMMARY_PROMPT.format(summary=summary or '(none)', messages=transcript)
+    from langchain_core.messages import HumanMessage
+    with span('llm.summary'):
+        result = get_model(CHAT_MODEL).invoke([HumanMessage(content=prompt)])
+    record_llm_usage('summary', result)
+    return result.content
+
+chat_context = ChatContext(SYSTEM_PROMPT, summarize=summarize_conversation)
+
+def build_messages(chat_history, user_info=None, conversation_id=None):
+    """System prompt and profile first (identical on every turn), then recent turns."""
+    from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+
+    system_content, recent = chat_context.build(chat_history, user_info, conversation_id)
+    messages = [SystemMessage(content=system_content)]
     
-    for message in chat_history:
+    for message in recent:
         if message['role'] == 'user':
             messages.append(HumanMessage(content=message['content']))
         elif message['role'] == 'assistant':
             messages.append(AIMessage(content=message['content']))
 
+    return messages
+
+def single_turn_question(chat_history):
+    """The question if ``chat_history`` holds exactly one user message and it is the last one."""
+    messages = [m for m in chat_history if m.get('role') in ('user', 'assistant')]
+    user_messages = [m for m in messages if m['role'] == 'user']
+    if len(user_messages) == 1 and messages[-1] is user_messages[0]:
+        return user_messages[0].get('content', '')
+    return None
+
+def get_ai_response(chat_history, user_info=None, conversation_id=None):
+    question = single_turn_question(chat_history)
+    if question:
+        answer, _ = answer_cache.lookup(question, user_info)
+        if answer is not None:
+            return answer
+
+    messages = build_messages(chat_history, user_info, conversation_id)
+
     try:
-        result = model.invoke(messages)
+        started = time.perf_counter()
+        with span('llm.chat'):
+            result = get_model(CHAT_MODEL).invoke(messages)
+        record_llm_usage('chat', result)
+        if question:
+            answer_cache.store(question, user_info, result.content, time.perf_counter() - started)
         return result.content
     except Exception as e:
-        print(f"Error generating AI response: {str(e)}")
-        return "I'm sorry, I encountered an error while processing your request. Please try again later."
\ No newline at end of file
+        logger.exception(f"Error generating AI response: {str(e)}")
+        return ERROR_REPLY
+
+async def aget_ai_response(chat_history, user_info=None, conversation_id=None):
+    """``get_ai_response`` awaiting the model instead of blocking a thread."""
+    question = single_turn_question(chat_history)
+    if question:
+        answer, _ = answer_cache.lookup(question, user_info)
+        if answer is not None:
+            return answer
+
+    messages = build_messages(chat_history, user_info, conversation_id)
+
+    try:
+        started = time.perf_counter()
+        with span('llm.chat'):
+            result = await get_model(CHAT_MODEL).ainvoke(messages)
+        record_llm_usage('chat', result)
+        if question:
+            answer_cache.store(question, user_info, result.content, time.perf_counter() - started)
+        return result.content
+    except Exception as e:
+        logger.exception(f"Error generating AI response: {str(e)}")
+        return ERROR_REPLY
+
+def stream_ai_response(chat_history, user_info=None, conversation_id=None):
+    """Yield the reply in chunks as Gemini produces them.
+
+    Closing this generator (Flask does so when the client disconnects) closes
+    the upstream stream, which cancels the Gemini request. Cached answers
+    to single-turn questions come back as one chunk.
+    """
+    question = single_turn_question(chat_history)
+    if question:
+        answer, _ = answer_cache.lookup(question, user_info)
+        if answer is not None:
+            yield answer
+            return
+
+    started = time.perf_counter()
+    parts = []
+    stream = get_model(CHAT_MODEL).stream(build_messages(chat_history, user_info, conversation_id))
+    with span('llm.chat_stream'):
+        try:
+            for chunk in stream:
+                record_llm_usage('chat_stream', chunk)
+                if chunk.content:
+                    if not parts:
+                        llm_time_to_first_token.observe(time.perf_counter() - started, purpose='chat_stream')
+                    parts.append(chunk.content)
+                    yield chunk.content
+        finally:
+            stream.close()
+    if question:
+        answer_cache.store(question, user_info, ''.join(parts), time.perf_counter() - started)
+
+async def astream_ai_response(chat_history, user_info=None, conversation_id=None):
+    """``stream_ai_response`` as an async generator; closing it closes the upstream stream."""
+    question = single_turn_question(chat_history)
+    if question:
+        answer, _ = answer_cache.lookup(question, user_info)
+        if answer is not None:
+            yield answer
+            return
+
+    started = time.perf_counter()
+    parts = []
+    stream = get_model(CHAT_MODEL).astream(build_messages(chat_history, user_info, conversation_id))
+    with span('llm.chat_stream'):
+        try:
+            async for chunk in stream:
+                record_llm_usage('chat_stream', chunk)
+                if chunk.content:
+                    if not parts:
+                        llm_time_to_first_token.observe(time.perf_counter() - started, purpose='chat_stream')
+                    parts.append(chunk.content)
+                    yield chunk.content
+        finally:
+            await stream.aclose()
+    if question:
+        answer_cache.store(question, user_info, ''.join(parts), time.perf_counter() - started)
\ No newline at end of file
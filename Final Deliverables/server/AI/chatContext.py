@@ -0,0 +1,143 @@
+"""Bounded prompt context for the nutrition chat.
+
+Every prompt starts with the same system prompt followed by the user's health
+profile, rendered byte-for-byte the same on every turn so the model's prefix
+cache can reuse it. After that come a rolling summary of older turns and then
+the most recent turns verbatim, as many as fit ``CHAT_MAX_MESSAGES`` and
+``CHAT_HISTORY_TOKEN_BUDGET``.
+
+Summaries are kept per conversation and refreshed in the background every
+``CHAT_SUMMARY_BATCH`` dropped messages, so a turn never waits for one.
+Dropped messages the summary does not cover yet are included as short
+excerpts instead.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', 2000))
+CHAT_MAX_MESSAGES = int(os.getenv('CHAT_MAX_MESSAGES', 12))
+CHAT_SUMMARY_BATCH = int(os.getenv('CHAT_SUMMARY_BATCH', 4))
+
+# Dropped messages the summary does not cover yet are shown as up to
+# MAX_EXCERPTS excerpts of EXCERPT_CHARS characters
+EXCERPT_CHARS = 160
+MAX_EXCERPTS = 8
+
+PROFILE_FIELDS = [
+    ('Age', 'age', 'Not specified', ''),
+    ('Gender', 'gender', 'Not specified', ''),
+    ('Height', 'height', 'Not specified', ' cm'),
+    ('Weight', 'weight', 'Not specified', ' kg'),
+    ('Diet Preference', 'dietPreference', 'Not specified', ''),
+    ('Goal', 'goal', 'Not specified', ''),
+    ('Activity Level', 'activityLevel', 'Not specified', ''),
+    ('Allergies', 'allergies', 'None', ''),
+]
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def profile_block(user_info):
+    lines = [f"- {label}: {user_info.get(key, default)}{unit}" for label, key, default, unit in PROFILE_FIELDS]
+    return (
+        "\nUser Health Profile:\n" + "\n".join(lines) +
+        "\n\nWhen providing nutrition advice, always consider these details to give personalized recommendations.\n"
+    )
+
+
+def conversation_key(user_id, chat_history, conversation_id=None):
+    """Identify a conversation by its owner and the client's id for it, or else its opening message.
+
+    The owner is always part of the key, so two users sending the same
+    ``conversationId`` never share a summary.
+    """
+    if conversation_id:
+        return f"{user_id}:{conversation_id}"
+    first = next((m.get('content', '') for m in chat_history if m.get('role') == 'user'), '')
+    return f"{user_id}:{hashlib.sha1(first.encode('utf-8')).hexdigest()[:16]}"
+
+
+class ChatContext:
+    def __init__(self, system_prompt, summarize=None, token_budget=CHAT_HISTORY_TOKEN_BUDGET,
+                 max_messages=CHAT_MAX_MESSAGES, summary_batch=CHAT_SUMMARY_BATCH):
+        self.system_prompt = system_prompt
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.summary_batch = summary_batch
+        # conversation id -> (number of messages summarized, summary)
+        self.summaries = TTLCache(maxsize=int(os.getenv('CHAT_SUMMARY_CACHE_SIZE', 10000)),
+                                  ttl=int(os.getenv('CHAT_SUMMARY_TTL', 24 * 3600)))
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chat-summary')
+
+    def prefix(self, user_info=None):
+        """The stable part of the system message: system prompt, then the profile."""
+        if not user_info:
+            return self.system_prompt
+        return self.system_prompt + profile_block(user_info)
+
+    def split(self, chat_history):
+        """``(older, recent)``: recent is the verbatim window, always holding the last message."""
+        messages = [m for m in chat_history if m.get('role') in ('user', 'assistant')]
+        budget = self.token_budget
+        start = len(messages)
+        while start > 0 and len(messages) - start < self.max_messages:
+            tokens = estimate_tokens(messages[start - 1].get('content', ''))
+            if tokens > budget and start < len(messages):
+                break
+            budget -= tokens
+            start -= 1
+        return messages[:start], messages[start:]
+
+    def build(self, chat_history, user_info=None, conversation_id=None):
+        """``(system_content, recent_messages)`` for one turn."""
+        older, recent = self.split(chat_history)
+        system = self.prefix(user_info)
+        if not older:
+            return system, recent
+
+        summary = self._summary_for(conversation_id, older)
+        return system + "\nSummary of the earlier conversation:\n" + summary + "\n", recent
+
+    def _summary_for(self, conversation_id, older):
+        count, summary = 0, ''
+        if conversation_id is not None:
+            count, summary = self.summaries.get(conversation_id) or (0, '')
+            if count > len(older):
+                # The client sent a shorter history than was summarized: start over
+                count, summary = 0, ''
+        lagging = older[count:]
+        if conversation_id is not None and self.summarize is not None and len(lagging) >= self.summary_batch:
+            self._refresh(conversation_id, count, summary, older)
+
+        excerpts = [f"{m['role']}: {' '.join(m.get('content', '').split())[:EXCERPT_CHARS]}" for m in lagging[-MAX_EXCERPTS:]]
+        return "\n".join(filter(None, [summary] + excerpts))
+
+    def _refresh(self, conversation_id, count, summary, older):
+        with self._lock:
+            if conversation_id in self._pending:
+                return
+            self._pending.add(conversation_id)
+        self._executor.submit(self._summarize, conversation_id, count, summary, list(older))
+
+    def _summarize(self, conversation_id, count, summary, older):
+        try:
+            new_summary = self.summarize(summary, older[count:])
+            self.summaries.set(conversation_id, (len(older), new_summary.strip()))
+        except Exception as e:
+            logger.error("Summarizing conversation %s failed: %s", conversation_id, e)
+        finally:
+            with self._lock:
+                self._pending.discard(conversation_id)
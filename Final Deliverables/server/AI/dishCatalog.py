@@ -0,0 +1,133 @@
+"""Dish catalog for the local meal planner.
+
+Each dish is one standard portion:
+(name, slots, diet, keto, allergens, ingredients, portionSize, calories, protein, carbs, fat)
+
+- slots: any of B(reakfast), L(unch), D(inner), S(nack)
+- diet: the strictest diet the dish fits; 'vegan' dishes suit everyone,
+  'vegetarian' ones contain dairy, 'eggetarian' ones contain egg and
+  'non-vegetarian' ones contain meat or fish
+- keto: True when a portion is low enough in carbs for a keto plan
+- allergens: any of gluten, dairy, nuts, soy, eggs, fish, shellfish
+"""
+
+DISHES = [
+    # Breakfast
+    ("Vegetable Poha", "B", "vegan", False, ["nuts"], "flattened rice, peas, onion, peanuts, curry leaves, lemon", "1 plate", 300, 6, 50, 9),
+    ("Vegetable Upma", "B", "vegan", False, ["gluten"], "semolina, carrot, peas, onion, mustard seeds, curry leaves", "1 bowl", 280, 7, 45, 8),
+    ("Oats Porridge with Almond Milk and Banana", "B", "vegan", False, ["nuts", "gluten"], "rolled oats, almond milk, banana, cinnamon", "1 bowl", 320, 9, 55, 8),
+    ("Besan Chilla with Mint Chutney", "B", "vegan", False, [], "gram flour, onion, tomato, coriander, mint chutney", "2 chillas", 260, 12, 32, 9),
+    ("Tofu Bhurji with Multigrain Toast", "B", "vegan", False, ["soy", "gluten"], "tofu, onion, tomato, turmeric, multigrain bread", "1 plate", 350, 20, 30, 15),
+    ("Ragi Dosa with Coconut Chutney", "B", "vegan", False, [], "finger millet flour, rice flour, coconut, green chilli", "2 dosas", 290, 7, 48, 8),
+    ("Idli with Sambar", "B", "vegan", False, [], "rice, urad dal, toor dal, drumstick, tamarind", "3 idlis and 1 bowl sambar", 300, 10, 55, 4),
+    ("Moong Dal Cheela", "B", "vegan", False, [], "moong dal, ginger, green chilli, coriander", "2 cheelas", 250, 14, 30, 7),
+    ("Chia Pudding with Mango", "B", "vegan", False, [], "chia seeds, coconut milk, mango", "1 jar", 280, 6, 30, 15),
+    ("Peanut Butter Banana Toast", "B", "vegan", False, ["nuts", "gluten"], "whole wheat bread, peanut butter, banana", "2 slices", 380, 12, 48, 16),
+    ("Quinoa Upma", "B", "vegan", False, [], "quinoa, carrot, beans, onion, curry leaves", "1 bowl", 300, 10, 45, 9),
+    ("Sabudana Khichdi", "B", "vegan", False, ["nuts"], "sago pearls, potato, peanuts, green chilli", "1 bowl", 350, 4, 60, 10),
+    ("Vegetable Daliya", "B", "vegan", False, ["gluten"], "broken wheat, carrot, peas, onion, cumin", "1 bowl", 280, 9, 50, 5),
+    ("Aloo Paratha with Curd", "B", "vegetarian", False, ["gluten", "dairy"], "whole wheat flour, potato, ghee, curd", "2 parathas", 420, 10, 55, 17),
+    ("Paneer Paratha", "B", "vegetarian", False, ["gluten", "dairy"], "whole wheat flour, paneer, coriander, ghee", "2 parathas", 430, 18, 45, 19),
+    ("Greek Yogurt Parfait with Berries", "B", "vegetarian", False, ["dairy", "gluten", "nuts"], "greek yogurt, mixed berries, granola, almonds", "1 bowl", 320, 18, 42, 9),
+    ("Methi Thepla with Curd", "B", "vegetarian", False, ["gluten", "dairy"], "whole wheat flour, fenugreek leaves, curd, spices", "2 theplas", 360, 11, 48, 13),
+    ("Paneer Bhurji Sandwich", "B", "vegetarian", False, ["gluten", "dairy"], "whole wheat bread, paneer, onion, capsicum", "1 sandwich", 380, 20, 35, 17),
+    ("Masala Omelette with Toast", "B", "eggetarian", False, ["eggs", "gluten"], "eggs, onion, tomato, green chilli, whole wheat bread", "2-egg omelette and 2 toasts", 350, 20, 25, 18),
+    ("Avocado Toast with Boiled Eggs", "B", "eggetarian", False, ["eggs", "gluten"], "sourdough bread, avocado, eggs, chilli flakes", "2 slices and 2 eggs", 380, 18, 30, 20),
+    ("Egg Bhurji with Roti", "B", "eggetarian", False, ["eggs", "gluten"], "eggs, onion, tomato, whole wheat roti", "2 roti", 360, 19, 30, 17),
+    ("Chicken Sausage and Vegetable Scramble", "B", "non-vegetarian", True, ["eggs"], "chicken sausage, eggs, spinach, bell pepper", "1 plate", 380, 28, 6, 26),
+    ("Cheese Omelette with Spinach", "B", "eggetarian", True, ["eggs", "dairy"], "eggs, cheddar, spinach, butter", "3-egg omelette", 400, 26, 4, 31),
+    ("Paneer Bhurji", "B", "vegetarian", True, ["dairy"], "paneer, onion, tomato, butter, spices", "1 bowl", 350, 20, 7, 27),
+    ("Avocado Egg Bowl", "B", "eggetarian", True, ["eggs"], "avocado, boiled eggs, cherry tomatoes, olive oil", "1 bowl", 380, 15, 9, 32),
+    ("Coconut Flour Pancakes with Butter", "B", "eggetarian", True, ["eggs", "dairy"], "coconut flour, eggs, butter, cream", "3 pancakes", 390, 14, 9, 33),
+    ("Keto Chia Pudding", "B", "vegan", True, [], "chia seeds, coconut cream, cocoa, stevia", "1 jar", 320, 6, 8, 29),
+    ("Bacon and Eggs", "B", "non-vegetarian", True, ["eggs"], "bacon, eggs, butter, sauteed mushrooms", "2 eggs and 3 strips", 450, 25, 2, 38),
+    ("Smoked Salmon and Cream Cheese Roll-ups", "B", "non-vegetarian", True, ["fish", "dairy"], "smoked salmon, cream cheese, cucumber, dill", "4 roll-ups", 330, 22, 3, 25),
+    ("Tofu Scramble with Avocado", "B", "vegan", True, ["soy"], "tofu, avocado, spinach, turmeric, olive oil", "1 plate", 360, 20, 8, 28),
+
+    # Lunch and dinner
+    ("Rajma Chawal", "LD", "vegan", False, [], "kidney beans, onion, tomato, spices, basmati rice", "1 bowl rajma and 1 cup rice", 480, 16, 80, 9),
+    ("Chana Masala with Brown Rice", "LD", "vegan", False, [], "chickpeas, onion, tomato, spices, brown rice", "1 bowl and 1 cup rice", 470, 17, 75, 11),
+    ("Dal Tadka with Jeera Rice", "LD", "vegan", False, [], "toor dal, garlic, cumin, tomato, basmati rice", "1 bowl dal and 1 cup rice", 450, 16, 72, 10),
+    ("Mixed Vegetable Sabzi with Roti", "LD", "vegan", False, ["gluten"], "carrot, beans, peas, cauliflower, whole wheat roti", "1 bowl and 2 roti", 400, 11, 60, 12),
+    ("Aloo Gobi with Roti", "LD", "vegan", False, ["gluten"], "potato, cauliflower, turmeric, cumin, whole wheat roti", "1 bowl and 2 roti", 380, 9, 58, 12),
+    ("Bhindi Masala with Roti", "LD", "vegan", False, ["gluten"], "okra, onion, tomato, spices, whole wheat roti", "1 bowl and 2 roti", 360, 9, 50, 13),
+    ("Vegetable Pulao with Cucumber Salad", "LD", "vegan", False, [], "basmati rice, mixed vegetables, whole spices, cucumber", "1 plate", 420, 9, 72, 10),
+    ("Tofu Stir-fry with Brown Rice", "LD", "vegan", False, ["soy"], "tofu, broccoli, bell pepper, soy sauce, brown rice", "1 plate", 450, 22, 55, 14),
+    ("Quinoa Chickpea Salad Bowl", "LD", "vegan", False, [], "quinoa, chickpeas, cucumber, tomato, lemon, olive oil", "1 bowl", 420, 16, 55, 14),
+    ("Sambar Rice with Beans Poriyal", "LD", "vegan", False, [], "rice, toor dal, vegetables, tamarind, green beans, coconut", "1 plate", 430, 13, 72, 9),
+    ("Vegetable Khichdi", "LD", "vegan", False, [], "rice, moong dal, carrot, peas, cumin", "1 bowl", 400, 14, 65, 8),
+    ("Soya Chunk Curry with Rice", "LD", "vegan", False, ["soy"], "soya chunks, onion, tomato, spices, basmati rice", "1 bowl and 1 cup rice", 460, 28, 60, 10),
+    ("Lobia Curry with Roti", "LD", "vegan", False, ["gluten"], "black-eyed peas, onion, tomato, spices, whole wheat roti", "1 bowl and 2 roti", 420, 18, 62, 10),
+    ("Baingan Bharta with Bajra Roti", "LD", "vegan", False, [], "roasted eggplant, onion, tomato, pearl millet roti", "1 bowl and 2 roti", 380, 10, 55, 13),
+    ("Masoor Dal with Brown Rice", "LD", "vegan", False, [], "red lentils, garlic, tomato, brown rice", "1 bowl dal and 1 cup rice", 430, 18, 68, 8),
+    ("Vegetable Hakka Noodles", "LD", "vegan", False, ["gluten", "soy"], "wheat noodles, cabbage, carrot, capsicum, soy sauce", "1 plate", 450, 11, 70, 13),
+    ("Lentil Soup with Whole Wheat Bread", "LD", "vegan", False, ["gluten"], "brown lentils, carrot, celery, whole wheat bread", "1 bowl and 2 slices", 380, 18, 55, 8),
+    ("Black Chana Curry with Quinoa", "LD", "vegan", False, [], "black chickpeas, onion, tomato, spices, quinoa", "1 bowl and 1 cup quinoa", 440, 19, 66, 11),
+    ("Mushroom Masala with Roti", "LD", "vegan", False, ["gluten"], "mushrooms, onion, tomato, spices, whole wheat roti", "1 bowl and 2 roti", 380, 12, 50, 14),
+    ("Palak Paneer with Roti", "LD", "vegetarian", False, ["gluten", "dairy"], "spinach, paneer, garlic, cream, whole wheat roti", "1 bowl and 2 roti", 480, 24, 40, 24),
+    ("Paneer Butter Masala with Jeera Rice", "LD", "vegetarian", False, ["dairy", "nuts"], "paneer, tomato, butter, cashew, basmati rice", "1 bowl and 1 cup rice", 560, 22, 55, 28),
+    ("Kadhi Chawal", "LD", "vegetarian", False, ["dairy"], "curd, gram flour, spices, basmati rice", "1 bowl kadhi and 1 cup rice", 440, 13, 68, 12),
+    ("Matar Paneer with Roti", "LD", "vegetarian", False, ["gluten", "dairy"], "green peas, paneer, onion, tomato, whole wheat roti", "1 bowl and 2 roti", 470, 22, 45, 22),
+    ("Vegetable Biryani with Raita", "LD", "vegetarian", False, ["dairy"], "basmati rice, mixed vegetables, biryani spices, curd", "1 plate", 500, 13, 78, 14),
+    ("Dal Makhani with Rice", "LD", "vegetarian", False, ["dairy"], "black lentils, kidney beans, butter, cream, basmati rice", "1 bowl and 1 cup rice", 520, 18, 70, 18),
+    ("Paneer Tikka Wrap", "LD", "vegetarian", False, ["gluten", "dairy"], "whole wheat tortilla, paneer tikka, onion, mint chutney", "1 wrap", 480, 25, 45, 22),
+    ("Grilled Chicken with Quinoa Salad", "LD", "non-vegetarian", False, [], "chicken breast, quinoa, cucumber, tomato, olive oil", "150 g chicken and 1 cup salad", 480, 40, 40, 16),
+    ("Chicken Curry with Brown Rice", "LD", "non-vegetarian", False, [], "chicken, onion, tomato, spices, brown rice", "1 bowl and 1 cup rice", 550, 38, 55, 18),
+    ("Fish Curry with Rice", "LD", "non-vegetarian", False, ["fish"], "rohu fish, coconut, tamarind, spices, rice", "1 bowl and 1 cup rice", 500, 32, 60, 14),
+    ("Egg Curry with Roti", "LD", "eggetarian", False, ["eggs", "gluten"], "boiled eggs, onion, tomato, spices, whole wheat roti", "2 eggs and 2 roti", 450, 22, 45, 20),
+    ("Chicken Biryani with Raita", "LD", "non-vegetarian", False, ["dairy"], "chicken, basmati rice, biryani spices, curd", "1 plate", 600, 35, 70, 20),
+    ("Chicken Keema with Roti", "LD", "non-vegetarian", False, ["gluten"], "minced chicken, peas, onion, spices, whole wheat roti", "1 bowl and 2 roti", 500, 34, 42, 20),
+    ("Mutton Curry with Rice", "LD", "non-vegetarian", False, [], "mutton, onion, tomato, spices, basmati rice", "1 bowl and 1 cup rice", 600, 35, 55, 26),
+    ("Prawn Stir-fry with Noodles", "LD", "non-vegetarian", False, ["shellfish", "gluten", "soy"], "prawns, wheat noodles, bok choy, soy sauce", "1 plate", 480, 30, 55, 14),
+    ("Chicken Wrap", "LD", "non-vegetarian", False, ["gluten", "dairy"], "whole wheat tortilla, grilled chicken, lettuce, yogurt sauce", "1 wrap", 470, 32, 42, 18),
+    ("Egg Fried Rice", "LD", "eggetarian", False, ["eggs", "soy"], "rice, eggs, spring onion, carrot, soy sauce", "1 plate", 480, 18, 65, 15),
+    ("Tandoori Chicken with Salad", "LD", "non-vegetarian", True, ["dairy"], "chicken legs, yogurt marinade, spices, onion, cucumber", "2 pieces and salad", 380, 42, 10, 18),
+    ("Grilled Fish with Sauteed Vegetables", "LD", "non-vegetarian", True, ["fish"], "basa fillet, zucchini, bell pepper, olive oil, lemon", "150 g fish and 1 cup vegetables", 380, 35, 12, 20),
+    ("Butter Chicken with Cauliflower Rice", "LD", "non-vegetarian", True, ["dairy", "nuts"], "chicken, butter, cream, cashew, tomato, cauliflower", "1 bowl and 1 cup cauliflower rice", 520, 38, 12, 36),
+    ("Paneer Tikka with Green Salad", "LD", "vegetarian", True, ["dairy"], "paneer, yogurt marinade, bell pepper, onion, lettuce", "8 pieces and salad", 420, 26, 10, 31),
+    ("Palak Paneer", "LD", "vegetarian", True, ["dairy"], "spinach, paneer, garlic, cream, butter", "1 large bowl", 380, 20, 10, 29),
+    ("Chicken Caesar Salad", "LD", "non-vegetarian", True, ["dairy", "eggs", "fish"], "grilled chicken, romaine, parmesan, caesar dressing", "1 large bowl", 450, 38, 8, 30),
+    ("Egg Curry with Cauliflower Rice", "LD", "eggetarian", True, ["eggs"], "boiled eggs, coconut milk, onion, spices, cauliflower", "2 eggs and 1 cup cauliflower rice", 400, 20, 12, 30),
+    ("Zucchini Noodles with Pesto Chicken", "LD", "non-vegetarian", True, ["nuts", "dairy"], "zucchini, basil pesto, pine nuts, parmesan, chicken", "1 plate", 480, 35, 10, 34),
+    ("Mutton Seekh Kebab with Mint Dip", "LD", "non-vegetarian", True, ["dairy"], "minced mutton, onion, spices, mint yogurt dip", "4 kebabs", 450, 30, 6, 34),
+    ("Salmon with Garlic Butter Broccoli", "LD", "non-vegetarian", True, ["fish", "dairy"], "salmon fillet, broccoli, butter, garlic", "150 g salmon and 1 cup broccoli", 520, 36, 9, 38),
+    ("Mushroom and Spinach Cheese Frittata", "LD", "eggetarian", True, ["eggs", "dairy"], "eggs, mushrooms, spinach, cheddar", "2 slices", 420, 25, 7, 32),
+    ("Cauliflower Fried Rice with Tofu", "LD", "vegan", True, ["soy"], "cauliflower, tofu, spring onion, soy sauce, sesame oil", "1 plate", 360, 20, 14, 24),
+    ("Coconut Curry with Tofu and Vegetables", "LD", "vegan", True, ["soy"], "tofu, coconut milk, broccoli, spinach, curry paste", "1 bowl", 420, 18, 14, 33),
+    ("Stuffed Bell Peppers with Paneer", "LD", "vegetarian", True, ["dairy"], "bell peppers, paneer, cheese, onion, spices", "2 peppers", 430, 24, 12, 32),
+    ("Chicken Tikka with Sauteed Greens", "LD", "non-vegetarian", True, ["dairy"], "chicken breast, yogurt marinade, spinach, kale, garlic", "8 pieces and 1 cup greens", 420, 40, 8, 25),
+    ("Garlic Butter Prawns with Zucchini", "LD", "non-vegetarian", True, ["shellfish", "dairy"], "prawns, butter, garlic, zucchini", "1 plate", 400, 32, 8, 26),
+    ("Avocado Tofu Salad", "LD", "vegan", True, ["soy"], "tofu, avocado, lettuce, cucumber, olive oil, seeds", "1 large bowl", 380, 17, 12, 30),
+
+    # Snacks
+    ("Roasted Chana", "S", "vegan", False, [], "roasted chickpeas, black salt", "1/2 cup", 150, 8, 22, 3),
+    ("Fruit Salad", "S", "vegan", False, [], "apple, papaya, orange, pomegranate", "1 bowl", 120, 2, 28, 1),
+    ("Sprouts Chaat", "S", "vegan", False, [], "moong sprouts, onion, tomato, lemon, chaat masala", "1 bowl", 160, 10, 25, 2),
+    ("Mixed Nuts", "S", "vegan", True, ["nuts"], "almonds, walnuts, cashews", "30 g", 180, 6, 7, 15),
+    ("Hummus with Carrot Sticks", "S", "vegan", False, [], "chickpeas, tahini, lemon, carrot", "1/4 cup hummus", 180, 6, 18, 9),
+    ("Apple with Peanut Butter", "S", "vegan", False, ["nuts"], "apple, peanut butter", "1 apple and 1 tbsp", 200, 5, 25, 9),
+    ("Roasted Makhana", "S", "vegan", False, [], "fox nuts, olive oil, spices", "1 cup", 130, 4, 20, 4),
+    ("Banana", "S", "vegan", False, [], "banana", "1 medium", 105, 1, 27, 0),
+    ("Khaman Dhokla", "S", "vegan", False, [], "gram flour, lemon, mustard seeds, curry leaves", "3 pieces", 160, 7, 24, 4),
+    ("Guacamole with Cucumber Slices", "S", "vegan", True, [], "avocado, onion, tomato, lime, cucumber", "1/2 cup", 160, 2, 9, 14),
+    ("Coconut Fat Bombs", "S", "vegan", True, [], "coconut oil, desiccated coconut, cocoa", "2 pieces", 150, 1, 3, 15),
+    ("Greek Yogurt with Honey", "S", "vegetarian", False, ["dairy"], "greek yogurt, honey", "1 cup", 150, 15, 18, 2),
+    ("Masala Chaas with Roasted Peanuts", "S", "vegetarian", False, ["dairy", "nuts"], "buttermilk, cumin, roasted peanuts", "1 glass and 20 g peanuts", 180, 9, 10, 11),
+    ("Paneer Cubes with Cucumber", "S", "vegetarian", True, ["dairy"], "paneer, cucumber, chaat masala", "75 g paneer", 200, 14, 4, 15),
+    ("Cheese Cubes with Walnuts", "S", "vegetarian", True, ["dairy", "nuts"], "cheddar, walnuts", "30 g each", 220, 10, 3, 19),
+    ("Boiled Eggs", "S", "eggetarian", True, ["eggs"], "eggs, black pepper", "2 eggs", 140, 12, 1, 10),
+    ("Deviled Eggs", "S", "eggetarian", True, ["eggs"], "eggs, mayonnaise, mustard, paprika", "4 halves", 180, 11, 1, 15),
+    ("Chicken Tikka Bites", "S", "non-vegetarian", True, ["dairy"], "chicken breast, yogurt marinade, spices", "6 pieces", 180, 24, 3, 8),
+    ("Tuna Cucumber Bites", "S", "non-vegetarian", True, ["fish"], "tuna, cucumber, lemon, pepper", "8 bites", 150, 20, 3, 6),
+]
+
+# Words in a free-text allergy that map to catalog allergen tags
+ALLERGEN_SYNONYMS = {
+    'gluten': 'gluten', 'wheat': 'gluten', 'celiac': 'gluten',
+    'dairy': 'dairy', 'milk': 'dairy', 'lactose': 'dairy', 'cheese': 'dairy',
+    'nuts': 'nuts', 'nut': 'nuts', 'peanut': 'nuts', 'peanuts': 'nuts', 'tree nuts': 'nuts',
+    'soy': 'soy', 'soya': 'soy',
+    'eggs': 'eggs', 'egg': 'eggs',
+    'fish': 'fish', 'seafood': 'fish',
+    'shellfish': 'shellfish', 'prawn': 'shellfish', 'shrimp': 'shellfish',
+}
@@ -0,0 +1,44 @@
+"""Gemini chat clients, built on first use and once per process.
+
+Importing ``langchain_google_genai`` and constructing a client is slow and
+the client's connections must not be shared across a fork, so nothing is
+built at import time. ``get_model(name)`` returns this process's client for
+``name``; ``set_model`` swaps in a stand-in for benchmarks and tests.
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_lock = threading.Lock()
+# model name -> (pid, client)
+_models = {}
+_override = None
+
+
+def get_model(name):
+    if _override is not None:
+        return _override
+    pid = os.getpid()
+    entry = _models.get(name)
+    if entry is None or entry[0] != pid:
+        with _lock:
+            entry = _models.get(name)
+            if entry is None or entry[0] != pid:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                entry = _models[name] = (pid, ChatGoogleGenerativeAI(model=name))
+    return entry[1]
+
+
+def set_model(model):
+    """Use ``model`` for every model name in this process; ``None`` restores Gemini."""
+    global _override
+    _override = model
+
+
+def preload_modules():
+    """Import the LangChain modules without building clients, so forked workers share them."""
+    import langchain_core.messages  # noqa: F401
+    import langchain_google_genai  # noqa: F401
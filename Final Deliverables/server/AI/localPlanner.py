@@ -0,0 +1,190 @@
+"""Deterministic meal planner that needs no LLM.
+
+Computes the calorie target with the same Mifflin-St Jeor, activity-factor and
+goal-adjustment rules the Gemini prompt describes, splits it into macro and
+per-meal targets, and picks 28 dishes from ``AI.dishCatalog``:
+
+1. dishes are filtered by diet preference and allergies,
+2. every (dish, portion size) candidate for a slot is scored against the
+   slot's targets in one vectorized pass,
+3. the best few candidates per slot are combined exhaustively and the
+   combination closest to the daily targets wins,
+4. chosen dishes are removed so the week has no repeats.
+
+The result has the same JSON schema as ``generate_meal_plan``.
+"""
+import json
+import zlib
+
+import numpy as np
+
+from AI.dishCatalog import DISHES, ALLERGEN_SYNONYMS
+from AI.planCache import DAYS, MEALS, normalize_allergies
+from coerce import to_number, normalize_text
+
+ACTIVITY_FACTORS = {
+    'sedentary': 1.2,
+    'lightly active': 1.375,
+    'moderately active': 1.55,
+    'very active': 1.725,
+    'super active': 1.9,
+}
+GOAL_ADJUSTMENTS = {'weight loss': -500, 'muscle gain': 500, 'maintenance': 0}
+# Share of daily calories from protein, carbs and fat
+MACRO_SPLITS = {
+    'weight loss': (0.30, 0.40, 0.30),
+    'maintenance': (0.20, 0.50, 0.30),
+    'muscle gain': (0.30, 0.45, 0.25),
+    'keto': (0.25, 0.05, 0.70),
+}
+MEAL_SHARES = {'Breakfast': 0.25, 'Lunch': 0.35, 'Dinner': 0.30, 'Snack': 0.10}
+MIN_CALORIES = 1200
+
+PORTION_SCALES = np.array([0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0, 2.5, 3.0])
+# Deviations are measured in kcal (4 per gram of protein or carbs, 9 per gram
+# of fat) relative to the calorie target, then weighted per macro
+KCAL_PER_UNIT = np.array([1.0, 4.0, 4.0, 9.0])
+MACRO_WEIGHTS = np.array([1.0, 0.6, 0.3, 0.3])
+# (dish, portion) candidates per slot that go into the daily combination search
+CANDIDATES_PER_SLOT = 8
+
+DIET_LEVELS = {'vegan': 0, 'vegetarian': 1, 'eggetarian': 2, 'non-vegetarian': 3}
+SLOT_CODES = {'Breakfast': 'B', 'Lunch': 'L', 'Dinner': 'D', 'Snack': 'S'}
+
+_NAMES = [d[0] for d in DISHES]
+_SLOTS = {slot: np.array([code in d[1] for d in DISHES]) for slot, code in SLOT_CODES.items()}
+_DIET = np.array([DIET_LEVELS[d[2]] for d in DISHES])
+_KETO = np.array([d[3] for d in DISHES])
+_ALLERGENS = [set(d[4]) for d in DISHES]
+_TEXT = [f"{d[0]} {d[5]}".lower() for d in DISHES]
+# calories, protein, carbs, fat per standard portion
+_MACROS = np.array([d[7:11] for d in DISHES], dtype=np.float64)
+
+
+def compute_targets(age, gender, height, weight, goal, activity_level, diet_preference=None, **_):
+    """Daily calorie (kcal) and macro (g) targets for a profile."""
+    age = to_number(age, 30)
+    height = to_number(height, 165)
+    weight = to_number(weight, 65)
+    gender = normalize_text(gender)
+
+    bmr = 10 * weight + 6.25 * height - 5 * age
+    if gender == 'male':
+        bmr += 5
+    elif gender == 'female':
+        bmr -= 161
+    else:
+        bmr -= 78
+
+    calories = bmr * ACTIVITY_FACTORS.get(normalize_text(activity_level), 1.2)
+    calories = max(calories + GOAL_ADJUSTMENTS.get(normalize_text(goal), 0), MIN_CALORIES)
+
+    split_key = 'keto' if 'keto' in normalize_text(diet_preference) else normalize_text(goal)
+    protein, carbs, fat = MACRO_SPLITS.get(split_key, MACRO_SPLITS['maintenance'])
+    return {
+        'calories': round(calories),
+        'protein': round(calories * protein / 4),
+        'carbs': round(calories * carbs / 4),
+        'fat': round(calories * fat / 9),
+    }
+
+
+def allowed_dishes(diet_preference, allergies):
+    """Boolean mask over the catalog for a diet preference and allergy list."""
+    pref = normalize_text(diet_preference)
+    if 'keto' in pref:
+        mask = _KETO.copy()
+    elif 'vegan' in pref:
+        mask = _DIET <= DIET_LEVELS['vegan']
+    elif 'non' in pref:
+        mask = np.ones(len(DISHES), dtype=bool)
+    elif 'egg' in pref:
+        mask = _DIET <= DIET_LEVELS['eggetarian']
+    elif 'veg' in pref:
+        mask = _DIET <= DIET_LEVELS['vegetarian']
+    else:
+        mask = np.ones(len(DISHES), dtype=bool)
+
+    for allergy in filter(None, normalize_allergies(allergies).split(',')):
+        tags = {ALLERGEN_SYNONYMS[allergy]} if allergy in ALLERGEN_SYNONYMS else set()
+        if allergy == 'seafood':
+            tags.add('shellfish')
+        for i in range(len(DISHES)):
+            if tags & _ALLERGENS[i] or (not tags and allergy in _TEXT[i]):
+                mask[i] = False
+    return mask
+
+
+def scaled_portion(portion, scale):
+    return portion if scale == 1 else f"{scale:g} x {portion}"
+
+
+def plan_meals(targets, mask, seed=0):
+    """Pick 7 days x 4 meals; returns the ``mealPlan`` dict."""
+    rng = np.random.default_rng(seed)
+    target = np.array([targets['calories'], targets['protein'], targets['carbs'], targets['fat']], dtype=np.float64)
+    unit = KCAL_PER_UNIT / max(target[0], 1.0)
+    # Tiny per-profile jitter so similar profiles rotate through equally good dishes
+    jitter = rng.random(len(DISHES)) * 0.01
+    used = np.zeros(len(DISHES), dtype=bool)
+
+    meal_plan = {}
+    for day in DAYS:
+        options = []
+        for slot in MEALS:
+            slot_mask = mask & _SLOTS[slot]
+            candidates = np.flatnonzero(slot_mask & ~used)
+            if not len(candidates):
+                # Too few dishes for this diet/allergy combination: allow repeats
+                candidates = np.flatnonzero(slot_mask)
+            if not len(candidates):
+                raise ValueError(f"No {slot.lower()} dishes match this diet and allergy profile")
+
+            slot_target = target * MEAL_SHARES[slot]
+            scaled = _MACROS[candidates][:, None, :] * PORTION_SCALES[None, :, None]
+            cost = (((scaled - slot_target) * unit / MEAL_SHARES[slot]) ** 2) @ MACRO_WEIGHTS
+            cost += jitter[candidates][:, None]
+            flat = cost.ravel()
+            k = min(CANDIDATES_PER_SLOT, len(flat))
+            best = np.argpartition(flat, k - 1)[:k]
+            dish = candidates[best // len(PORTION_SCALES)]
+            scale = PORTION_SCALES[best % len(PORTION_SCALES)]
+            options.append((dish, scale, scaled.reshape(-1, 4)[best], flat[best]))
+
+        # Every combination of the per-slot candidates: shape (k, k, k, k, 4)
+        b, l, d, s = (opt[2] for opt in options)
+        totals = b[:, None, None, None] + l[None, :, None, None] + d[None, None, :, None] + s[None, None, None, :]
+        day_cost = (((totals - target) * unit) ** 2) @ MACRO_WEIGHTS
+        day_cost += 0.25 * (
+            options[0][3][:, None, None, None] + options[1][3][None, :, None, None]
+            + options[2][3][None, None, :, None] + options[3][3][None, None, None, :]
+        )
+        same_dish = options[1][0][:, None] == options[2][0][None, :]
+        day_cost[:, same_dish] = np.inf
+        choice = np.unravel_index(np.argmin(day_cost), day_cost.shape)
+
+        meals = {}
+        for slot, (dishes, scales, macros, _), i in zip(MEALS, options, choice):
+            dish = int(dishes[i])
+            used[dish] = True
+            calories, protein, carbs, fat = macros[i]
+            meals[slot] = {
+                'name': _NAMES[dish],
+                'ingredients': DISHES[dish][5],
+                'portionSize': scaled_portion(DISHES[dish][6], float(scales[i])),
+                'calories': int(round(calories)),
+                'protein': int(round(protein)),
+                'carbs': int(round(carbs)),
+                'fat': int(round(fat)),
+            }
+        meal_plan[day] = meals
+    return meal_plan
+
+
+def generate_local_meal_plan(name=None, age=None, gender=None, height=None, weight=None, diet_preference=None,
+                             goal=None, activity_level=None, allergies=None):
+    """Same inputs and JSON output as ``generate_meal_plan``, computed locally in milliseconds."""
+    targets = compute_targets(age, gender, height, weight, goal, activity_level, diet_preference)
+    mask = allowed_dishes(diet_preference, allergies)
+    seed = zlib.crc32(f"{gender}|{age}|{height}|{weight}|{diet_preference}|{goal}|{activity_level}".encode())
+    return json.dumps({'mealPlan': plan_meals(targets, mask, seed=seed)})
@@ -1,18 +1,22 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import logging
+import threading
+from AI.planCache import DAYS, MEALS
+from AI.llm import get_model
+from AI.localPlanner import generate_local_meal_plan
+from metrics import span, record_llm_usage, propagate, meal_plan_repaired_slots, meal_plan_day_retries
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-model = ChatGoogleGenerativeAI(model="gemini-2.5-flash-preview-05-20")
+MEAL_PLAN_MODEL = "gemini-2.5-flash-preview-05-20"
 
-def generate_meal_plan(name, age, gender, height, weight, diet_preference, goal, activity_level, allergies):
-    prompt = f"""
-You are a certified AI nutritionist.
-
-Your task is to create a personalized 7-day meal plan (Sunday to Saturday) for a single person based on the following input:
+# Attempts per day in parallel mode before a repeated dish is accepted
+MAX_DAY_ATTEMPTS = 3
 
-- Name: {name}
+def profile_details(name, age, gender, height, weight, diet_preference, goal, activity_level, allergies):
+    return f"""- Name: {name}
 - Age: {age}
 - Gender: {gender}
 - Height: {height} cm
@@ -33,7 +37,25 @@ Your task is to create a personalized 7-day meal plan (Sunday to Saturday) for a
    - **Goal Adjustment**:
      - Weight Loss: subtract 500 kcal
      - Muscle Gain: add 500 kcal
-     - Maintenance: no change
+     - Maintenance: no change"""
+
+def strip_json_fences(response):
+    response = response.strip()
+    if response.startswith("```json"):
+        response = response[len("```json"):].strip()
+    if response.endswith("```"):
+        response = response[:-len("```")].strip()
+    return response
+
+def meal_plan_messages(name, age, gender, height, weight, diet_preference, goal, activity_level, allergies):
+    """The prompt asking for the whole week in one reply."""
+    details = profile_details(name, age, gender, height, weight, diet_preference, goal, activity_level, allergies)
+    prompt = f"""
+You are a certified AI nutritionist.
+
+Your task is to create a personalized 7-day meal plan (Sunday to Saturday) for a single person based on the following input:
+
+{details}
 
 Each day must include 4 meals:
 - Breakfast
@@ -95,11 +117,254 @@ Return the result in pure JSON. No introductions, comments, markdown, or text ou
 This JSON will be stored in a Firebase database and shown in a personal meal planning app. Ensure accuracy, clarity, and consistency in formatting.
 """
 
-    messages = [SystemMessage(content="You are a nutrition assistant."), HumanMessage(content=prompt)]
-    result = model.invoke(messages)
-    response = result.content.strip()
-    if response.startswith("```json"):
-        response = response[len("```json"):].strip()
-    if response.endswith("```"):
-        response = response[:-len("```")].strip()
-    return response
\ No newline at end of file
+    from langchain_core.messages import HumanMessage, SystemMessage
+    return [SystemMessage(content="You are a nutrition assistant."), HumanMessage(content=prompt)]
+
+def _parse_reply(result):
+    from AI.planSchema import parse_meal_plan
+
+    record_llm_usage('meal_plan', result)
+    days, missing = parse_meal_plan(strip_json_fences(result.content))
+    if len(missing) == len(DAYS) * len(MEALS):
+        raise ValueError("Meal plan reply has no valid meals")
+    if missing:
+        logger.warning("Meal plan reply is missing or has invalid meals in %d slots, regenerating them", len(missing))
+    return days
+
+def generate_meal_plan(name, age, gender, height, weight, diet_preference, goal, activity_level, allergies):
+    """Generate the week in one request and return it as validated JSON.
+
+    Meals that are missing or fail the schema (a truncated or malformed
+    reply) are regenerated on their own rather than discarding the week.
+    """
+    profile = dict(name=name, age=age, gender=gender, height=height, weight=weight, diet_preference=diet_preference,
+                   goal=goal, activity_level=activity_level, allergies=allergies)
+    with span('llm.meal_plan'):
+        result = get_model(MEAL_PLAN_MODEL).invoke(meal_plan_messages(**profile))
+    return complete_meal_plan(_parse_reply(result), profile)
+
+async def agenerate_meal_plan(name, age, gender, height, weight, diet_preference, goal, activity_level, allergies):
+    """``generate_meal_plan`` awaiting the model instead of blocking a thread."""
+    profile = dict(name=name, age=age, gender=gender, height=height, weight=weight, diet_preference=diet_preference,
+                   goal=goal, activity_level=activity_level, allergies=allergies)
+    with span('llm.meal_plan'):
+        result = await get_model(MEAL_PLAN_MODEL).ainvoke(meal_plan_messages(**profile))
+    return await acomplete_meal_plan(_parse_reply(result), profile)
+
+def _slots_template(slots):
+    first, *rest = slots
+    lines = [f'  "{first}": {{"name": "", "ingredients": "", "portionSize": "", "calories": 0, "protein": 0, "carbs": 0, "fat": 0}}']
+    lines += [f'  "{slot}": {{ ... }}' for slot in rest]
+    return ",\n".join(lines)
+
+def day_messages(day, details, used_dishes=(), slots=MEALS):
+    """The prompt asking for the meals of one day, all four unless ``slots`` names fewer."""
+    avoid = ", ".join(used_dishes) if used_dishes else "none yet"
+    prompt = f"""
+You are a certified AI nutritionist.
+
+Your task is to create the {day} meals of a personalized 7-day meal plan for a single person based on the following input:
+
+{details}
+
+The day must include these meals: {", ".join(slots)}.
+
+Each meal must contain:
+- name: Name of the dish (string)
+- ingredients: Comma-separated list of ingredients (string)
+- portionSize: e.g., 1 bowl, 2 roti, 1 cup (string)
+- calories: kcal (number)
+- protein: grams (number)
+- carbs: grams (number)
+- fat: grams (number)
+
+ RULES:
+- Do NOT use any of these dishes, they are already used on other days: {avoid}
+- Meals must strictly follow diet preference and avoid allergic ingredients
+- The day's calories and macronutrients must add up to the daily target for the user's goal and activity level
+
+Return only this JSON, with no markdown or text outside it:
+{{
+{_slots_template(slots)}
+}}
+"""
+
+    from langchain_core.messages import HumanMessage, SystemMessage
+    return [SystemMessage(content="You are a nutrition assistant."), HumanMessage(content=prompt)]
+
+def _day_meals(result, slots):
+    from AI.planSchema import parse_day
+
+    record_llm_usage('meal_plan_day', result)
+    return parse_day(strip_json_fences(result.content), slots)
+
+def generate_day(day, details, used_dishes=(), slots=MEALS):
+    """Generate the meals for one day as a dict keyed by meal slot.
+
+    Only meals that pass the schema are returned, so a slot can be absent.
+    """
+    with span('llm.meal_plan_day'):
+        result = get_model(MEAL_PLAN_MODEL).invoke(day_messages(day, details, used_dishes, slots))
+    return _day_meals(result, slots)
+
+async def agenerate_day(day, details, used_dishes=(), slots=MEALS):
+    with span('llm.meal_plan_day'):
+        result = await get_model(MEAL_PLAN_MODEL).ainvoke(day_messages(day, details, used_dishes, slots))
+    return _day_meals(result, slots)
+
+def _dish_key(name):
+    return " ".join(str(name).lower().split())
+
+def _missing_by_day(days):
+    missing = {}
+    for day in DAYS:
+        slots = [slot for slot in MEALS if slot not in days[day]]
+        if slots:
+            missing[day] = slots
+    return missing
+
+def _used_dishes(days):
+    return [meal['name'] for meals in days.values() for meal in meals.values()]
+
+def _record_filled(day, meals, failed_days, source):
+    # Days whose request failed are retries; only the other gaps failed the schema
+    if day in failed_days:
+        if meals:
+            meal_plan_day_retries.inc(source=source)
+    elif meals:
+        meal_plan_repaired_slots.inc(len(meals), source=source)
+
+def _finish_plan(days, local_plan, failed_days=()):
+    """Fill what is still missing from ``local_plan()`` and return the plan as validated JSON."""
+    from AI.planSchema import validate_meal_plan
+
+    missing = _missing_by_day(days)
+    if missing:
+        local = json.loads(local_plan())['mealPlan']
+        for day, slots in missing.items():
+            for slot in slots:
+                days[day][slot] = local[day][slot]
+            _record_filled(day, slots, failed_days, 'local')
+    return json.dumps(validate_meal_plan({'mealPlan': days}))
+
+def complete_meal_plan(days, profile, failed_days=()):
+    """Regenerate the missing meals of a partly valid plan and return it as validated JSON.
+
+    Each day with gaps is asked again for just those slots, days concurrently.
+    Slots that still fail are taken from the local planner's plan for the
+    same profile. ``failed_days`` are days whose whole request failed; they
+    are counted as day retries rather than repaired slots.
+    """
+    missing = _missing_by_day(days)
+    if missing:
+        details = profile_details(**profile)
+        used = _used_dishes(days)
+
+        def run(day):
+            try:
+                return generate_day(day, details, used, slots=missing[day])
+            except Exception as e:
+                logger.warning(f"Regenerating {day} {', '.join(missing[day])} failed: {str(e)}")
+                return {}
+
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            for day, meals in zip(missing, pool.map(propagate(run), missing)):
+                days[day].update(meals)
+                _record_filled(day, meals, failed_days, 'llm')
+    return _finish_plan(days, lambda: generate_local_meal_plan(**profile), failed_days)
+
+async def acomplete_meal_plan(days, profile, failed_days=()):
+    """``complete_meal_plan`` with the day requests awaited together."""
+    missing = _missing_by_day(days)
+    if missing:
+        details = profile_details(**profile)
+        used = _used_dishes(days)
+
+        async def run(day):
+            try:
+                return await agenerate_day(day, details, used, slots=missing[day])
+            except Exception as e:
+                logger.warning(f"Regenerating {day} {', '.join(missing[day])} failed: {str(e)}")
+                return {}
+
+        for day, meals in zip(missing, await asyncio.gather(*(run(day) for day in missing))):
+            days[day].update(meals)
+            _record_filled(day, meals, failed_days, 'llm')
+    local_plan = None
+    if _missing_by_day(days):
+        local_plan = await asyncio.to_thread(generate_local_meal_plan, **profile)
+    return _finish_plan(days, lambda: local_plan, failed_days)
+
+def generate_meal_plan_parallel(name, age, gender, height, weight, diet_preference, goal, activity_level, allergies,
+                                on_day=None, max_workers=len(DAYS)):
+    """Generate the 7 days concurrently and assemble them into the generate_meal_plan JSON.
+
+    Days share a list of dishes already used so the no-repetition rule holds:
+    a day that comes back with a dish another day has claimed is regenerated
+    with the updated list. ``on_day(day, meals)`` is called as each day is
+    accepted so callers can show partial plans. Meals that fail the schema,
+    and days whose request fails, are filled in by ``complete_meal_plan``.
+    """
+    details = profile_details(name, age, gender, height, weight, diet_preference, goal, activity_level, allergies)
+    used = {}
+    failed = set()
+    lock = threading.Lock()
+
+    def run(day):
+        for attempt in range(MAX_DAY_ATTEMPTS):
+            with lock:
+                avoid = list(used.values())
+            try:
+                meals = generate_day(day, details, avoid)
+            except Exception as e:
+                # Left empty, the day is regenerated by complete_meal_plan; accepted days are kept
+                logger.warning(f"Generating {day} failed: {str(e)}")
+                failed.add(day)
+                return {}
+            keys = {_dish_key(meal.get('name')) for meal in meals.values()}
+            with lock:
+                if keys & used.keys() and attempt < MAX_DAY_ATTEMPTS - 1:
+                    continue
+                for meal in meals.values():
+                    used.setdefault(_dish_key(meal.get('name')), meal.get('name'))
+            if on_day is not None:
+                on_day(day, meals)
+            return meals
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        days = dict(zip(DAYS, pool.map(propagate(run), DAYS)))
+
+    profile = dict(name=name, age=age, gender=gender, height=height, weight=weight, diet_preference=diet_preference,
+                   goal=goal, activity_level=activity_level, allergies=allergies)
+    return complete_meal_plan(days, profile, failed)
+
+async def agenerate_meal_plan_parallel(name, age, gender, height, weight, diet_preference, goal, activity_level,
+                                       allergies, on_day=None):
+    """``generate_meal_plan_parallel`` with the seven day requests awaited together on the event loop."""
+    details = profile_details(name, age, gender, height, weight, diet_preference, goal, activity_level, allergies)
+    used = {}
+    failed = set()
+
+    async def run(day):
+        for attempt in range(MAX_DAY_ATTEMPTS):
+            try:
+                meals = await agenerate_day(day, details, list(used.values()))
+            except Exception as e:
+                logger.warning(f"Generating {day} failed: {str(e)}")
+                failed.add(day)
+                return {}
+            # No await between the check and the claim, so no lock is needed
+            keys = {_dish_key(meal.get('name')) for meal in meals.values()}
+            if keys & used.keys() and attempt < MAX_DAY_ATTEMPTS - 1:
+                continue
+            for meal in meals.values():
+                used.setdefault(_dish_key(meal.get('name')), meal.get('name'))
+            if on_day is not None:
+                on_day(day, meals)
+            return meals
+
+    days = dict(zip(DAYS, await asyncio.gather(*(run(day) for day in DAYS))))
+
+    profile = dict(name=name, age=age, gender=gender, height=height, weight=weight, diet_preference=diet_preference,
+                   goal=goal, activity_level=activity_level, allergies=allergies)
+    return await acomplete_meal_plan(days, profile, failed)
\ No newline at end of file
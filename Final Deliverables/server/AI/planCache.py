@@ -0,0 +1,137 @@
+"""Reuse generated meal plans across users with near-identical profiles.
+
+Plans are keyed by a fingerprint of the inputs that shape them: diet
+preference, goal, activity level, gender, normalized allergies, and age,
+height and weight rounded into bands. Only plans that pass validation are
+stored, and entries expire after ``MEAL_PLAN_CACHE_TTL`` seconds so plans
+keep rotating. With ``SHARED_CACHE_PATH`` set, a plan generated by one worker
+is served by every worker on the host.
+"""
+import copy
+import os
+
+from cache import SingleFlight, AsyncSingleFlight
+from coerce import normalize_text
+from shared_cache import make_cache
+
+DAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+MEALS = ['Breakfast', 'Lunch', 'Dinner', 'Snack']
+MACROS = ['calories', 'protein', 'carbs', 'fat']
+
+AGE_BAND = 5
+HEIGHT_BAND = 5
+WEIGHT_BAND = 3
+
+FINGERPRINT_VERSION = 'v1'
+
+
+def band(value, width):
+    try:
+        return int(float(value) // width * width)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_allergies(allergies):
+    """'Gluten, dairy' / ['Dairy', 'Gluten'] / 'None' -> 'dairy,gluten' / ''."""
+    if isinstance(allergies, str):
+        allergies = allergies.split(',')
+    items = {normalize_text(a) for a in allergies or []}
+    items -= {'', 'none', 'no', 'nil', 'na', 'n/a'}
+    return ','.join(sorted(items))
+
+
+def profile_fingerprint(age, gender, height, weight, diet_preference, goal, activity_level, allergies, **_):
+    return '|'.join([
+        FINGERPRINT_VERSION,
+        normalize_text(gender),
+        f"a{band(age, AGE_BAND)}",
+        f"h{band(height, HEIGHT_BAND)}",
+        f"w{band(weight, WEIGHT_BAND)}",
+        normalize_text(diet_preference),
+        normalize_text(goal),
+        normalize_text(activity_level),
+        normalize_allergies(allergies),
+    ])
+
+
+def is_valid_plan(plan):
+    """True if ``plan`` has all 7 days x 4 meals with a name and numeric macros."""
+    meal_plan = plan.get('mealPlan') if isinstance(plan, dict) else None
+    if not isinstance(meal_plan, dict):
+        return False
+    for day in DAYS:
+        meals = meal_plan.get(day)
+        if not isinstance(meals, dict):
+            return False
+        for slot in MEALS:
+            meal = meals.get(slot)
+            if not isinstance(meal, dict) or not meal.get('name'):
+                return False
+            if not all(isinstance(meal.get(m), (int, float)) for m in MACROS):
+                return False
+    return True
+
+
+class PlanCache:
+    def __init__(self, maxsize=512, ttl=7 * 24 * 3600, namespace='generated_plans'):
+        self.cache = make_cache(namespace, maxsize=maxsize, ttl=ttl)
+        self.flight = SingleFlight()
+        self.aflight = AsyncSingleFlight()
+        self.rejected = 0
+
+    def get(self, fingerprint):
+        plan = self.cache.get(fingerprint)
+        return copy.deepcopy(plan) if plan is not None else None
+
+    def put(self, fingerprint, plan):
+        if not is_valid_plan(plan):
+            self.rejected += 1
+            return False
+        self.cache.set(fingerprint, copy.deepcopy(plan))
+        return True
+
+    def get_or_generate(self, profile, generate, fresh=False):
+        """Return ``(plan, cached)`` for ``profile``, calling ``generate()`` on a miss.
+
+        Concurrent misses for the same fingerprint share one generation.
+        ``fresh=True`` skips the lookup but still stores the new plan.
+        """
+        fingerprint = profile_fingerprint(**profile)
+        if not fresh:
+            plan = self.get(fingerprint)
+            if plan is not None:
+                return plan, True
+
+        def load():
+            plan = generate()
+            self.put(fingerprint, plan)
+            return plan
+
+        plan = self.flight.do(('fresh' if fresh else 'plan', fingerprint), load)
+        return copy.deepcopy(plan), False
+
+    async def aget_or_generate(self, profile, agenerate, fresh=False):
+        """``get_or_generate`` for a coroutine function ``agenerate()``."""
+        fingerprint = profile_fingerprint(**profile)
+        if not fresh:
+            plan = self.get(fingerprint)
+            if plan is not None:
+                return plan, True
+
+        async def load():
+            plan = await agenerate()
+            self.put(fingerprint, plan)
+            return plan
+
+        plan = await self.aflight.do(('fresh' if fresh else 'plan', fingerprint), load)
+        return copy.deepcopy(plan), False
+
+    def stats(self):
+        return {**self.cache.stats(), 'rejected': self.rejected}
+
+
+meal_plan_cache = PlanCache(
+    maxsize=int(os.getenv('MEAL_PLAN_CACHE_SIZE', 512)),
+    ttl=int(os.getenv('MEAL_PLAN_CACHE_TTL', 7 * 24 * 3600)),
+)
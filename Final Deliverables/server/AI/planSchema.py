@@ -0,0 +1,189 @@
+"""Schema for generated meal plans and a tolerant parser for model replies.
+
+``Meal``, ``DayPlan`` and ``MealPlan`` describe the 7 days x 4 meals
+``mealPlan`` structure. Model replies are parsed with ``loads``, which tries
+``json.loads`` first and only on failure repairs the text: prose or fences
+around the object, trailing commas, raw newlines inside strings, and a reply
+cut off mid-object, which is closed after its last complete member.
+
+``parse_meal_plan`` validates every meal on its own, so a reply with a few
+broken or missing meals still yields the rest together with the list of
+``(day, slot)`` pairs to regenerate.
+"""
+import json
+from typing import Annotated
+
+from pydantic import AfterValidator, BaseModel, BeforeValidator, ConfigDict, Field, ValidationError
+
+from AI.planCache import DAYS, MEALS
+from coerce import to_number
+
+MAX_MEAL_CALORIES = 5000
+MAX_MEAL_GRAMS = 1000
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+def _tidy(value):
+    return int(value) if value == int(value) else round(value, 1)
+
+
+def _text(value):
+    # Ingredients sometimes come back as a list
+    if isinstance(value, list):
+        return ', '.join(str(item) for item in value)
+    return value
+
+
+Calories = Annotated[float, BeforeValidator(to_number), Field(ge=0, le=MAX_MEAL_CALORIES), AfterValidator(_tidy)]
+Grams = Annotated[float, BeforeValidator(to_number), Field(ge=0, le=MAX_MEAL_GRAMS), AfterValidator(_tidy)]
+
+
+class Meal(BaseModel):
+    model_config = ConfigDict(extra='ignore', str_strip_whitespace=True)
+
+    name: str = Field(min_length=1)
+    ingredients: Annotated[str, BeforeValidator(_text)]
+    portionSize: str
+    calories: Calories
+    protein: Grams
+    carbs: Grams
+    fat: Grams
+
+
+class DayPlan(BaseModel):
+    Breakfast: Meal
+    Lunch: Meal
+    Dinner: Meal
+    Snack: Meal
+
+
+class WeekPlan(BaseModel):
+    Sunday: DayPlan
+    Monday: DayPlan
+    Tuesday: DayPlan
+    Wednesday: DayPlan
+    Thursday: DayPlan
+    Friday: DayPlan
+    Saturday: DayPlan
+
+
+class MealPlan(BaseModel):
+    mealPlan: WeekPlan
+
+
+def repair_json(text):
+    """The first JSON object in ``text``, made parseable where the damage is recoverable."""
+    start = text.find('{')
+    if start < 0:
+        raise ValueError("No JSON object in model reply")
+
+    out = []
+    closers = []
+    # (length of out, open closers) at the last point the text can be cut and closed
+    cut = None
+    in_string = escape = False
+    for ch in text[start:]:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            out.append(ch)
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            closers.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in '}]':
+            if not closers or closers[-1] != ch:
+                break
+            _drop_trailing_comma(out)
+            closers.pop()
+            out.append(ch)
+            if not closers:
+                return ''.join(out)
+            cut = (len(out), list(closers))
+        elif ch == ',':
+            cut = (len(out), list(closers))
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    # Truncated: keep everything up to the last complete member and close what is open
+    if cut is None:
+        raise ValueError("Model reply ends before its first complete value")
+    length, closers = cut
+    del out[length:]
+    _drop_trailing_comma(out)
+    return ''.join(out) + ''.join(reversed(closers))
+
+
+def _drop_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+
+
+def loads(text):
+    """``json.loads`` for model replies, falling back to ``repair_json``. Raises ``ValueError``."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(repair_json(text), strict=False)
+
+
+def _titled(data):
+    # 'sunday' / ' Breakfast ' -> 'Sunday' / 'Breakfast'
+    return {str(key).strip().title(): value for key, value in data.items()} if isinstance(data, dict) else {}
+
+
+def parse_meals(data, slots=MEALS):
+    """The meals in ``data`` (keyed by slot) that pass the schema, as plain dicts."""
+    data = _titled(data)
+    meals = {}
+    for slot in slots:
+        try:
+            meals[slot] = Meal.model_validate(data.get(slot)).model_dump()
+        except ValidationError:
+            pass
+    return meals
+
+
+def parse_day(text, slots=MEALS):
+    """``parse_meals`` over a one-day reply; an unparseable reply gives no meals."""
+    try:
+        return parse_meals(loads(text), slots)
+    except ValueError:
+        return {}
+
+
+def parse_meal_plan(text):
+    """``(days, missing)`` for a whole-week reply.
+
+    ``days`` maps every day to its valid meals; ``missing`` lists the
+    ``(day, slot)`` pairs that were absent or failed validation.
+    """
+    try:
+        data = loads(text)
+    except ValueError:
+        data = {}
+    if isinstance(data, dict) and isinstance(data.get('mealPlan'), dict):
+        data = data['mealPlan']
+    data = _titled(data)
+
+    days = {day: parse_meals(data.get(day)) for day in DAYS}
+    return days, missing_slots(days)
+
+
+def missing_slots(days):
+    return [(day, slot) for day in DAYS for slot in MEALS if slot not in days.get(day, {})]
+
+
+def validate_meal_plan(plan):
+    """The full plan checked against ``MealPlan``; raises ``pydantic.ValidationError`` (a ``ValueError``)."""
+    return MealPlan.model_validate(plan).model_dump()
@@ -0,0 +1,252 @@
+"""Check the calories and macros an LLM claims for a meal plan.
+
+Three checks run over all 28 meals at once:
+
+- Atwater: claimed calories against 4 kcal/g protein and carbs and 9 kcal/g fat
+- ingredients: the share of energy from protein, carbs and fat against the
+  USDA profile of the meal's ingredients (earlier ingredients weigh more,
+  since amounts are not given)
+- day totals: each day's calories against the profile's daily target
+
+Ingredient names are deduplicated across the plan and resolved to FDC foods
+through the local food index, or the USDA name search (run in parallel) for
+names the index does not know; all foods not already cached are then
+fetched with a single ``get_foods`` call. Resolved profiles are kept in
+``ingredient_cache``, so plans for other users reuse them.
+
+``MEAL_PLAN_VERIFY=flag`` (the default) only reports findings under the
+plan's ``verification`` key. ``correct`` also sets inconsistent calories to
+their Atwater value and scales the portions of days that miss the target,
+and ``off`` skips verification. Ingredient mismatches are only flagged, as
+the amounts needed to correct them are unknown.
+"""
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import NutriInsights
+from AI.localPlanner import compute_targets, scaled_portion
+from AI.planCache import DAYS, MEALS
+from metrics import span, propagate
+from nutrient_parser import parse_foods, MACRO_INDEX
+from shared_cache import make_cache
+
+logger = logging.getLogger(__name__)
+
+VERIFY_MODE = os.getenv('MEAL_PLAN_VERIFY', 'flag').lower()
+VERIFY_MODES = ('off', 'flag', 'correct')
+
+# Relative difference allowed between claimed and Atwater calories
+ATWATER_TOLERANCE = 0.15
+# Largest allowed total variation distance between energy shares (0..1)
+PROFILE_TOLERANCE = 0.25
+# Fraction of a meal's ingredient weight that must resolve before it is compared
+MIN_RESOLVED_WEIGHT = 0.5
+# Relative difference allowed between a day's calories and the target
+DAY_CALORIE_TOLERANCE = 0.15
+# Bounds on the portion scale applied to a day in correct mode
+MIN_DAY_SCALE = 0.75
+MAX_DAY_SCALE = 1.5
+
+# Data types preferred over branded products when resolving an ingredient
+PREFERRED_DATA_TYPES = ('Foundation', 'SR Legacy', 'Survey (FNDDS)')
+
+# Claimed and resolved macros are handled in this column order
+COLUMNS = ['calories', 'protein', 'carbs', 'fat']
+ENERGY_PER_GRAM = np.array([4.0, 4.0, 9.0])
+
+_UNIT_WORDS = {'g', 'gm', 'gms', 'gram', 'grams', 'kg', 'ml', 'l', 'cup', 'cups', 'tbsp', 'tsp', 'tablespoon',
+               'tablespoons', 'teaspoon', 'teaspoons', 'slice', 'slices', 'piece', 'pieces', 'pinch', 'handful',
+               'of', 'some', 'fresh', 'chopped', 'sliced', 'boiled', 'cooked'}
+_SPLIT = re.compile(r",|;|\band\b|\bwith\b")
+_WORD = re.compile(r"[a-z]+")
+
+# normalized ingredient name -> per-100 g macros in COLUMNS order, or None when unresolved
+ingredient_cache = make_cache(
+    'ingredients',
+    maxsize=int(os.getenv('INGREDIENT_CACHE_SIZE', 8192)),
+    ttl=int(os.getenv('INGREDIENT_CACHE_TTL', 24 * 3600)),
+)
+# Names no FDC food matched are retried sooner, as the food index grows;
+# names whose lookup failed are not cached at all
+UNRESOLVED_TTL = 3600
+# Concurrent USDA name searches for ingredients missing from the food index
+SEARCH_WORKERS = 8
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix='ingredient-search')
+
+
+def ingredient_names(ingredients):
+    """'2 cups cooked brown rice, dal (toor) and ghee' -> ['brown rice', 'dal', 'ghee']."""
+    names = []
+    for part in _SPLIT.split(re.sub(r"\(.*?\)", " ", str(ingredients).lower())):
+        name = ' '.join(word for word in _WORD.findall(part) if word not in _UNIT_WORDS)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _pick_food(foods):
+    for food in foods:
+        if food.get('dataType') in PREFERRED_DATA_TYPES:
+            return food['fdcId']
+    return foods[0]['fdcId'] if foods else None
+
+
+def _search_usda(name):
+    """FDC id for ``name`` from the USDA name search, or None; raises when the search itself fails."""
+    results = NutriInsights.search_food(name)
+    if not isinstance(results, dict) or 'error' in results or 'errors' in results:
+        raise LookupError(f"USDA search failed: {results}")
+    return _pick_food([food for food in results.get('foods') or [] if food.get('fdcId')])
+
+
+def resolve_ingredients(names):
+    """Per-100 g macros (``COLUMNS`` order) for each name, ``None`` where no food was found.
+
+    Only names that no FDC food matched are cached as unresolved; a name
+    whose search or food lookup failed is tried again on the next call.
+    """
+    profiles = {}
+    pending = {}
+    for name in names:
+        profile = ingredient_cache.get(name, default=False)
+        if profile is False:
+            _, foods = NutriInsights.food_index.search(name, page_size=5)
+            pending[name] = _pick_food(foods)
+        else:
+            profiles[name] = profile
+
+    failed = set()
+    searches = {name: search_executor.submit(propagate(_search_usda), name)
+                for name, fdc_id in pending.items() if fdc_id is None}
+    errors = []
+    for name, future in searches.items():
+        try:
+            pending[name] = future.result()
+        except Exception as e:
+            failed.add(name)
+            errors.append(str(e))
+    if errors:
+        logger.warning(f"Ingredient search failed for {len(errors)} of {len(searches)} names: {errors[0]}")
+
+    fdc_ids = sorted({fdc_id for fdc_id in pending.values() if fdc_id is not None})
+    by_id = {}
+    if fdc_ids:
+        try:
+            records = list(NutriInsights.get_foods(fdc_ids).values())
+        except Exception as e:
+            logger.warning(f"Ingredient lookup failed: {str(e)}")
+            records = []
+        matrix = parse_foods(records)
+        macros = matrix.macros()[:, [MACRO_INDEX[column] for column in COLUMNS]]
+        by_id = {fdc_id: tuple(row) for fdc_id, row in zip(matrix.fdc_ids, macros.tolist())}
+
+    for name, fdc_id in pending.items():
+        profile = by_id.get(fdc_id)
+        if profile is not None:
+            ingredient_cache.set(name, profile)
+        elif fdc_id is None and name not in failed:
+            ingredient_cache.set(name, None, ttl=UNRESOLVED_TTL)
+        profiles[name] = profile
+    return profiles
+
+
+def _energy_shares(macros):
+    """Share of energy from protein, carbs and fat for each row of ``(n, 3)`` grams."""
+    energy = macros * ENERGY_PER_GRAM
+    total = energy.sum(axis=1, keepdims=True)
+    return np.divide(energy, total, out=np.zeros_like(energy), where=total > 0)
+
+
+def verify_meal_plan(plan, profile, mode=None):
+    """Check ``plan`` (a ``{'mealPlan': ...}`` dict) for ``profile`` and add its findings under ``verification``.
+
+    In ``correct`` mode the flagged calories and day portions are changed in
+    place. Returns ``plan``. The findings are for this ``profile`` only, so
+    verify the copy served to a user, not a plan shared through a cache.
+    """
+    mode = (mode or VERIFY_MODE).lower()
+    if mode not in VERIFY_MODES or mode == 'off':
+        return plan
+
+    with span('plan.verify'):
+        slots = [(day, slot) for day in DAYS for slot in MEALS]
+        meals = [plan['mealPlan'][day][slot] for day, slot in slots]
+        claimed = np.array([[float(meal.get(column) or 0) for column in COLUMNS] for meal in meals])
+
+        names = [ingredient_names(meal.get('ingredients', '')) for meal in meals]
+        unique = list(dict.fromkeys(name for meal_names in names for name in meal_names))
+        profiles = resolve_ingredients(unique)
+        resolved = [name for name in unique if profiles[name] is not None]
+        column = {name: j for j, name in enumerate(resolved)}
+
+        # weights[i, j]: weight of resolved ingredient j in meal i, 1 / position in the meal's list
+        weights = np.zeros((len(meals), len(resolved)))
+        listed = np.zeros(len(meals))
+        for i, meal_names in enumerate(names):
+            for position, name in enumerate(meal_names):
+                weight = 1.0 / (position + 1)
+                listed[i] += weight
+                if name in column:
+                    weights[i, column[name]] = weight
+        coverage = np.divide(weights.sum(axis=1), listed, out=np.zeros(len(meals)), where=listed > 0)
+
+        flags = []
+        atwater = claimed[:, 1:] @ ENERGY_PER_GRAM
+        off_atwater = np.abs(claimed[:, 0] - atwater) > ATWATER_TOLERANCE * np.maximum(atwater, 1)
+        for i in np.flatnonzero(off_atwater).tolist():
+            day, slot = slots[i]
+            flags.append({'day': day, 'meal': slot, 'issue': 'atwater', 'claimed': round(claimed[i, 0]),
+                          'expected': round(atwater[i]), 'corrected': mode == 'correct'})
+        if mode == 'correct':
+            claimed[off_atwater, 0] = np.round(atwater[off_atwater])
+
+        if resolved:
+            matrix = np.array([profiles[name] for name in resolved])
+            expected = _energy_shares(weights @ matrix[:, 1:])
+            shares = _energy_shares(claimed[:, 1:])
+            distance = np.abs(expected - shares).sum(axis=1) / 2
+            off_profile = (coverage >= MIN_RESOLVED_WEIGHT) & (distance > PROFILE_TOLERANCE)
+            for i in np.flatnonzero(off_profile).tolist():
+                day, slot = slots[i]
+                flags.append({'day': day, 'meal': slot, 'issue': 'ingredients',
+                              'claimed': dict(zip(COLUMNS[1:], np.round(shares[i], 2).tolist())),
+                              'expected': dict(zip(COLUMNS[1:], np.round(expected[i], 2).tolist())),
+                              'corrected': False})
+
+        targets = compute_targets(**profile)
+        days = claimed.reshape(len(DAYS), len(MEALS), len(COLUMNS))
+        day_calories = days[:, :, 0].sum(axis=1)
+        off_target = np.abs(day_calories - targets['calories']) > DAY_CALORIE_TOLERANCE * targets['calories']
+        scales = np.ones(len(DAYS))
+        if mode == 'correct':
+            scales[off_target] = np.clip(targets['calories'] / np.maximum(day_calories[off_target], 1),
+                                         MIN_DAY_SCALE, MAX_DAY_SCALE)
+            scales = np.round(scales * 20) / 20
+            days *= scales[:, None, None]
+        for d in np.flatnonzero(off_target).tolist():
+            flags.append({'day': DAYS[d], 'issue': 'day_calories', 'claimed': round(day_calories[d]),
+                          'expected': targets['calories'], 'corrected': bool(scales[d] != 1)})
+
+        if mode == 'correct':
+            for i, (day, slot) in enumerate(slots):
+                meal = plan['mealPlan'][day][slot]
+                d = DAYS.index(day)
+                for j, key in enumerate(COLUMNS):
+                    value = float(claimed[i, j])
+                    meal[key] = int(round(value)) if key == 'calories' or value == int(value) else round(value, 1)
+                meal['portionSize'] = scaled_portion(meal.get('portionSize', ''), float(scales[d]))
+
+        totals = days.sum(axis=1)
+        plan['verification'] = {
+            'mode': mode,
+            'targets': targets,
+            'days': {day: dict(zip(COLUMNS, np.round(totals[d]).astype(int).tolist())) for d, day in enumerate(DAYS)},
+            'ingredients': {'total': len(unique), 'resolved': len(resolved),
+                            'unresolved': round(1 - len(resolved) / len(unique), 2) if unique else 0.0},
+            'flags': flags,
+        }
+    return plan
@@ -1,125 +1,253 @@
-import requests
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-API_KEY = os.getenv('USDA_API_KEY')
-if not API_KEY:
-    raise ValueError("No USDA_API_KEY found in environment variables")
-
-BASE_URL = "https://api.nal.usda.gov/fdc/v1"
-
-def search_food(query, page_size=5):
-    url = f"{BASE_URL}/foods/search"
-    params = {
-        "api_key": API_KEY,
-        "query": query,
-        "pageSize": page_size
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
-def get_food_details(fdc_id):
-    url = f"{BASE_URL}/food/{fdc_id}"
-    params = {
-        "api_key": API_KEY
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
-def list_foods(data_type="Survey (FNDDS)", page_size=5, page_number=1):
-    url = f"{BASE_URL}/foods/list"
-    params = {
-        "api_key": API_KEY,
-        "dataType": data_type,
-        "pageSize": page_size,
-        "pageNumber": page_number
-    }
-    response = requests.get(url, params=params)
-    return response.json()
-
-def get_multiple_foods(fdc_ids):
-    url = f"{BASE_URL}/foods"
-    headers = {
-        "Content-Type": "application/json"
-    }
-    params = {
-        "api_key": API_KEY
-    }
-    data = {
-        "fdcIds": fdc_ids
-    }
-    response = requests.post(url, headers=headers, params=params, json=data)
-    return response.json()
-
-def get_nutrients_by_name(fdc_id, nutrient_name):
-    data = get_food_details(fdc_id)
-    nutrients = data.get("foodNutrients", [])
-    result = {}
-    for nutrient in nutrients:
-        if nutrient_name.lower() in nutrient["nutrientName"].lower():
-            result[nutrient["nutrientName"]] = {
-                "value": nutrient.get("value"),
-                "unit": nutrient.get("unitName")
-            }
-    return result
-
-def parse_search_results(search_data):
-    foods = search_data.get('foods', [])
-    return [
-        {
-            'id': food.get('fdcId'),
-            'name': food.get('description'),
-            'brand': food.get('brandOwner'),
-            'dataType': food.get('dataType')
-        }
-        for food in foods
-    ]
-
-def parse_food_details(food_data):
-    nutrients = {
-        'calories': 0,
-        'protein': 0,
-        'fat': 0,
-        'carbs': 0,
-        'fiber': 0,
-        'micronutrients': {}
-    }
-
-    nutrient_map = {
-        'Energy': 'calories',
-        'Protein': 'protein',
-        'Total lipid (fat)': 'fat',
-        'Carbohydrate, by difference': 'carbs',
-        'Fiber, total dietary': 'fiber',
-    }
-
-    for nutrient in food_data.get('foodNutrients', []):
-        nutrient_name = nutrient.get('nutrient', {}).get('name')
-        value = nutrient.get('amount', 0)
-        unit = nutrient.get('unitName', '').lower()
-
-        found = False
-        for key, mapped_key in nutrient_map.items():
-            if key.lower() in nutrient_name.lower():
-                if mapped_key != 'calories' and value is not None:
-                    if unit == 'mg':
-                        value /= 1000
-                    elif unit == 'µg' or unit == 'ug':
-                        value /= 1000000
-                
-                nutrients[mapped_key] = round(value, 2) if value is not None else 0
-                found = True
-                break
-        
-        if not found:
-            if nutrient_name and value is not None:
-                nutrients['micronutrients'][nutrient_name] = f"{value} {unit}"
-
-    return {
-        'fdcId': food_data.get('fdcId'),
-        'name': food_data.get('description'),
-        'brand': food_data.get('brandOwner'),
-        'nutrients': nutrients
-    }
+import asyncio
+import os
+import logging
+import numpy as np
+from dotenv import load_dotenv
+from fdc_snapshot import load_snapshot
+from food_index import FoodIndex
+from cache import cached, acached
+from shared_cache import make_cache
+from usda_client import USDAClient, AsyncUSDAClient, MicroBatcher, MAX_FOODS_PER_REQUEST
+from nutrient_parser import parse_foods, read_nutrient, NutrientMatrix
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Checked when a request needs the API, so the app starts (and a snapshot
+# answers lookups) without a key
+API_KEY = os.getenv('USDA_API_KEY')
+
+BASE_URL = os.getenv('USDA_BASE_URL', "https://api.nal.usda.gov/fdc/v1")
+
+client = USDAClient(
+    API_KEY,
+    BASE_URL,
+    timeout=(3.05, float(os.getenv('USDA_TIMEOUT', 10))),
+    retries=int(os.getenv('USDA_RETRIES', 3)),
+)
+# Used by the async routes in asgi.py
+async_client = AsyncUSDAClient(
+    API_KEY,
+    BASE_URL,
+    timeout=(3.05, float(os.getenv('USDA_TIMEOUT', 10))),
+    retries=int(os.getenv('USDA_RETRIES', 3)),
+)
+
+# Optional local FoodData Central snapshot (see fdc_snapshot.py). When present,
+# lookups are answered from it and the USDA API is only used for misses.
+FDC_SNAPSHOT_DIR = os.getenv('FDC_SNAPSHOT_DIR')
+snapshot = load_snapshot(FDC_SNAPSHOT_DIR)
+if FDC_SNAPSHOT_DIR and snapshot is None:
+    logger.warning("FDC_SNAPSHOT_DIR=%s has no snapshot, using the USDA API only", FDC_SNAPSHOT_DIR)
+
+# Full-text index over the snapshot; foods fetched from the API are added to it
+# as they are seen, up to FOOD_INDEX_API_LIMIT of them, so later searches and
+# ingredient lookups find them locally too.
+food_index = FoodIndex.from_snapshot(snapshot) if snapshot is not None else FoodIndex()
+FOOD_INDEX_API_LIMIT = int(os.getenv('FOOD_INDEX_API_LIMIT', 50000))
+_snapshot_foods = len(food_index)
+
+# Responses are cached per worker, and per host with SHARED_CACHE_PATH; errors and
+# empty results only briefly so a bad id or query cannot keep hitting the API but
+# a fixed upstream recovers fast.
+food_cache = make_cache(
+    'food',
+    maxsize=int(os.getenv('FOOD_CACHE_SIZE', 4096)),
+    ttl=int(os.getenv('FOOD_CACHE_TTL', 24 * 3600)),
+)
+search_cache = make_cache(
+    'search',
+    maxsize=int(os.getenv('SEARCH_CACHE_SIZE', 2048)),
+    ttl=int(os.getenv('SEARCH_CACHE_TTL', 3600)),
+)
+NEGATIVE_CACHE_TTL = int(os.getenv('NEGATIVE_CACHE_TTL', 60))
+
+def _is_failed_lookup(food):
+    return not isinstance(food, dict) or 'error' in food or 'Error' in food or not food.get('fdcId')
+
+def _is_failed_search(results):
+    return not isinstance(results, dict) or 'error' in results or 'errors' in results or not results.get('foods')
+
+def _search_key(query, page_size=5, page_number=1):
+    return (' '.join(query.lower().split()), page_size, page_number)
+
+def _index_foods(foods):
+    if isinstance(foods, list) and len(food_index) - _snapshot_foods < FOOD_INDEX_API_LIMIT:
+        food_index.add_many(food for food in foods if isinstance(food, dict) and food.get('fdcId'))
+
+def _local_search(query, page_size, page_number):
+    # Results from the index, or None to ask the API. Without a snapshot the
+    # index only holds foods seen from the API, so it must fill the whole page.
+    if not len(food_index):
+        return None
+    results = food_index.search_payload(query, page_size=page_size, page_number=page_number)
+    needed = 1 if snapshot is not None else page_size
+    return results if len(results['foods']) >= needed else None
+
+@cached(search_cache, key=_search_key, negative_ttl=NEGATIVE_CACHE_TTL, is_negative=_is_failed_search)
+def search_food(query, page_size=5, page_number=1):
+    results = _local_search(query, page_size, page_number)
+    if results is not None:
+        return results
+    results = client.get("/foods/search", query=query, pageSize=page_size, pageNumber=page_number)
+    _index_foods(results.get('foods'))
+    return results
+
+@cached(food_cache, key=lambda fdc_id: int(fdc_id), negative_ttl=NEGATIVE_CACHE_TTL, is_negative=_is_failed_lookup)
+def get_food_details(fdc_id):
+    if snapshot is not None:
+        food = snapshot.get_food(fdc_id)
+        if food is not None:
+            return food
+    if food_batcher is not None:
+        return food_batcher.get(fdc_id)
+    food = client.get(f"/food/{fdc_id}")
+    _index_foods([food])
+    return food
+
+def list_foods(data_type="Survey (FNDDS)", page_size=5, page_number=1):
+    if snapshot is not None and snapshot.has_data_type(data_type):
+        return snapshot.list_foods(data_type, page_size=page_size, page_number=page_number)
+    return client.get("/foods/list", dataType=data_type, pageSize=page_size, pageNumber=page_number)
+
+def get_multiple_foods(fdc_ids):
+    if snapshot is not None:
+        local = {food['fdcId']: food for food in snapshot.get_foods(fdc_ids)}
+        missing = [fdc_id for fdc_id in fdc_ids if int(fdc_id) not in local]
+        if not missing:
+            return [local[int(fdc_id)] for fdc_id in fdc_ids]
+        remote = _fetch_multiple_foods(missing)
+        if not isinstance(remote, list):
+            return remote
+        local.update((food.get('fdcId'), food) for food in remote)
+        return [local[int(fdc_id)] for fdc_id in fdc_ids if int(fdc_id) in local]
+    return _fetch_multiple_foods(fdc_ids)
+
+def _fetch_multiple_foods(fdc_ids):
+    foods = []
+    for start in range(0, len(fdc_ids), MAX_FOODS_PER_REQUEST):
+        chunk = client.post("/foods", {"fdcIds": list(fdc_ids[start:start + MAX_FOODS_PER_REQUEST])})
+        if not isinstance(chunk, list):
+            return chunk
+        foods.extend(chunk)
+    _index_foods(foods)
+    return foods
+
+def get_foods(fdc_ids):
+    """``{fdcId: record}`` for ``fdc_ids``, from ``food_cache`` plus one batched lookup for the rest.
+
+    Ids that are not found, or whose lookup returned an API error, are left out.
+    """
+    found, missing = {}, []
+    for fdc_id in dict.fromkeys(int(fdc_id) for fdc_id in fdc_ids):
+        food = food_cache.get(fdc_id)
+        if isinstance(food, dict) and food.get('foodNutrients'):
+            found[fdc_id] = food
+        else:
+            missing.append(fdc_id)
+    if missing:
+        foods = get_multiple_foods(missing)
+        if not isinstance(foods, list):
+            logger.warning(f"Batch food lookup failed: {foods}")
+            return found
+        for food in foods:
+            if isinstance(food, dict) and food.get('fdcId'):
+                food_cache.set(int(food['fdcId']), food)
+                found[int(food['fdcId'])] = food
+    return found
+
+def analyze_foods(items):
+    """Nutrients for ``[(fdc_id, grams)]``: each item scaled to its weight, and the totals.
+
+    Ids are resolved in one ``get_foods`` call and the scaling and totals are
+    one pass over a ``NutrientMatrix`` with a row per item. Nutrients are in
+    the ``parse_food_details`` shape; items whose food is not found get an
+    ``error`` and are listed in ``missing``.
+    """
+    foods = get_foods([fdc_id for fdc_id, _ in items])
+    matrix = parse_foods(list(foods.values()))
+    row_of = {int(food['fdcId']): i for i, food in enumerate(matrix.foods)}
+
+    found = [i for i, (fdc_id, _) in enumerate(items) if int(fdc_id) in row_of]
+    rows = np.array([row_of[int(items[i][0])] for i in found], dtype=np.intp)
+    factors = np.array([items[i][1] for i in found], dtype=np.float64) / 100
+    basket = NutrientMatrix([matrix.foods[r] for r in rows.tolist()], matrix.columns, matrix.values[rows])
+    scaled = basket.scaled(factors)
+
+    results = [{'fdcId': int(fdc_id), 'grams': grams, 'error': 'Food not found'} for fdc_id, grams in items]
+    for row, i in enumerate(found):
+        results[i] = {**basket.format_row(scaled[row], basket.foods[row]), 'grams': items[i][1]}
+    return {
+        'items': results,
+        'totals': basket.format_row(basket.totals(factors))['nutrients'],
+        'missing': sorted({int(fdc_id) for fdc_id, _ in items} - row_of.keys()),
+    }
+
+# Single-food lookups that miss the cache and snapshot within the same few
+# milliseconds go out together as one POST /foods. USDA_BATCH_WINDOW_MS=0
+# sends each one as its own GET /food/{fdcId}.
+USDA_BATCH_WINDOW_MS = float(os.getenv('USDA_BATCH_WINDOW_MS', 5))
+food_batcher = MicroBatcher(_fetch_multiple_foods, window=USDA_BATCH_WINDOW_MS / 1000) if USDA_BATCH_WINDOW_MS > 0 else None
+
+
+def reset_after_fork():
+    """Rebuild the USDA session and batcher threads in a freshly forked worker.
+
+    The snapshot stays as it is: its arrays are read-only memory maps whose
+    pages the workers are meant to share.
+    """
+    client.reset()
+    if food_batcher is not None:
+        food_batcher.reset()
+
+# Async versions for the ASGI routes; they share the caches above
+@acached(search_cache, key=_search_key, negative_ttl=NEGATIVE_CACHE_TTL, is_negative=_is_failed_search)
+async def asearch_food(query, page_size=5, page_number=1):
+    results = _local_search(query, page_size, page_number)
+    if results is not None:
+        return results
+    results = await async_client.get("/foods/search", query=query, pageSize=page_size, pageNumber=page_number)
+    _index_foods(results.get('foods'))
+    return results
+
+@acached(food_cache, key=lambda fdc_id: int(fdc_id), negative_ttl=NEGATIVE_CACHE_TTL, is_negative=_is_failed_lookup)
+async def aget_food_details(fdc_id):
+    if snapshot is not None:
+        food = snapshot.get_food(fdc_id)
+        if food is not None:
+            return food
+    if food_batcher is not None:
+        return await asyncio.wrap_future(food_batcher.submit(fdc_id))
+    food = await async_client.get(f"/food/{fdc_id}")
+    _index_foods([food])
+    return food
+
+def get_nutrients_by_name(fdc_id, nutrient_name):
+    data = get_food_details(fdc_id)
+    nutrients = data.get("foodNutrients", [])
+    result = {}
+    for nutrient in nutrients:
+        # Search, full and abridged records name nutrients differently
+        _, name, unit, amount = read_nutrient(nutrient)
+        if name and nutrient_name.lower() in name.lower():
+            result[name] = {
+                "value": amount,
+                "unit": unit
+            }
+    return result
+
+def parse_search_results(search_data):
+    foods = search_data.get('foods', [])
+    return [
+        {
+            'id': food.get('fdcId'),
+            'name': food.get('description'),
+            'brand': food.get('brandOwner'),
+            'dataType': food.get('dataType')
+        }
+        for food in foods
+    ]
+
+def parse_food_details(food_data):
+    return parse_foods([food_data]).to_dict(0)
@@ -1,22 +1,68 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, Response, request, jsonify, make_response, g
 from flask_cors import CORS, cross_origin
-from firebase_config import db, auth, create_custom_token, verify_custom_token
-from firebase_admin import firestore
+from firebase_config import auth, create_custom_token, verify_custom_token, token_cache, JWT_SECRET
 from functools import wraps
+import hmac
 import json
-from AI.chat import get_ai_response
-from AI.mealPlanner import generate_meal_plan
-from NutriInsights import search_food, get_food_details, parse_search_results, parse_food_details
-from datetime import datetime, timedelta
+from AI.chat import get_ai_response, stream_ai_response, ERROR_REPLY, chat_context, CHAT_MODEL
+from AI.chatContext import conversation_key
+from AI.answerCache import answer_cache
+from AI.mealPlanner import generate_meal_plan, generate_meal_plan_parallel, MEAL_PLAN_MODEL
+from AI.planCache import meal_plan_cache
+from AI.planVerifier import verify_meal_plan, ingredient_cache
+from AI.localPlanner import generate_local_meal_plan
+from AI.llm import get_model
+import NutriInsights
+from NutriInsights import (search_food, get_food_details, parse_search_results, parse_food_details,
+                           analyze_foods, food_cache, search_cache)
+from datetime import datetime
+import os
+import random
+import time
+import metrics
+from jobs import JobQueue, QueueFull, FINISHED, SUCCEEDED
+from repository import create_store
+from meal_text import parse_meal_text
+from meal_logs import (meal_macros, current_streak, summarize, DAILY_RETENTION_DAYS,
+                       encode_cursor, decode_cursor, date_range, entry_to_dict)
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 app = Flask(__name__)
 
+store = create_store()
+
+MAX_SEARCH_PAGE_SIZE = 50
+MAX_ANALYZE_ITEMS = int(os.getenv('MAX_ANALYZE_ITEMS', 500))
+
+# Requests slower than SLOW_REQUEST_SECONDS are logged with their span
+# breakdown at a rate of SLOW_REQUEST_LOG_RATE (0 disables, 1 logs all)
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', 2.0))
+SLOW_REQUEST_LOG_RATE = float(os.getenv('SLOW_REQUEST_LOG_RATE', 0))
+# /metrics and /api/chat/cache-stats require `Authorization: Bearer <METRICS_TOKEN>`;
+# without a token they are disabled unless METRICS_PUBLIC opts into open scrapes
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', '').lower() in ('1', 'true', 'yes')
+
+for cache_name, cache in [
+    ('usda_food', food_cache),
+    ('usda_search', search_cache),
+    ('auth_token', token_cache),
+    ('user_profile', store.users.cache),
+    ('meal_plan_doc', store.meal_plans.cache),
+    ('meal_plan', meal_plan_cache),
+    ('ingredient', ingredient_cache),
+    ('chat_answer', answer_cache),
+    ('chat_summary', chat_context.summaries),
+]:
+    metrics.register_cache(cache_name, cache)
+
 app.config['CORS_HEADERS'] = 'Content-Type'
 CORS(app, 
      resources={
          r"/*": {
              "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
              "allow_headers": ["Content-Type", "Authorization"],
+             "expose_headers": ["X-Total-Count"],
              "supports_credentials": True
          }
      })
@@ -32,26 +78,124 @@ def handle_auth_error(ex):
     response.status_code = ex.status_code
     return response
 
-def requires_auth(f):
+@app.before_request
+def start_request_trace():
+    g.request_started = time.perf_counter()
+    metrics.start_trace()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streamed responses are measured up to their first byte
+    duration = time.perf_counter() - g.pop('request_started', time.perf_counter())
+    trace = metrics.end_trace()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.http_request_duration.observe(duration, method=request.method, route=route, status=response.status_code)
+    if duration >= SLOW_REQUEST_SECONDS and random.random() < SLOW_REQUEST_LOG_RATE:
+        app.logger.warning(f"Slow request {request.method} {request.path} {response.status_code} "
+                           f"{duration:.3f}s: {metrics.summarize_trace(trace) or 'no spans'}")
+    return response
+
+def requires_metrics_token(f):
+    """Guard process-wide stats with ``METRICS_TOKEN`` rather than a user login."""
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            raise AuthError({
-                'code': 'authorization_header_missing',
-                'description': 'Authorization header is expected.'
-            }, 401)
-            
-        token = auth_header.split(' ')[1]
+        if not METRICS_TOKEN:
+            if not METRICS_PUBLIC:
+                return jsonify({'error': 'Metrics are disabled; set METRICS_TOKEN'}), 403
+        elif not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}"):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return f(*args, **kwargs)
+    return decorated
+
+@app.route('/metrics', methods=['GET'])
+@requires_metrics_token
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the worker is up and answering requests."""
+    return jsonify({'status': 'ok'}), 200
+
+def check_jwt():
+    if not JWT_SECRET:
+        raise ValueError("No JWT_SECRET found in environment variables")
+
+def check_auth():
+    # Looking up an attribute initializes the Firebase app
+    auth.get_user_by_email
+
+def check_usda():
+    if not NutriInsights.API_KEY and NutriInsights.snapshot is None:
+        raise ValueError("No USDA_API_KEY found in environment variables and no FDC snapshot loaded")
+
+def check_llm():
+    get_model(CHAT_MODEL)
+    get_model(MEAL_PLAN_MODEL)
+
+READINESS_CHECKS = [
+    ('jwt', check_jwt),
+    ('datastore', store.backend.ready),
+    ('auth', check_auth),
+    ('usda', check_usda),
+    ('llm', check_llm),
+]
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: configuration is complete and this worker's clients can be built.
+
+    The checks build the lazy Firebase, Firestore and Gemini clients, so a
+    worker that reports ready does not pay for them on its first request.
+    """
+    checks = {}
+    for name, check in READINESS_CHECKS:
         try:
-            payload = verify_custom_token(token)
-            request.current_user = payload
+            check()
+            checks[name] = 'ok'
         except Exception as e:
-            raise AuthError({
-                'code': 'invalid_token',
-                'description': 'The token is invalid or expired.'
-            }, 401)
-            
+            checks[name] = str(e)
+    ready = all(result == 'ok' for result in checks.values())
+    return jsonify({'status': 'ready' if ready else 'not ready', 'checks': checks}), 200 if ready else 503
+
+def wants_event_stream():
+    """True when the client asked for a server-sent events response."""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+def sse_event(data, event=None):
+    message = f"event: {event}\n" if event else ''
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    response = Response(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def authenticate(auth_header):
+    """The token payload for an ``Authorization: Bearer`` header; raises AuthError otherwise."""
+    if not auth_header or not auth_header.startswith('Bearer '):
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is expected.'
+        }, 401)
+
+    token = auth_header.split(' ')[1]
+    try:
+        with metrics.span('auth.verify_token'):
+            return verify_custom_token(token)
+    except Exception as e:
+        raise AuthError({
+            'code': 'invalid_token',
+            'description': 'The token is invalid or expired.'
+        }, 401)
+
+def requires_auth(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        request.current_user = authenticate(request.headers.get('Authorization'))
         return f(*args, **kwargs)
     return decorated
 
@@ -86,12 +230,12 @@ def register():
         user_data = {
             'uid': user.uid,
             'email': data['email'],
-            'created_at': firestore.SERVER_TIMESTAMP,
+            'created_at': store.SERVER_TIMESTAMP,
             'name': data.get('name', ''),
             'healthDetails': health_details
         }
         
-        db.collection('users').document(user.uid).set(user_data)
+        store.users.set(user.uid, user_data)
         
         token = create_custom_token(user.uid)
         
@@ -118,8 +262,7 @@ def login():
         
         token = create_custom_token(user.uid)
         
-        user_doc = db.collection('users').document(user.uid).get()
-        user_data = user_doc.to_dict() if user_doc.exists else {'email': user.email}
+        user_data = store.users.get(user.uid) or {'email': user.email}
         
         return jsonify({
             'token': token,
@@ -138,12 +281,11 @@ def login():
 @requires_auth
 def get_current_user():
     user_id = request.current_user['uid']
-    user_doc = db.collection('users').document(user_id).get()
+    user_data = store.users.get(user_id)
     
-    if not user_doc.exists:
+    if user_data is None:
         return jsonify({'error': 'User not found'}), 404
         
-    user_data = user_doc.to_dict()
     return jsonify(user_data)
 
 @app.route('/api/chat', methods=['POST', 'OPTIONS'])
@@ -166,15 +308,18 @@ def chat():
             
         last_message = chat_history[-1].get('content', '') if chat_history else ''
         
-        user_ref = db.collection('users').document(request.current_user['uid'])
-        user_doc = user_ref.get()
+        user_data = store.users.get(request.current_user['uid'], fields=['healthDetails'])
         
         user_info = None
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
+        if user_data is not None:
             user_info = user_data.get('healthDetails', {})
+
+        conversation_id = conversation_key(request.current_user['uid'], chat_history, data.get('conversationId'))
         
-        ai_response = get_ai_response(chat_history, user_info)
+        if wants_event_stream():
+            return sse_response(stream_chat_events(chat_history, user_info, last_message, conversation_id))
+
+        ai_response = get_ai_response(chat_history, user_info, conversation_id)
         
         return jsonify({
             'reply': ai_response,
@@ -184,44 +329,185 @@ def chat():
         app.logger.error(f"Error in chat endpoint: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/chat/cache-stats', methods=['GET'])
+@requires_metrics_token
+def chat_cache_stats():
+    """Hit rate and model time saved by the answer cache for repeated questions (operators only)."""
+    return jsonify(answer_cache.stats()), 200
+
+def stream_chat_events(chat_history, user_info, last_message, conversation_id=None):
+    """SSE events for a streamed chat reply: `token` chunks, then `done` with the full reply.
+
+    If the client goes away, closing this generator closes the upstream
+    Gemini stream as well.
+    """
+    parts = []
+    tokens = stream_ai_response(chat_history, user_info, conversation_id)
+    try:
+        for token in tokens:
+            parts.append(token)
+            yield sse_event({'token': token}, event='token')
+    except Exception as e:
+        app.logger.error(f"Error streaming chat response: {str(e)}")
+        yield sse_event({'error': ERROR_REPLY}, event='error')
+        return
+    finally:
+        tokens.close()
+    yield sse_event({'reply': ''.join(parts), 'message': last_message}, event='done')
+
+MEAL_PLAN_PARALLEL = os.getenv('MEAL_PLAN_PARALLEL', '').lower() in ('1', 'true', 'yes')
+
+MEAL_PLAN_LLM_TIMEOUT = float(os.getenv('MEAL_PLAN_LLM_TIMEOUT', 60))
+MEAL_PLAN_ENGINES = ('llm', 'local')
+
+# LLM calls run here so a slow model can be abandoned after MEAL_PLAN_LLM_TIMEOUT
+llm_executor = ThreadPoolExecutor(max_workers=int(os.getenv('MEAL_PLAN_LLM_WORKERS', 8)), thread_name_prefix='llm')
+
+def meal_plan_profile(user_data):
+    """``(name, profile)``: the meal plan generator arguments for a user document."""
+    health_details = user_data.get('healthDetails', {})
+
+    profile = {
+        'age': health_details.get('age'),
+        'gender': health_details.get('gender'),
+        'height': health_details.get('height'),
+        'weight': health_details.get('weight'),
+        'diet_preference': health_details.get('dietPreference'),
+        'goal': health_details.get('goal'),
+        'activity_level': health_details.get('activityLevel'),
+        'allergies': health_details.get('allergies', ''),
+    }
+    return user_data.get('name', 'User'), profile
+
+def generate_and_save_meal_plan(user_id, user_data, fresh=False, parallel=MEAL_PLAN_PARALLEL, engine='llm', job=None):
+    """Generate a meal plan for ``user_data`` and store it under ``mealPlans/<user_id>``.
+
+    Plans are reused from the profile-keyed plan cache unless ``fresh`` is set.
+    With ``parallel`` the days are generated concurrently and, when running
+    as a job, each finished day is published in the job's progress.
+    ``engine='local'`` skips the LLM and uses the local planner; the local
+    planner is also the fallback when the LLM fails or takes longer than
+    ``MEAL_PLAN_LLM_TIMEOUT`` seconds. LLM plans are checked against USDA
+    data and the user's calorie target by ``verify_meal_plan`` after the cache
+    lookup, so the cached plan, shared by similar profiles, holds no per-user
+    targets.
+    """
+    name, profile = meal_plan_profile(user_data)
+
+    def generate():
+        if parallel:
+            on_day = job.report if job is not None else None
+            meal_plan_json = generate_meal_plan_parallel(name=name, on_day=on_day, **profile)
+        else:
+            meal_plan_json = generate_meal_plan(name=name, **profile)
+        return json.loads(meal_plan_json)
+
+    if engine == 'local':
+        meal_plan_data = json.loads(generate_local_meal_plan(name=name, **profile))
+    else:
+        future = llm_executor.submit(metrics.propagate(meal_plan_cache.get_or_generate), profile, generate, fresh=fresh)
+        try:
+            meal_plan_data, from_cache = future.result(timeout=MEAL_PLAN_LLM_TIMEOUT)
+            if from_cache:
+                app.logger.info("Served meal plan for %s from the plan cache", user_id)
+        except Exception as e:
+            # Local plans are not cached, so the next request tries the LLM again
+            reason = 'timed out' if isinstance(e, FutureTimeout) else f"failed: {str(e)}"
+            app.logger.error(f"LLM meal plan for {user_id} {reason}, using the local planner")
+            meal_plan_data = json.loads(generate_local_meal_plan(name=name, **profile))
+        else:
+            # A failed check (e.g. USDA unreachable) leaves the LLM plan unverified, not replaced
+            try:
+                meal_plan_data = verify_meal_plan(meal_plan_data, profile)
+            except Exception as e:
+                app.logger.warning(f"Could not verify meal plan for {user_id}: {str(e)}")
+
+    store.meal_plans.set(user_id, meal_plan_data)
+
+    return meal_plan_data
+
+# A queued or running job whose mirrored status is older than this is taken
+# to have died with its worker, and a new one may start for the user
+MEAL_PLAN_JOB_STALE = int(os.getenv('MEAL_PLAN_JOB_STALE', 600))
+# How often an events stream for another worker's job re-reads its status
+JOB_STATUS_POLL_SECONDS = 2
+
+def job_status(job):
+    status = {'uid': job.owner, 'status': job.status, 'updatedAt': job.updated_at}
+    if job.error:
+        status['error'] = job.error
+    return status
+
+def save_job_status(job):
+    """Mirror job status to Firestore so any worker can answer a status poll."""
+    store.meal_plan_jobs.set(job.id, job_status(job))
+
+def claim_job(user_id, job):
+    """Start at most one meal plan job per user across all workers."""
+    return store.meal_plan_jobs.claim(user_id, job.id, job_status(job), MEAL_PLAN_JOB_STALE)
+
+meal_plan_jobs = JobQueue(
+    max_workers=int(os.getenv('MEAL_PLAN_WORKERS', 4)),
+    max_pending=int(os.getenv('MEAL_PLAN_MAX_PENDING', 32)),
+    on_update=save_job_status,
+    claim=claim_job,
+)
+
+def wants_async():
+    """True when the client asked for a job id instead of waiting for the result."""
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def job_urls(job_id):
+    return {
+        'statusUrl': f"/api/meal-plan/jobs/{job_id}",
+        'eventsUrl': f"/api/meal-plan/jobs/{job_id}/events",
+    }
+
 @app.route('/api/generate-meal-plan', methods=['POST'])
 @requires_auth
 def create_meal_plan():
+    """Generate and save a meal plan.
+
+    With ``?async=1`` (or ``Prefer: respond-async``) the plan is generated in
+    the background and a job id is returned with 202; a second request while
+    that job is still running gets the same job back. ``?fresh=1`` always
+    generates a new plan instead of reusing one for a similar profile, and
+    ``?parallel=1`` generates the days concurrently (partial days show up in
+    the job's ``progress``). ``?engine=local`` builds the plan with the local
+    planner in milliseconds instead of asking the LLM.
+    """
     try:
         user_id = request.current_user['uid']
-        user_doc = db.collection('users').document(user_id).get()
+        user_data = store.users.get(user_id, fields=['name', 'healthDetails'])
 
-        if not user_doc.exists:
+        if user_data is None:
             return jsonify({'error': 'User not found'}), 404
 
-        user_data = user_doc.to_dict()
-        health_details = user_data.get('healthDetails', {})
-
-        name = user_data.get('name', 'User')
-        age = health_details.get('age')
-        gender = health_details.get('gender')
-        height = health_details.get('height')
-        weight = health_details.get('weight')
-        diet_preference = health_details.get('dietPreference')
-        goal = health_details.get('goal')
-        activity_level = health_details.get('activityLevel')
-        allergies = health_details.get('allergies', '')
-
-        meal_plan_json = generate_meal_plan(
-            name=name,
-            age=age,
-            gender=gender,
-            height=height,
-            weight=weight,
-            diet_preference=diet_preference,
-            goal=goal,
-            activity_level=activity_level,
-            allergies=allergies
-        )
-
-        meal_plan_data = json.loads(meal_plan_json)
-
-        db.collection('mealPlans').document(user_id).set(meal_plan_data)
+        fresh = request.args.get('fresh', '').lower() in ('1', 'true', 'yes')
+        parallel = request.args.get('parallel', str(MEAL_PLAN_PARALLEL)).lower() in ('1', 'true', 'yes')
+        engine = request.args.get('engine', 'llm').lower()
+        if engine not in MEAL_PLAN_ENGINES:
+            return jsonify({'error': f"engine must be one of {', '.join(MEAL_PLAN_ENGINES)}"}), 400
+
+        if wants_async():
+            try:
+                job, created = meal_plan_jobs.submit(
+                    user_id, generate_and_save_meal_plan, user_id, user_data,
+                    fresh=fresh, parallel=parallel, engine=engine, owner=user_id
+                )
+            except QueueFull:
+                response = jsonify({'error': 'Too many meal plans are being generated, please retry shortly'})
+                response.headers['Retry-After'] = '10'
+                return response, 503
+            return jsonify({
+                'message': 'Meal plan generation started' if created else 'Meal plan generation already in progress',
+                **job.to_dict(),
+                **job_urls(job.id),
+            }), 202
+
+        meal_plan_data = generate_and_save_meal_plan(user_id, user_data, fresh=fresh, parallel=parallel, engine=engine)
 
         return jsonify({'message': 'Meal plan generated and saved successfully', 'meal_plan': meal_plan_data}), 200
 
@@ -229,17 +515,93 @@ def create_meal_plan():
         app.logger.error(f"Error in meal plan generation: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+@app.route('/api/meal-plan/jobs/<job_id>', methods=['GET'])
+@requires_auth
+def get_meal_plan_job(job_id):
+    """Poll a meal plan job started with ``/api/generate-meal-plan?async=1``."""
+    try:
+        user_id = request.current_user['uid']
+        job = meal_plan_jobs.get(job_id)
+        if job is not None:
+            if job.owner != user_id:
+                return jsonify({'error': 'Job not found'}), 404
+            return jsonify(job.to_dict()), 200
+
+        # Started by another worker process: report the status it stored
+        status = store.meal_plan_jobs.get(job_id)
+        if status is None or status.get('uid') != user_id:
+            return jsonify({'error': 'Job not found'}), 404
+        status.pop('uid', None)
+        return jsonify({'jobId': job_id, **status}), 200
+
+    except Exception as e:
+        app.logger.error(f"Error fetching meal plan job: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+@app.route('/api/meal-plan/jobs/<job_id>/events', methods=['GET'])
+@requires_auth
+def meal_plan_job_events(job_id):
+    """Server-sent `status` events for a meal plan job until it finishes."""
+    job = meal_plan_jobs.get(job_id)
+    if job is None:
+        return mirrored_job_events(job_id, request.current_user['uid'])
+    if job.owner != request.current_user['uid']:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def events():
+        version = job.version
+        yield sse_event(job.to_dict(), event='status')
+        while not job.finished:
+            new_version = job.wait(version, timeout=15)
+            if new_version == version:
+                yield ': keep-alive\n\n'
+                continue
+            version = new_version
+            yield sse_event(job.to_dict(), event='status')
+
+    return sse_response(events())
+
+def mirrored_job_events(job_id, user_id):
+    """Events for a job started by another worker, polled from its mirrored status.
+
+    The mirror has no partial days, so only status changes are sent; the
+    saved plan is added as ``result`` once the job succeeds.
+    """
+    status = store.meal_plan_jobs.get(job_id)
+    if status is None or status.get('uid') != user_id:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def events():
+        current, sent, idle = status, None, 0
+        while True:
+            if current != sent:
+                data = {'jobId': job_id, **{name: value for name, value in current.items() if name != 'uid'}}
+                if current.get('status') == SUCCEEDED:
+                    data['result'] = store.meal_plans.get(user_id)
+                yield sse_event(data, event='status')
+                sent, idle = current, 0
+            if current.get('status') in FINISHED or current.get('updatedAt', 0) < time.time() - MEAL_PLAN_JOB_STALE:
+                return
+            time.sleep(JOB_STATUS_POLL_SECONDS)
+            idle += JOB_STATUS_POLL_SECONDS
+            if idle >= 15:
+                yield ': keep-alive\n\n'
+                idle = 0
+            current = store.meal_plan_jobs.get(job_id) or current
+
+    return sse_response(events())
+
 @app.route('/api/meal-plan', methods=['GET'])
 @requires_auth
 def get_meal_plan():
     try:
         user_id = request.current_user['uid']
-        meal_plan_doc = db.collection('mealPlans').document(user_id).get()
+        meal_plan = store.meal_plans.get(user_id)
 
-        if not meal_plan_doc.exists:
+        if meal_plan is None:
             return jsonify({'error': 'Meal plan not found'}), 404
 
-        return jsonify(meal_plan_doc.to_dict()), 200
+        return jsonify(meal_plan), 200
 
     except Exception as e:
         app.logger.error(f"Error fetching meal plan: {str(e)}")
@@ -250,14 +612,22 @@ def search_food_route():
     query = request.args.get('q')
     if not query:
         return jsonify({'error': 'Query parameter "q" is required'}), 400
+
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('pageSize', 5, type=int)
+    if page < 1 or not 1 <= page_size <= MAX_SEARCH_PAGE_SIZE:
+        return jsonify({'error': f'"page" must be >= 1 and "pageSize" between 1 and {MAX_SEARCH_PAGE_SIZE}'}), 400
     
     try:
-        search_results = search_food(query)
+        search_results = search_food(query, page_size=page_size, page_number=page)
         if 'error' in search_results or 'errors' in search_results:
              return jsonify({'error': 'Error from external API', 'details': search_results}), 502
         
         parsed_results = parse_search_results(search_results)
-        return jsonify(parsed_results)
+        response = jsonify(parsed_results)
+        if 'totalHits' in search_results:
+            response.headers['X-Total-Count'] = str(search_results['totalHits'])
+        return response
 
     except Exception as e:
         app.logger.error(f"Error in food search: {str(e)}")
@@ -277,51 +647,65 @@ def get_food_details_route(fdc_id):
         app.logger.error(f"Error fetching food details: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/nutrition/analyze', methods=['POST'])
+def analyze_nutrition_route():
+    """Nutrients of a recipe or basket: `{"items": [{"fdcId": 171705, "grams": 150}, ...]}`.
+    Returns each item's nutrients for its weight and the totals over all items, in the
+    `/api/nutrition/food` shape; ids that are not found are listed under `missing`.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Body must have a non-empty "items" list of {"fdcId", "grams"}'}), 400
+    if len(items) > MAX_ANALYZE_ITEMS:
+        return jsonify({'error': f'At most {MAX_ANALYZE_ITEMS} items per request'}), 400
+    try:
+        items = [(int(item['fdcId']), float(item['grams'])) for item in items]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Every item needs an integer "fdcId" and a numeric "grams"'}), 400
+    if not all(0 <= grams < float('inf') for _, grams in items):
+        return jsonify({'error': '"grams" must be a non-negative number'}), 400
+
+    try:
+        return jsonify(analyze_foods(items))
+    except Exception as e:
+        app.logger.error(f"Error analyzing foods: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+STREAK_FIELDS = ['last_logged_date', 'current_streak']
+
 @app.route('/api/log-meal', methods=['POST'])
 @requires_auth
 def log_meal():
-    """Log that the user has consumed at least one meal today and update their streak.
+    """Log a meal, update the user's streak and roll its macros into the daily and weekly totals.
     Expected JSON body can optionally include `meal` details, but is not required for streak.
+    Calories, protein, carbs and fat in the body (or its `nutrients`) count towards the totals.
+    A free-text `text` ("2 roti, 1 cup dal and a banana") is parsed into `items`, and their
+    macros are used as `nutrients` when the body gives none.
     """
     try:
         user_id = request.current_user['uid']
         today = datetime.utcnow().date()
+        meal = request.get_json(silent=True) or {}
 
-        log_ref = db.collection('mealLogs').document(user_id)
-        log_doc = log_ref.get()
-
-        if log_doc.exists:
-            data = log_doc.to_dict()
-            last_logged = data.get('last_logged_date')
-            current_streak = data.get('current_streak', 0)
-
-            if last_logged:
-                last_logged_date = last_logged.date() if isinstance(last_logged, datetime) else datetime.strptime(last_logged, "%Y-%m-%d").date()
-            else:
-                last_logged_date = None
-
-            if last_logged_date == today:
-                return jsonify({'message': 'Meal already logged today', 'streak': current_streak}), 200
-            elif last_logged_date == today - timedelta(days=1):
-                current_streak += 1
-            else:
-                current_streak = 1
-        else:
-            current_streak = 1
+        parsed = None
+        if isinstance(meal.get('text'), str) and meal['text'].strip():
+            parsed = parse_meal_text(meal['text'])
+            meal = {**meal, 'items': parsed['items']}
+            if not any(meal_macros(meal).values()):
+                meal['nutrients'] = parsed['nutrients']
 
         log_entry = {
-            'timestamp': firestore.SERVER_TIMESTAMP,
-            'meal': request.get_json(silent=True) or {}
+            'timestamp': store.SERVER_TIMESTAMP,
+            'meal': meal
         }
 
-        log_ref.set({
-            'last_logged_date': today.isoformat(),
-            'current_streak': current_streak,
-        }, merge=True)
-
-        log_ref.collection('entries').add(log_entry)
+        streak, first_today = store.meal_logs.log(user_id, log_entry, today, meal_macros(meal))
 
-        return jsonify({'message': 'Meal logged', 'streak': current_streak}), 200
+        response = {'message': 'Meal logged' if first_today else 'Meal already logged today', 'streak': streak}
+        if parsed is not None:
+            response.update(items=parsed['items'], nutrients=meal_macros(meal), unmatched=parsed['unmatched'])
+        return jsonify(response), 200
     except Exception as e:
         app.logger.error(f"Error logging meal: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -333,25 +717,90 @@ def get_streak():
     """Return the user's current meal logging streak in days."""
     try:
         user_id = request.current_user['uid']
-        log_doc = db.collection('mealLogs').document(user_id).get()
-        if not log_doc.exists:
-            return jsonify({'streak': 0}), 200
-
-        data = log_doc.to_dict()
-        current_streak = data.get('current_streak', 0)
-        last_logged = data.get('last_logged_date')
-
-        if last_logged:
-            last_logged_date = last_logged.date() if isinstance(last_logged, datetime) else datetime.strptime(last_logged, "%Y-%m-%d").date()
-            today = datetime.utcnow().date()
-            if last_logged_date < today - timedelta(days=1):
-                current_streak = 0
-                db.collection('mealLogs').document(user_id).update({'current_streak': 0})
-
-        return jsonify({'streak': current_streak}), 200
+        data = store.meal_logs.get(user_id, fields=STREAK_FIELDS)
+        return jsonify({'streak': current_streak(data, datetime.utcnow().date())}), 200
     except Exception as e:
         app.logger.error(f"Error fetching streak: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+@app.route('/api/meal-logs/summary', methods=['GET'])
+@requires_auth
+def get_meal_log_summary():
+    """Streak plus today's, this week's and the last `days` (default 7, max 35) days' nutrition totals."""
+    try:
+        user_id = request.current_user['uid']
+        days = min(max(request.args.get('days', 7, type=int), 1), DAILY_RETENTION_DAYS)
+        data = store.meal_logs.get(user_id)
+        return jsonify(summarize(data, datetime.utcnow().date(), days=days)), 200
+    except Exception as e:
+        app.logger.error(f"Error fetching meal log summary: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+MAX_HISTORY_PAGE_SIZE = 100
+
+def history_args(default_order='desc'):
+    """Validated `from`/`to` dates and `order` shared by the history routes."""
+    start, end = date_range(request.args.get('from'), request.args.get('to'))
+    order = request.args.get('order', default_order).lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be asc or desc')
+    return start, end, order == 'desc'
+
+@app.route('/api/meal-logs', methods=['GET'])
+@requires_auth
+def get_meal_logs():
+    """Page through logged meals, newest first.
+
+    Query params: `limit` (default 20, max 100), `cursor` (the previous page's
+    `nextCursor`), `from`/`to` (inclusive YYYY-MM-DD, UTC) and `order`
+    (`desc` or `asc`).
+    """
+    try:
+        user_id = request.current_user['uid']
+        try:
+            start, end, descending = history_args()
+            limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_HISTORY_PAGE_SIZE)
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # One extra entry tells whether there is another page
+        page = store.meal_logs.entries(user_id, start, end, after, limit + 1, descending)
+        entries = [entry_to_dict(entry_id, entry) for entry_id, entry in page[:limit]]
+
+        next_cursor = None
+        if len(page) > limit:
+            entry_id, entry = page[limit - 1]
+            next_cursor = encode_cursor(entry['timestamp'], entry_id)
+
+        return jsonify({'entries': entries, 'nextCursor': next_cursor}), 200
+    except Exception as e:
+        app.logger.error(f"Error fetching meal logs: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+@app.route('/api/meal-logs/export', methods=['GET'])
+@requires_auth
+def export_meal_logs():
+    """Stream every logged meal in range as NDJSON, oldest first unless `order=desc`."""
+    user_id = request.current_user['uid']
+    try:
+        start, end, descending = history_args(default_order='asc')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def lines():
+        try:
+            for entry_id, entry in store.meal_logs.iter_entries(user_id, start, end, descending):
+                yield json.dumps(entry_to_dict(entry_id, entry)) + '\n'
+        except Exception as e:
+            app.logger.error(f"Error exporting meal logs: {str(e)}")
+            yield json.dumps({'error': 'Export interrupted'}) + '\n'
+
+    response = Response(lines(), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename="meal-logs.ndjson"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0')
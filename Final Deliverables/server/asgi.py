@@ -0,0 +1,259 @@
+"""ASGI entry point: LLM- and USDA-bound routes on an event loop, the rest through Flask.
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:app --workers 2 --host 0.0.0.0 --port 5000
+
+``/api/chat``, ``/api/generate-meal-plan`` and the two nutrition routes are
+served by the coroutines below. They await Gemini (``ainvoke``/``astream``)
+and the USDA API (httpx) instead of holding a thread per request, so a
+process can keep thousands of requests waiting on the model. Firestore goes
+through the same ``store`` in a worker thread (``asyncio.to_thread``), and
+most profile reads are answered by its cache. Every other route, plus CORS
+preflight requests, is the Flask app mounted as WSGI. The coroutines reuse
+its store, caches, job queue, authentication and response shapes, so the
+two entry points behave the same.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import metrics
+from app import (app as flask_app, store, AuthError, authenticate, sse_event, meal_plan_profile, meal_plan_jobs,
+                 job_urls, QueueFull, MAX_SEARCH_PAGE_SIZE, MEAL_PLAN_ENGINES, MEAL_PLAN_PARALLEL,
+                 MEAL_PLAN_LLM_TIMEOUT, generate_and_save_meal_plan)
+from AI.chat import aget_ai_response, astream_ai_response, ERROR_REPLY
+from AI.chatContext import conversation_key
+from AI.localPlanner import generate_local_meal_plan
+from AI.mealPlanner import agenerate_meal_plan, agenerate_meal_plan_parallel
+from AI.planCache import meal_plan_cache
+from AI.planVerifier import verify_meal_plan
+from NutriInsights import asearch_food, aget_food_details, parse_search_results, parse_food_details, async_client
+
+logger = logging.getLogger(__name__)
+
+# Threads serving the mounted Flask routes
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 16))
+
+routes = []
+
+
+def _flag(request, name, default=''):
+    return request.query_params.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+def _int_arg(request, name, default):
+    # Like Flask's request.args.get(name, default, type=int)
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        return default
+
+
+def _cors(request, response):
+    # Same policy as flask_cors in app.py: any origin, with credentials
+    origin = request.headers.get('Origin')
+    if origin:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Access-Control-Allow-Credentials'] = 'true'
+        response.headers['Access-Control-Expose-Headers'] = 'X-Total-Count'
+        response.headers['Vary'] = 'Origin'
+    return response
+
+
+def route(path, methods):
+    """Register an async view, answering AuthError like Flask does and recording request metrics."""
+    def decorator(endpoint):
+        async def view(request):
+            started = time.perf_counter()
+            try:
+                response = await endpoint(request)
+            except AuthError as e:
+                response = JSONResponse(e.error, status_code=e.status_code)
+            metrics.http_request_duration.observe(time.perf_counter() - started, method=request.method,
+                                                  route=path, status=response.status_code)
+            return _cors(request, response)
+
+        routes.append(Route(path, view, methods=methods))
+        return endpoint
+    return decorator
+
+
+def sse_response(events):
+    return StreamingResponse(events, media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def stream_chat_events(chat_history, user_info, last_message, conversation_id=None):
+    """``app.stream_chat_events`` over the async Gemini stream."""
+    parts = []
+    tokens = astream_ai_response(chat_history, user_info, conversation_id)
+    try:
+        async for token in tokens:
+            parts.append(token)
+            yield sse_event({'token': token}, event='token')
+    except Exception as e:
+        logger.error(f"Error streaming chat response: {str(e)}")
+        yield sse_event({'error': ERROR_REPLY}, event='error')
+        return
+    finally:
+        await tokens.aclose()
+    yield sse_event({'reply': ''.join(parts), 'message': last_message}, event='done')
+
+
+@route('/api/chat', methods=['POST'])
+async def chat(request):
+    user = authenticate(request.headers.get('Authorization'))
+    try:
+        data = await request.json()
+        chat_history = data.get('messages', [])
+
+        if not chat_history:
+            return JSONResponse({'error': 'No messages provided'}, status_code=400)
+
+        last_message = chat_history[-1].get('content', '')
+
+        user_data = await asyncio.to_thread(store.users.get, user['uid'], fields=['healthDetails'])
+        user_info = user_data.get('healthDetails', {}) if user_data is not None else None
+
+        conversation_id = conversation_key(user['uid'], chat_history, data.get('conversationId'))
+
+        if _flag(request, 'stream') or 'text/event-stream' in request.headers.get('Accept', ''):
+            return sse_response(stream_chat_events(chat_history, user_info, last_message, conversation_id))
+
+        ai_response = await aget_ai_response(chat_history, user_info, conversation_id)
+        return JSONResponse({'reply': ai_response, 'message': last_message})
+    except Exception as e:
+        logger.error(f"Error in chat endpoint: {str(e)}")
+        return JSONResponse({'error': 'Internal server error'}, status_code=500)
+
+
+async def agenerate_and_save_meal_plan(user_id, user_data, fresh=False, parallel=MEAL_PLAN_PARALLEL, engine='llm'):
+    """``app.generate_and_save_meal_plan`` awaiting the LLM; same cache, verification, timeout and local fallback."""
+    name, profile = meal_plan_profile(user_data)
+
+    async def agenerate():
+        if parallel:
+            meal_plan_json = await agenerate_meal_plan_parallel(name=name, **profile)
+        else:
+            meal_plan_json = await agenerate_meal_plan(name=name, **profile)
+        return json.loads(meal_plan_json)
+
+    if engine == 'local':
+        meal_plan_data = json.loads(await asyncio.to_thread(generate_local_meal_plan, name=name, **profile))
+    else:
+        try:
+            # On timeout the shared generation keeps running and still fills the plan cache
+            meal_plan_data, from_cache = await asyncio.wait_for(
+                meal_plan_cache.aget_or_generate(profile, agenerate, fresh=fresh), MEAL_PLAN_LLM_TIMEOUT)
+            if from_cache:
+                logger.info("Served meal plan for %s from the plan cache", user_id)
+        except Exception as e:
+            reason = 'timed out' if isinstance(e, asyncio.TimeoutError) else f"failed: {str(e)}"
+            logger.error(f"LLM meal plan for {user_id} {reason}, using the local planner")
+            meal_plan_data = json.loads(await asyncio.to_thread(generate_local_meal_plan, name=name, **profile))
+        else:
+            try:
+                meal_plan_data = await asyncio.to_thread(verify_meal_plan, meal_plan_data, profile)
+            except Exception as e:
+                logger.warning(f"Could not verify meal plan for {user_id}: {str(e)}")
+
+    await asyncio.to_thread(store.meal_plans.set, user_id, meal_plan_data)
+    return meal_plan_data
+
+
+@route('/api/generate-meal-plan', methods=['POST'])
+async def create_meal_plan(request):
+    """``app.create_meal_plan``; ``?async=1`` jobs still run on the shared job queue."""
+    user = authenticate(request.headers.get('Authorization'))
+    try:
+        user_id = user['uid']
+        user_data = await asyncio.to_thread(store.users.get, user_id, fields=['name', 'healthDetails'])
+
+        if user_data is None:
+            return JSONResponse({'error': 'User not found'}, status_code=404)
+
+        fresh = _flag(request, 'fresh')
+        parallel = _flag(request, 'parallel', str(MEAL_PLAN_PARALLEL))
+        engine = request.query_params.get('engine', 'llm').lower()
+        if engine not in MEAL_PLAN_ENGINES:
+            return JSONResponse({'error': f"engine must be one of {', '.join(MEAL_PLAN_ENGINES)}"}, status_code=400)
+
+        if _flag(request, 'async') or 'respond-async' in request.headers.get('Prefer', ''):
+            try:
+                job, created = await asyncio.to_thread(
+                    meal_plan_jobs.submit, user_id, generate_and_save_meal_plan, user_id, user_data,
+                    fresh=fresh, parallel=parallel, engine=engine, owner=user_id
+                )
+            except QueueFull:
+                return JSONResponse({'error': 'Too many meal plans are being generated, please retry shortly'},
+                                    status_code=503, headers={'Retry-After': '10'})
+            return JSONResponse({
+                'message': 'Meal plan generation started' if created else 'Meal plan generation already in progress',
+                **job.to_dict(),
+                **job_urls(job.id),
+            }, status_code=202)
+
+        meal_plan_data = await agenerate_and_save_meal_plan(user_id, user_data, fresh=fresh, parallel=parallel,
+                                                            engine=engine)
+        return JSONResponse({'message': 'Meal plan generated and saved successfully', 'meal_plan': meal_plan_data})
+
+    except Exception as e:
+        logger.error(f"Error in meal plan generation: {str(e)}")
+        return JSONResponse({'error': 'Internal server error', 'details': str(e)}, status_code=500)
+
+
+@route('/api/nutrition/search', methods=['GET'])
+async def search_food_route(request):
+    query = request.query_params.get('q')
+    if not query:
+        return JSONResponse({'error': 'Query parameter "q" is required'}, status_code=400)
+
+    page = _int_arg(request, 'page', 1)
+    page_size = _int_arg(request, 'pageSize', 5)
+    if page < 1 or not 1 <= page_size <= MAX_SEARCH_PAGE_SIZE:
+        return JSONResponse({'error': f'"page" must be >= 1 and "pageSize" between 1 and {MAX_SEARCH_PAGE_SIZE}'},
+                            status_code=400)
+
+    try:
+        search_results = await asearch_food(query, page_size=page_size, page_number=page)
+        if 'error' in search_results or 'errors' in search_results:
+            return JSONResponse({'error': 'Error from external API', 'details': search_results}, status_code=502)
+
+        headers = {'X-Total-Count': str(search_results['totalHits'])} if 'totalHits' in search_results else None
+        return JSONResponse(parse_search_results(search_results), headers=headers)
+
+    except Exception as e:
+        logger.error(f"Error in food search: {str(e)}")
+        return JSONResponse({'error': 'Internal server error'}, status_code=500)
+
+
+@route('/api/nutrition/food/{fdc_id:int}', methods=['GET'])
+async def get_food_details_route(request):
+    try:
+        food_details = await aget_food_details(request.path_params['fdc_id'])
+        if food_details.get('Error') or food_details.get('error'):
+            return JSONResponse({'error': 'Food not found or API error', 'details': food_details}, status_code=404)
+
+        return JSONResponse(parse_food_details(food_details))
+
+    except Exception as e:
+        logger.error(f"Error fetching food details: {str(e)}")
+        return JSONResponse({'error': 'Internal server error'}, status_code=500)
+
+
+@asynccontextmanager
+async def lifespan(_):
+    yield
+    await async_client.aclose()
+
+
+# Routes above take precedence; a method they do not handle (OPTIONS) falls through to Flask
+app = Starlette(routes=routes + [Mount('/', WSGIMiddleware(flask_app, workers=WSGI_THREADS))], lifespan=lifespan)
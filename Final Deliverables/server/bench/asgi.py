@@ -0,0 +1,3 @@
+"""``bench.wsgi`` served through ``asgi.py``: ``uvicorn bench.asgi:app``."""
+import bench.wsgi  # noqa: F401  configures the environment, installs the fakes and seeds data
+from asgi import app  # noqa: E402,F401
@@ -0,0 +1,241 @@
+"""Deterministic stand-ins for Gemini, the USDA API and Firebase Auth.
+
+- ``FakeChatModel`` has the ``invoke``/``stream``/``ainvoke``/``astream`` surface of
+  ``ChatGoogleGenerativeAI``. It waits ``latency`` seconds before the first
+  token, then produces ``tokens_per_second`` tokens per second. Meal plan
+  prompts get valid plans from the local planner.
+- ``FakeUSDAServer`` is an HTTP server with the FoodData Central routes the
+  app calls, answering after ``latency`` seconds with generated foods.
+- ``FakeAuth`` replaces ``firebase_admin.auth`` user lookups.
+
+Firestore is replaced by the in-memory repository backend
+(``DATA_BACKEND=memory``).
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+WORDS = (
+    "protein fiber balanced meals vegetables whole grains lentils yogurt portion hydration breakfast "
+    "calories energy recovery snacks nuts seeds fruit timing consistency sleep moderation"
+).split()
+
+FOOD_WORDS = (
+    "apple banana rice oats lentil chickpea paneer tofu chicken egg spinach almond yogurt milk "
+    "bread potato tomato salmon quinoa peanut"
+).split()
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+class _Message:
+    def __init__(self, content, usage=None):
+        self.content = content
+        self.usage_metadata = usage or {}
+
+
+class FakeChatModel:
+    def __init__(self, latency=0.2, tokens_per_second=400.0, reply_tokens=120):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _reply(self, messages):
+        prompt = ''.join(str(m.content) for m in messages)
+        with self._lock:
+            self.calls += 1
+        if '"mealPlan"' in prompt:
+            return json.dumps(json.loads(_week_plan()))
+        day = re.search(r"create the (\w+) meals", prompt)
+        if day:
+            return json.dumps(json.loads(_week_plan())['mealPlan'][day.group(1)])
+        seed = int(hashlib.sha1(prompt.encode('utf-8')).hexdigest(), 16)
+        return ' '.join(WORDS[(seed >> (i % 64)) % len(WORDS)] for i in range(self.reply_tokens)) + '.'
+
+    def _usage(self, messages, reply):
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = estimate_tokens(reply)
+        return {'input_tokens': prompt_tokens, 'output_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens}
+
+    def invoke(self, messages, **kwargs):
+        reply = self._reply(messages)
+        time.sleep(self.latency + estimate_tokens(reply) / self.tokens_per_second)
+        return _Message(reply, self._usage(messages, reply))
+
+    def stream(self, messages, **kwargs):
+        reply = self._reply(messages)
+        time.sleep(self.latency)
+        words = reply.split(' ')
+        for i in range(0, len(words), 4):
+            chunk = ' '.join(words[i:i + 4]) + ('' if i + 4 >= len(words) else ' ')
+            time.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield _Message(chunk)
+
+    async def ainvoke(self, messages, **kwargs):
+        reply = self._reply(messages)
+        await asyncio.sleep(self.latency + estimate_tokens(reply) / self.tokens_per_second)
+        return _Message(reply, self._usage(messages, reply))
+
+    async def astream(self, messages, **kwargs):
+        reply = self._reply(messages)
+        await asyncio.sleep(self.latency)
+        words = reply.split(' ')
+        for i in range(0, len(words), 4):
+            chunk = ' '.join(words[i:i + 4]) + ('' if i + 4 >= len(words) else ' ')
+            await asyncio.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield _Message(chunk)
+
+
+_plan = None
+
+
+def _week_plan():
+    global _plan
+    if _plan is None:
+        from AI.localPlanner import generate_local_meal_plan
+        _plan = generate_local_meal_plan(age=30, gender='Female', height=165, weight=60,
+                                         diet_preference='Vegetarian', goal='Maintenance',
+                                         activity_level='Moderately Active', allergies='None')
+    return _plan
+
+
+def fake_food(fdc_id):
+    """A USDA-style food record that is the same for the same id."""
+    fdc_id = int(fdc_id)
+    name = f"{FOOD_WORDS[fdc_id % len(FOOD_WORDS)].title()}, {FOOD_WORDS[(fdc_id // 7) % len(FOOD_WORDS)]} style"
+    base = fdc_id % 97
+    nutrients = [
+        (1008, '208', 'Energy', 'KCAL', 50 + base * 3),
+        (1003, '203', 'Protein', 'G', 1 + base % 25),
+        (1004, '204', 'Total lipid (fat)', 'G', base % 20),
+        (1005, '205', 'Carbohydrate, by difference', 'G', 5 + base % 60),
+        (1079, '291', 'Fiber, total dietary', 'G', base % 9),
+        (1087, '301', 'Calcium, Ca', 'MG', 10 + base),
+        (1089, '303', 'Iron, Fe', 'MG', (base % 10) / 2),
+        (1162, '401', 'Vitamin C, total ascorbic acid', 'MG', base % 40),
+    ]
+    return {
+        'fdcId': fdc_id,
+        'description': name,
+        'dataType': 'Foundation',
+        'brandOwner': None,
+        'foodNutrients': [
+            {'nutrient': {'id': nid, 'number': number, 'name': label, 'unitName': unit}, 'amount': amount}
+            for nid, number, label, unit, amount in nutrients
+        ],
+    }
+
+
+def _search_food(fdc_id):
+    food = fake_food(fdc_id)
+    return {
+        'fdcId': food['fdcId'],
+        'description': food['description'],
+        'dataType': food['dataType'],
+        'foodNutrients': [
+            {'nutrientId': n['nutrient']['id'], 'nutrientNumber': n['nutrient']['number'],
+             'nutrientName': n['nutrient']['name'], 'unitName': n['nutrient']['unitName'], 'value': n['amount']}
+            for n in food['foodNutrients']
+        ],
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections under benchmark concurrency
+    request_queue_size = 1024
+
+
+class FakeUSDAServer:
+    """FoodData Central on localhost: ``/foods/search``, ``/food/<id>``, ``/foods``, ``/foods/list``."""
+
+    def __init__(self, latency=0.05, host='127.0.0.1', port=0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path.endswith('/foods/search'):
+                    seed = int(hashlib.sha1(query.get('query', '').encode()).hexdigest()[:8], 16)
+                    size = int(query.get('pageSize', 5))
+                    page = int(query.get('pageNumber', 1))
+                    ids = [100000 + (seed + i) % 50000 for i in range((page - 1) * size, page * size)]
+                    self._send({'totalHits': 50, 'currentPage': page, 'foods': [_search_food(i) for i in ids]})
+                elif url.path.endswith('/foods/list'):
+                    size = int(query.get('pageSize', 50))
+                    self._send([_search_food(100000 + i) for i in range(size)])
+                elif '/food/' in url.path:
+                    self._send(fake_food(url.path.rsplit('/', 1)[-1]))
+                else:
+                    self._send({'error': 'Not found'}, 404)
+
+            def do_POST(self):
+                time.sleep(server.latency)
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                self._send([fake_food(fdc_id) for fdc_id in payload.get('fdcIds', [])])
+
+        self.latency = latency
+        self.httpd = _Server((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/fdc/v1"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+class _User:
+    def __init__(self, uid, email):
+        self.uid = uid
+        self.email = email
+
+
+class FakeAuth:
+    """The ``create_user`` and ``get_user_by_email`` parts of ``firebase_admin.auth``."""
+
+    def __init__(self):
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def create_user(self, email, password=None, uid=None):
+        with self._lock:
+            if email in self._users:
+                raise ValueError(f"User with email {email} already exists")
+            user = self._users[email] = _User(uid or uuid.uuid4().hex[:28], email)
+            return user
+
+    def get_user_by_email(self, email):
+        with self._lock:
+            if email not in self._users:
+                raise ValueError(f"No user record found for {email}")
+            return self._users[email]
@@ -0,0 +1,112 @@
+"""Check that importing the app stays fast and free of heavy client libraries.
+
+Run from the server directory:
+
+    python -m bench.import_time                 # 5 fresh interpreters, 800 ms budget
+    python -m bench.import_time --budget-ms 500 --top 25
+
+Each run imports ``app`` in a fresh interpreter with no credentials set
+(``USDA_API_KEY``, ``GOOGLE_API_KEY``, ``FIREBASE_*`` and ``JWT_SECRET`` are
+removed from the environment, though a ``.env`` file still applies), which
+must succeed now that clients are built lazily. The median wall time is
+compared with ``--budget-ms``, and the modules in ``DEFERRED_MODULES`` must
+not have been imported. The slowest packages under ``python -X importtime``
+are listed to show where the time goes.
+Exits with status 1 when the budget is exceeded or a deferred module was
+imported.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Built or imported on first use, never while importing the app
+DEFERRED_MODULES = ['langchain_google_genai', 'langchain_core', 'google.generativeai', 'pydantic',
+                    'firebase_admin', 'google.cloud.firestore', 'grpc']
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+deferred = %r
+loaded = [m for m in deferred if m in sys.modules]
+print(json.dumps({'seconds': elapsed, 'loaded': loaded}))
+"""
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def clean_environment():
+    env = {k: v for k, v in os.environ.items()
+           if not k.startswith('FIREBASE_') and k not in ('USDA_API_KEY', 'GOOGLE_API_KEY', 'JWT_SECRET')}
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+
+def run_once(importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD % (DEFERRED_MODULES,)]
+    result = subprocess.run(command, cwd=SERVER_DIR, env=clean_environment(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing app failed:\n{result.stderr[-4000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr, top):
+    """Packages by cumulative import time in milliseconds, ``app`` itself excluded.
+
+    A module counts towards its package when it was imported from a different
+    package, so a package's submodules are not counted twice.
+    """
+    totals = {}
+    parents = []
+    # importtime prints a module after everything it imported, so walk backwards
+    for _, cumulative_us, indent, module in reversed(_IMPORT_LINE.findall(stderr)):
+        depth = len(indent)
+        package = module.split('.')[0]
+        while parents and parents[-1][0] >= depth:
+            parents.pop()
+        if package != 'app' and (not parents or parents[-1][1] != package):
+            totals[package] = totals.get(package, 0) + int(cumulative_us) / 1000
+        parents.append((depth, package))
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=800)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args(argv)
+
+    # The first run warms the OS file cache and is not counted
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+    median_ms = statistics.median(run['seconds'] for run, _ in runs) * 1000
+    loaded = sorted({module for run, _ in runs for module in run['loaded']})
+
+    _, stderr = run_once(importtime=True)
+    print(f"{'package':32} {'cumulative ms':>14}")
+    for package, ms in slowest_imports(stderr, args.top):
+        print(f"{package:32} {ms:14.1f}")
+
+    print(f"\nimport app: median {median_ms:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    failed = False
+    if median_ms > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: imported at startup: {', '.join(loaded)}")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+"""Benchmark every route of the app against the fakes in ``bench/fakes.py``.
+
+Run from the server directory:
+
+    python -m bench.run                                  # in-process, every route
+    python -m bench.run --mode gunicorn --workers 4 -c 16
+    python -m bench.run --mode uvicorn --workers 2 -c 200
+    python -m bench.run --routes chat,nutrition_search -n 500
+    python -m bench.run --compare bench/results/before.json
+
+``inprocess`` drives the app through Flask's test client from
+``--concurrency`` threads, so the numbers are the app's own cost.
+``gunicorn`` starts ``gunicorn bench.wsgi:app`` and ``uvicorn`` starts
+``uvicorn bench.asgi:app`` (the async routes of ``asgi.py``, installed
+with ``requirements-asgi.txt``), and both send real HTTP requests. Each route gets ``--requests`` requests; the report has p50, p95
+and p99 latency, throughput and error counts per route and is saved as JSON
+under ``bench/results`` for comparison with earlier runs.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(SERVER_DIR, 'bench', 'results')
+
+
+class Route:
+    """One benchmarked request; ``build(i, user)`` returns ``(path, kwargs)`` for request ``i``."""
+
+    def __init__(self, name, method, build, auth=True, expect=(200,)):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.auth = auth
+        self.expect = expect
+
+
+def _chat(question):
+    return {'json': {'messages': [{'role': 'user', 'content': question}]}}
+
+
+QUESTIONS = [
+    "How much protein do I need?", "Is rice bad for weight loss?", "What should I eat before a workout?",
+    "Are eggs healthy?", "How much water should I drink?", "What is a good vegetarian source of iron?",
+]
+
+
+def routes(users, job_ids):
+    """Every route in app.py, with request bodies that vary per request."""
+    from bench.wsgi import BENCH_METRICS_TOKEN
+    return [
+        Route('register', 'POST', lambda i, u: ('/api/auth/register', {'json': {
+            'email': f"bench-new-{time.time_ns()}-{i}@example.com", 'password': 'bench123', 'name': 'New',
+            'age': 30, 'gender': 'Female', 'height': 165, 'weight': 60, 'dietPreference': 'Vegan',
+            'goal': 'Maintenance', 'activityLevel': 'Sedentary', 'allergies': 'None'}}), auth=False, expect=(201,)),
+        Route('login', 'POST', lambda i, u: ('/api/auth/login', {'json': {
+            'email': f"{u}@example.com", 'password': 'bench123'}}), auth=False),
+        Route('me', 'GET', lambda i, u: ('/api/me', {})),
+        Route('chat', 'POST', lambda i, u: ('/api/chat', _chat(f"{QUESTIONS[i % len(QUESTIONS)]} (request {i})"))),
+        Route('chat_cached', 'POST', lambda i, u: ('/api/chat', _chat(QUESTIONS[0]))),
+        Route('chat_multi_turn', 'POST', lambda i, u: ('/api/chat', {'json': {'messages': [
+            {'role': 'user' if n % 2 == 0 else 'assistant', 'content': f"Turn {n} of conversation {i}: " + 'text ' * 60}
+            for n in range(21)]}})),
+        Route('chat_stream', 'POST', lambda i, u: ('/api/chat', {
+            **_chat(f"{QUESTIONS[i % len(QUESTIONS)]} (stream {i})"), 'headers': {'Accept': 'text/event-stream'}})),
+        Route('chat_cache_stats', 'GET', lambda i, u: ('/api/chat/cache-stats', {
+            'headers': {'Authorization': f"Bearer {BENCH_METRICS_TOKEN}"}}), auth=False),
+        Route('generate_meal_plan', 'POST', lambda i, u: ('/api/generate-meal-plan?fresh=1', {})),
+        Route('generate_meal_plan_parallel', 'POST', lambda i, u: ('/api/generate-meal-plan?fresh=1&parallel=1', {})),
+        Route('generate_meal_plan_cached', 'POST', lambda i, u: ('/api/generate-meal-plan', {})),
+        Route('generate_meal_plan_local', 'POST', lambda i, u: ('/api/generate-meal-plan?engine=local', {})),
+        Route('generate_meal_plan_async', 'POST', lambda i, u: ('/api/generate-meal-plan?async=1&engine=local', {}),
+              expect=(202,)),
+        Route('meal_plan_job', 'GET', lambda i, u: (f"/api/meal-plan/jobs/{job_ids.get(u, 'missing')}", {})),
+        Route('meal_plan_job_events', 'GET', lambda i, u: (f"/api/meal-plan/jobs/{job_ids.get(u, 'missing')}/events", {})),
+        Route('meal_plan', 'GET', lambda i, u: ('/api/meal-plan', {})),
+        Route('nutrition_search', 'GET', lambda i, u: (f"/api/nutrition/search?q=food{i % 200}", {}), auth=False),
+        Route('nutrition_food', 'GET', lambda i, u: (f"/api/nutrition/food/{100000 + i % 500}", {}), auth=False),
+        Route('nutrition_analyze', 'POST', lambda i, u: ('/api/nutrition/analyze', {'json': {'items': [
+            {'fdcId': 100000 + (i * 7 + k) % 500, 'grams': 50 + k} for k in range(100)]}}), auth=False),
+        Route('log_meal', 'POST', lambda i, u: ('/api/log-meal', {'json': {'name': 'Bench meal', 'calories': 450,
+                                                                          'protein': 20, 'carbs': 50, 'fat': 15}})),
+        Route('log_meal_text', 'POST', lambda i, u: ('/api/log-meal', {'json': {'text': '2 roti, 1 cup dal and a banana'}})),
+        Route('streak', 'GET', lambda i, u: ('/api/streak', {})),
+        Route('meal_log_summary', 'GET', lambda i, u: ('/api/meal-logs/summary', {})),
+        Route('meal_logs', 'GET', lambda i, u: ('/api/meal-logs?limit=20', {})),
+        Route('meal_logs_export', 'GET', lambda i, u: ('/api/meal-logs/export', {})),
+    ]
+
+
+def token(uid, secret):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return jwt.encode({'uid': uid, 'iat': now, 'exp': now + datetime.timedelta(days=1)}, secret, algorithm='HS256')
+
+
+class InProcessClient:
+    def __init__(self):
+        from bench import wsgi
+        self.app = wsgi.app
+        self._local = threading.local()
+
+    def request(self, method, path, headers=None, json=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, headers=headers, json=json)
+        body = response.get_data()
+        return response.status_code, body
+
+    def close(self):
+        pass
+
+
+class HTTPClient:
+    def __init__(self, base_url, pool_size):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, path, headers=None, json=None):
+        response = self.session.request(method, self.base_url + path, headers=headers, json=json, timeout=300)
+        return response.status_code, response.content
+
+    def close(self):
+        self.session.close()
+
+
+def start_server(args, env):
+    port = args.port
+    if args.mode == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', 'bench.wsgi:app', '--bind', f"127.0.0.1:{port}",
+                   '--workers', str(args.workers), '--threads', str(args.threads), '--timeout', '300',
+                   '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'bench.asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(args.workers), '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=SERVER_DIR, env=env)
+    client = HTTPClient(f"http://127.0.0.1:{port}", args.concurrency)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{args.mode} exited with code {process.returncode}")
+        try:
+            # Every worker seeds its data before it accepts connections
+            client.request('GET', '/api/nutrition/food/100000')
+            return process, client
+        except Exception:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"{args.mode} did not start within 120 s")
+
+
+def run_route(client, route, users, tokens, requests_per_route, concurrency):
+    latencies = np.zeros(requests_per_route)
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i):
+        user = users[i % len(users)]
+        path, kwargs = route.build(i, user)
+        headers = dict(kwargs.get('headers') or {})
+        if route.auth:
+            headers['Authorization'] = f"Bearer {tokens[user]}"
+        started = time.perf_counter()
+        try:
+            status, _ = client.request(route.method, path, headers=headers, json=kwargs.get('json'))
+        except Exception:
+            status = 'error'
+        latencies[i] = time.perf_counter() - started
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_per_route)))
+    elapsed = time.perf_counter() - started
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        'requests': requests_per_route,
+        'errors': sum(n for status, n in statuses.items() if status not in route.expect),
+        'statuses': {str(status): n for status, n in sorted(statuses.items(), key=str)},
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'mean_ms': round(float(latencies.mean() * 1000), 2),
+        'max_ms': round(float(latencies.max() * 1000), 2),
+        'throughput_rps': round(requests_per_route / elapsed, 2),
+    }
+
+
+def prepare_jobs(client, users, tokens):
+    """Start one finished local meal plan job per user for the job routes."""
+    job_ids = {}
+    for user in users:
+        status, body = client.request('POST', '/api/generate-meal-plan?async=1&engine=local',
+                                      headers={'Authorization': f"Bearer {tokens[user]}"})
+        if status == 202:
+            job_ids[user] = json.loads(body)['jobId']
+    time.sleep(0.5)
+    return job_ids
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVER_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['routes']
+    print(f"\nvs {baseline_path}")
+    print(f"{'route':32} {'p50':>14} {'p99':>14} {'rps':>14}")
+    for name, current in results['routes'].items():
+        before = baseline.get(name)
+        if not before:
+            continue
+
+        def delta(key):
+            if not before[key]:
+                return f"{current[key]:>8}"
+            return f"{(current[key] - before[key]) / before[key] * 100:+7.1f}%"
+
+        print(f"{name:32} {delta('p50_ms'):>14} {delta('p99_ms'):>14} {delta('throughput_rps'):>14}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['inprocess', 'gunicorn', 'uvicorn'], default='inprocess')
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('-n', '--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--routes', help='comma-separated route names (default: all)')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='fake Gemini seconds to first token')
+    parser.add_argument('--llm-tps', type=float, default=400, help='fake Gemini tokens per second')
+    parser.add_argument('--usda-latency', type=float, default=0.05, help='fake USDA seconds per request')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn or uvicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--out', help='result file (default: bench/results/<timestamp>-<mode>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, SERVER_DIR)
+    os.chdir(SERVER_DIR)
+    from bench.fakes import FakeUSDAServer
+
+    usda = FakeUSDAServer(latency=args.usda_latency).start()
+    env = dict(os.environ, BENCH_USDA_URL=usda.url, BENCH_USERS=str(args.users),
+               BENCH_LLM_LATENCY=str(args.llm_latency), BENCH_LLM_TPS=str(args.llm_tps))
+    os.environ.update(env)
+
+    process = None
+    if args.mode != 'inprocess':
+        process, client = start_server(args, env)
+    else:
+        client = InProcessClient()
+
+    from bench.wsgi import BENCH_JWT_SECRET, user_id
+    users = [user_id(i) for i in range(args.users)]
+    tokens = {user: token(user, BENCH_JWT_SECRET) for user in users}
+
+    try:
+        job_ids = prepare_jobs(client, users, tokens)
+        selected = routes(users, job_ids)
+        if args.routes:
+            names = set(args.routes.split(','))
+            unknown = names - {route.name for route in selected}
+            if unknown:
+                parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+            selected = [route for route in selected if route.name in names]
+
+        results = {
+            'meta': {
+                'mode': args.mode,
+                'concurrency': args.concurrency,
+                'requests_per_route': args.requests,
+                'users': args.users,
+                'llm_latency': args.llm_latency,
+                'llm_tps': args.llm_tps,
+                'usda_latency': args.usda_latency,
+                'workers': args.workers if args.mode != 'inprocess' else None,
+                'threads': args.threads if args.mode == 'gunicorn' else None,
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            },
+            'routes': {},
+        }
+
+        print(f"{'route':32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7}")
+        for route in selected:
+            stats = run_route(client, route, users, tokens, args.requests, args.concurrency)
+            results['routes'][route.name] = stats
+            print(f"{route.name:32} {stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f} "
+                  f"{stats['throughput_rps']:9.1f} {stats['errors']:7d}")
+    finally:
+        client.close()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        usda.stop()
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{args.mode}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""The Flask app wired to the fakes in ``bench/fakes.py``.
+
+Importing this module configures the environment, imports ``app``, swaps in
+the fakes and seeds ``BENCH_USERS`` users, each with a profile, a meal plan
+and ``BENCH_LOG_ENTRIES`` meal log entries. ``gunicorn bench.wsgi:app``
+serves it; every worker seeds the same data, so any worker can answer any
+request. Settings come from the environment so gunicorn workers share them:
+
+- ``BENCH_LLM_LATENCY`` / ``BENCH_LLM_TPS``: fake Gemini time to first token
+  and tokens per second,
+- ``BENCH_USDA_URL``: a running ``FakeUSDAServer``; without it one is
+  started with ``BENCH_USDA_LATENCY``.
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+BENCH_JWT_SECRET = 'bench-secret'
+BENCH_METRICS_TOKEN = 'bench-metrics'
+BENCH_USERS = int(os.getenv('BENCH_USERS', 50))
+BENCH_LOG_ENTRIES = int(os.getenv('BENCH_LOG_ENTRIES', 200))
+
+DIETS = ['Vegetarian', 'Vegan', 'Non-Vegetarian', 'Keto']
+GOALS = ['Weight Loss', 'Maintenance', 'Muscle Gain']
+ACTIVITY_LEVELS = ['Sedentary', 'Lightly Active', 'Moderately Active', 'Very Active', 'Super Active']
+ALLERGIES = ['None', 'Gluten', 'Dairy', 'Nuts', 'Gluten, Dairy']
+
+
+def configure_environment():
+    os.environ['DATA_BACKEND'] = 'memory'
+    os.environ['JWT_SECRET'] = BENCH_JWT_SECRET
+    os.environ['METRICS_TOKEN'] = BENCH_METRICS_TOKEN
+    os.environ.setdefault('USDA_API_KEY', 'bench')
+    os.environ.setdefault('GOOGLE_API_KEY', 'bench')
+
+
+def user_id(i):
+    return f"bench-user-{i}"
+
+
+def user_email(i):
+    return f"bench-user-{i}@example.com"
+
+
+def profile(i):
+    return {
+        'age': 20 + i % 45,
+        'gender': ['Male', 'Female', 'Other'][i % 3],
+        'height': 150 + i % 40,
+        'weight': 50 + (i * 7) % 50,
+        'dietPreference': DIETS[i % len(DIETS)],
+        'goal': GOALS[i % len(GOALS)],
+        'activityLevel': ACTIVITY_LEVELS[i % len(ACTIVITY_LEVELS)],
+        'allergies': ALLERGIES[i % len(ALLERGIES)],
+    }
+
+
+def seed(app_module, fake_auth, users=BENCH_USERS, log_entries=BENCH_LOG_ENTRIES):
+    from AI.localPlanner import generate_local_meal_plan
+
+    store = app_module.store
+    now = datetime.now(timezone.utc)
+    for i in range(users):
+        uid = user_id(i)
+        fake_auth.create_user(user_email(i), uid=uid)
+        health_details = profile(i)
+        store.users.set(uid, {
+            'uid': uid,
+            'email': user_email(i),
+            'created_at': store.SERVER_TIMESTAMP,
+            'name': f"Bench User {i}",
+            'healthDetails': health_details,
+        })
+        plan = generate_local_meal_plan(
+            name=f"Bench User {i}", age=health_details['age'], gender=health_details['gender'],
+            height=health_details['height'], weight=health_details['weight'],
+            diet_preference=health_details['dietPreference'], goal=health_details['goal'],
+            activity_level=health_details['activityLevel'], allergies=health_details['allergies'],
+        )
+        store.meal_plans.set(uid, json.loads(plan))
+        with store.batch() as batch:
+            for n in range(log_entries):
+                store.meal_logs.add_entry(uid, {
+                    'timestamp': now - timedelta(hours=6 * n),
+                    'meal': {'name': f"Meal {n}", 'calories': 300 + n % 400},
+                }, batch=batch)
+
+
+configure_environment()
+
+from bench.fakes import FakeChatModel, FakeUSDAServer, FakeAuth  # noqa: E402
+
+if not os.getenv('BENCH_USDA_URL'):
+    usda_server = FakeUSDAServer(latency=float(os.getenv('BENCH_USDA_LATENCY', 0.05))).start()
+    os.environ['BENCH_USDA_URL'] = usda_server.url
+os.environ['USDA_BASE_URL'] = os.environ['BENCH_USDA_URL']
+
+import app as app_module  # noqa: E402
+from AI.llm import set_model  # noqa: E402
+
+fake_model = FakeChatModel(
+    latency=float(os.getenv('BENCH_LLM_LATENCY', 0.2)),
+    tokens_per_second=float(os.getenv('BENCH_LLM_TPS', 400)),
+)
+set_model(fake_model)
+fake_auth = FakeAuth()
+app_module.auth = fake_auth
+seed(app_module, fake_auth)
+
+app = app_module.app
@@ -0,0 +1,213 @@
+"""Small in-process caching helpers.
+
+``TTLCache`` is a bounded LRU map whose entries expire after a per-entry TTL
+and which counts hits, misses and evictions. ``SingleFlight`` makes
+concurrent callers asking for the same key share one computation, and
+``cached`` combines the two around a function. ``AsyncSingleFlight`` and
+``acached`` do the same for coroutines on one event loop.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, MISSING, count=False) is not MISSING
+
+    def get(self, key, default=None, count=True):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    if count:
+                        self.hits += 1
+                    return value
+                del self._data[key]
+            if count:
+                self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run ``fn`` once per key at a time; concurrent callers wait for that result."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+def cached(cache, key=None, negative_ttl=None, is_negative=None):
+    """Cache a function's results in ``cache`` with singleflight coalescing.
+
+    ``key`` maps the call arguments to a cache key (defaults to the positional
+    arguments). Results for which ``is_negative(result)`` is true are kept for
+    ``negative_ttl`` seconds instead of the cache's TTL.
+    """
+    def decorator(f):
+        flight = SingleFlight()
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs) if key else args
+            value = cache.get(k, MISSING)
+            if value is not MISSING:
+                return value
+
+            def load():
+                value = cache.get(k, MISSING, count=False)
+                if value is not MISSING:
+                    return value
+                value = f(*args, **kwargs)
+                if is_negative is not None and is_negative(value):
+                    if negative_ttl:
+                        cache.set(k, value, ttl=negative_ttl)
+                else:
+                    cache.set(k, value)
+                return value
+
+            return flight.do(k, load)
+
+        wrapper.cache = cache
+        wrapper.flight = flight
+        wrapper.uncached = f
+        return wrapper
+    return decorator
+
+
+class AsyncSingleFlight:
+    """``SingleFlight`` for coroutines: concurrent awaits of one key share one task.
+
+    A caller that is cancelled (or times out) stops waiting without cancelling
+    the shared task, so its result still reaches the other callers.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+
+def acached(cache, key=None, negative_ttl=None, is_negative=None):
+    """``cached`` for coroutine functions; the cache itself is shared with sync callers."""
+    def decorator(f):
+        flight = AsyncSingleFlight()
+
+        @wraps(f)
+        async def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs) if key else args
+            value = cache.get(k, MISSING)
+            if value is not MISSING:
+                return value
+
+            async def load():
+                value = cache.get(k, MISSING, count=False)
+                if value is not MISSING:
+                    return value
+                value = await f(*args, **kwargs)
+                if is_negative is not None and is_negative(value):
+                    if negative_ttl:
+                        cache.set(k, value, ttl=negative_ttl)
+                else:
+                    cache.set(k, value)
+                return value
+
+            return await flight.do(k, load)
+
+        wrapper.cache = cache
+        wrapper.flight = flight
+        wrapper.uncached = f
+        return wrapper
+    return decorator
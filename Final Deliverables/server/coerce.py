@@ -0,0 +1,27 @@
+"""Lenient conversions for values from profile documents, meal logs and model replies."""
+import re
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_RAISE = object()
+
+
+def to_number(value, default=_RAISE):
+    """``12`` / ``'450 kcal'`` / ``'1,200'`` -> ``12.0`` / ``450.0`` / ``1200.0``.
+
+    Values without a number give ``default``, or raise ``ValueError`` when
+    no default is passed.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER.search(value.replace(',', ''))
+        if match is not None:
+            return float(match.group())
+    if default is _RAISE:
+        raise ValueError(f"not a number: {value!r}")
+    return default
+
+
+def normalize_text(value):
+    """``' Moderately-Active'`` -> ``'moderately active'``; empty for missing values."""
+    return ' '.join(str(value).lower().replace('-', ' ').split()) if value else ''
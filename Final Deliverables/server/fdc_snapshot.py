@@ -0,0 +1,340 @@
+"""Local FoodData Central snapshot.
+
+Imports the published FDC bulk download (CSV release directory or JSON file)
+into a compact on-disk store and answers the same payloads as the USDA
+endpoints used by NutriInsights, without a network round trip.
+
+Layout of a snapshot directory:
+
+- ``fdc_ids.npy``       sorted fdcIds (int64), one row per food
+- ``offsets.npy``       start of each food's nutrients in the arrays below
+- ``nutrient_ids.npy``  nutrient id per food nutrient (uint16)
+- ``amounts.npy``       amount per food nutrient (float64)
+- ``foods.json``        text columns aligned with ``fdc_ids`` and nutrient definitions
+
+The numeric arrays are memory-mapped, so workers share the pages and a lookup
+is a binary search plus a slice.
+
+Build one with::
+
+    python fdc_snapshot.py <FoodData_Central_csv_dir | food_json_file> <out_dir>
+"""
+import csv
+import json
+import os
+import sys
+from array import array
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# CSV release data_type values -> dataType strings returned by the API
+CSV_DATA_TYPES = {
+    'foundation_food': 'Foundation',
+    'sr_legacy_food': 'SR Legacy',
+    'survey_fndds_food': 'Survey (FNDDS)',
+    'branded_food': 'Branded',
+    'experimental_food': 'Experimental',
+}
+
+
+class FoodSnapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'foods.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported FDC snapshot version in {path}")
+
+        self.descriptions = meta['description']
+        self.brand_owners = meta['brandOwner']
+        self.data_types = meta['dataType']
+        self.publication_dates = meta['publicationDate']
+        self.nutrients = {int(k): v for k, v in meta['nutrients'].items()}
+
+        self.fdc_ids = np.load(os.path.join(path, 'fdc_ids.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        self.nutrient_ids = np.load(os.path.join(path, 'nutrient_ids.npy'), mmap_mode='r')
+        self.amounts = np.load(os.path.join(path, 'amounts.npy'), mmap_mode='r')
+
+        self._lowered = None
+        self._rows_by_type = None
+
+    def __len__(self):
+        return len(self.fdc_ids)
+
+    def __contains__(self, fdc_id):
+        return self.row(fdc_id) is not None
+
+    def row(self, fdc_id):
+        """Return the row index of ``fdc_id`` or None if it is not in the snapshot."""
+        try:
+            fdc_id = int(fdc_id)
+        except (TypeError, ValueError):
+            return None
+        i = int(np.searchsorted(self.fdc_ids, fdc_id))
+        if i < len(self.fdc_ids) and self.fdc_ids[i] == fdc_id:
+            return i
+        return None
+
+    def _nutrient_slice(self, i):
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.nutrient_ids[lo:hi].tolist(), self.amounts[lo:hi].tolist()
+
+    def _summary(self, i):
+        food = {
+            'fdcId': int(self.fdc_ids[i]),
+            'description': self.descriptions[i],
+            'dataType': self.data_types[i],
+            'publicationDate': self.publication_dates[i],
+        }
+        if self.brand_owners[i]:
+            food['brandOwner'] = self.brand_owners[i]
+        return food
+
+    def get_food(self, fdc_id):
+        """Food in the shape of ``GET /food/{fdcId}``, or None."""
+        i = self.row(fdc_id)
+        if i is None:
+            return None
+        food = self._summary(i)
+        food_nutrients = []
+        for nutrient_id, amount in zip(*self._nutrient_slice(i)):
+            nutrient = self.nutrients.get(nutrient_id)
+            if nutrient is None:
+                continue
+            food_nutrients.append({
+                'type': 'FoodNutrient',
+                'nutrient': {
+                    'id': nutrient_id,
+                    'number': nutrient['number'],
+                    'name': nutrient['name'],
+                    'unitName': nutrient['unitName'],
+                },
+                'amount': amount,
+            })
+        food['foodNutrients'] = food_nutrients
+        return food
+
+    def get_foods(self, fdc_ids):
+        """Foods in the shape of ``POST /foods``; ids not in the snapshot are skipped."""
+        foods = []
+        for fdc_id in fdc_ids:
+            food = self.get_food(fdc_id)
+            if food is not None:
+                foods.append(food)
+        return foods
+
+    def search_item(self, i):
+        """Row ``i`` in the abbreviated shape used by ``/foods/search`` results."""
+        food = self._summary(i)
+        food_nutrients = []
+        for nutrient_id, amount in zip(*self._nutrient_slice(i)):
+            nutrient = self.nutrients.get(nutrient_id)
+            if nutrient is None:
+                continue
+            food_nutrients.append({
+                'nutrientId': nutrient_id,
+                'nutrientName': nutrient['name'],
+                'nutrientNumber': nutrient['number'],
+                'unitName': nutrient['unitName'],
+                'value': amount,
+            })
+        food['foodNutrients'] = food_nutrients
+        return food
+
+    def search(self, query, page_size=5, page_number=1):
+        """Match every query word against description and brand owner.
+
+        Results come back in the shape of ``GET /foods/search``, shortest
+        description first.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return search_payload([], 0, page_size, page_number)
+        if self._lowered is None:
+            self._lowered = [
+                f"{desc or ''} {brand or ''}".lower()
+                for desc, brand in zip(self.descriptions, self.brand_owners)
+            ]
+        rows = [i for i, text in enumerate(self._lowered) if all(t in text for t in terms)]
+        rows.sort(key=lambda i: len(self.descriptions[i] or ''))
+        start = (page_number - 1) * page_size
+        foods = [self.search_item(i) for i in rows[start:start + page_size]]
+        return search_payload(foods, len(rows), page_size, page_number)
+
+    def list_foods(self, data_type="Survey (FNDDS)", page_size=5, page_number=1):
+        """Foods in the shape of ``GET /foods/list`` for one data type."""
+        rows = self._type_rows().get(data_type, [])
+        start = (page_number - 1) * page_size
+        foods = []
+        for i in rows[start:start + page_size]:
+            food = self._summary(i)
+            food.pop('brandOwner', None)
+            food['foodNutrients'] = [
+                {
+                    'number': self.nutrients[nid]['number'],
+                    'name': self.nutrients[nid]['name'],
+                    'amount': amount,
+                    'unitName': self.nutrients[nid]['unitName'],
+                }
+                for nid, amount in zip(*self._nutrient_slice(i))
+                if nid in self.nutrients
+            ]
+            foods.append(food)
+        return foods
+
+    def has_data_type(self, data_type):
+        return data_type in self._type_rows()
+
+    def _type_rows(self):
+        if self._rows_by_type is None:
+            rows_by_type = {}
+            for i, dt in enumerate(self.data_types):
+                rows_by_type.setdefault(dt, []).append(i)
+            self._rows_by_type = rows_by_type
+        return self._rows_by_type
+
+
+def search_payload(foods, total_hits, page_size, page_number):
+    total_pages = (total_hits + page_size - 1) // page_size if page_size else 0
+    return {
+        'totalHits': total_hits,
+        'currentPage': page_number,
+        'totalPages': total_pages,
+        'foods': foods,
+    }
+
+
+def load_snapshot(path):
+    """Open the snapshot at ``path``; returns None if there is no snapshot there."""
+    if not path or not os.path.exists(os.path.join(path, 'foods.json')):
+        return None
+    return FoodSnapshot(path)
+
+
+def _nutrient_number(value):
+    value = (value or '').strip()
+    return value[:-2] if value.endswith('.0') else value
+
+
+def _read_csv_release(source):
+    """Read food, branded_food, nutrient and food_nutrient CSVs from an FDC release."""
+    foods = {}
+    with open(os.path.join(source, 'food.csv'), newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            data_type = CSV_DATA_TYPES.get(row['data_type'])
+            if data_type is None:
+                continue
+            foods[int(row['fdc_id'])] = [row['description'], '', data_type, row.get('publication_date', '')]
+
+    branded_path = os.path.join(source, 'branded_food.csv')
+    if os.path.exists(branded_path):
+        with open(branded_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                food = foods.get(int(row['fdc_id']))
+                if food is not None:
+                    food[1] = row.get('brand_owner', '')
+
+    nutrients = {}
+    with open(os.path.join(source, 'nutrient.csv'), newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            nutrients[int(row['id'])] = {
+                'name': row['name'],
+                'unitName': row['unit_name'],
+                'number': _nutrient_number(row.get('nutrient_nbr')),
+            }
+
+    food_col, nutrient_col, amount_col = array('q'), array('H'), array('d')
+    with open(os.path.join(source, 'food_nutrient.csv'), newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            fdc_id = int(row['fdc_id'])
+            if fdc_id not in foods or not row['amount']:
+                continue
+            food_col.append(fdc_id)
+            nutrient_col.append(int(row['nutrient_id']))
+            amount_col.append(float(row['amount']))
+
+    return foods, nutrients, food_col, nutrient_col, amount_col
+
+
+def _read_json_release(source):
+    """Read an FDC JSON download (FoundationFoods, SRLegacyFoods, SurveyFoods, BrandedFoods)."""
+    with open(source, encoding='utf-8') as f:
+        data = json.load(f)
+
+    foods, nutrients = {}, {}
+    food_col, nutrient_col, amount_col = array('q'), array('H'), array('d')
+    records = [food for value in data.values() if isinstance(value, list) for food in value]
+    for food in records:
+        fdc_id = int(food['fdcId'])
+        foods[fdc_id] = [
+            food.get('description', ''),
+            food.get('brandOwner', ''),
+            food.get('dataType', ''),
+            food.get('publicationDate', ''),
+        ]
+        for food_nutrient in food.get('foodNutrients', []):
+            nutrient = food_nutrient.get('nutrient') or {}
+            amount = food_nutrient.get('amount')
+            if 'id' not in nutrient or amount is None:
+                continue
+            nutrients.setdefault(int(nutrient['id']), {
+                'name': nutrient.get('name', ''),
+                'unitName': nutrient.get('unitName', ''),
+                'number': _nutrient_number(str(nutrient.get('number', ''))),
+            })
+            food_col.append(fdc_id)
+            nutrient_col.append(int(nutrient['id']))
+            amount_col.append(float(amount))
+
+    return foods, nutrients, food_col, nutrient_col, amount_col
+
+
+def build_snapshot(source, out_dir):
+    """Import an FDC bulk download into ``out_dir`` and return the opened snapshot."""
+    if os.path.isdir(source):
+        foods, nutrients, food_col, nutrient_col, amount_col = _read_csv_release(source)
+    else:
+        foods, nutrients, food_col, nutrient_col, amount_col = _read_json_release(source)
+
+    fdc_ids = np.array(sorted(foods), dtype=np.int64)
+    food_col = np.frombuffer(food_col, dtype=np.int64)
+    order = np.argsort(food_col, kind='stable')
+    food_col = food_col[order]
+    nutrient_ids = np.frombuffer(nutrient_col, dtype=np.uint16)[order]
+    amounts = np.frombuffer(amount_col, dtype=np.float64)[order]
+    offsets = np.searchsorted(food_col, np.append(fdc_ids, np.iinfo(np.int64).max)).astype(np.int64)
+
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, 'foods.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    np.save(os.path.join(out_dir, 'fdc_ids.npy'), fdc_ids)
+    np.save(os.path.join(out_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(out_dir, 'nutrient_ids.npy'), nutrient_ids)
+    np.save(os.path.join(out_dir, 'amounts.npy'), amounts)
+
+    rows = [foods[int(fdc_id)] for fdc_id in fdc_ids]
+    meta = {
+        'version': FORMAT_VERSION,
+        'description': [r[0] for r in rows],
+        'brandOwner': [r[1] for r in rows],
+        'dataType': [r[2] for r in rows],
+        'publicationDate': [r[3] for r in rows],
+        'nutrients': {str(k): v for k, v in nutrients.items()},
+    }
+    # foods.json is written last so a half-built directory is never loaded
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, separators=(',', ':'))
+
+    return FoodSnapshot(out_dir)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(__doc__.split('Build one with::')[1].strip())
+        sys.exit(1)
+    snapshot = build_snapshot(sys.argv[1], sys.argv[2])
+    print(f"Wrote {len(snapshot)} foods to {sys.argv[2]}")
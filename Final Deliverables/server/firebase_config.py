@@ -1,36 +1,95 @@
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
-from firebase_admin import auth as firebase_auth
+"""Firebase Admin and JWT helpers.
+
+The Firebase app and Firestore client are built on first use rather than at
+import, so importing the app needs no credentials and starts fast. The
+Firestore client holds gRPC channels that must not cross a fork, so each
+process builds its own; ``db`` and ``auth`` stay importable for callers that
+expect module attributes.
+"""
 import datetime
 import jwt
 import os
-import json
+import threading
+import time
 from dotenv import load_dotenv
+from cache import TTLCache
 
 load_dotenv()
 
-firebase_credentials = {
-    "type": os.getenv("FIREBASE_TYPE"),
-    "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-    "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-    "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace('\\n', '\n'),
-    "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-    "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-    "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
-    "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
-    "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_X509_CERT_URL"),
-    "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL")
-}
+# Reentrant: get_db() initializes the app while holding it
+_lock = threading.RLock()
+_app = None
+_db = None
+_db_pid = None
+
+def firebase_credentials():
+    private_key = os.getenv("FIREBASE_PRIVATE_KEY")
+    if not private_key:
+        raise ValueError("No FIREBASE_PRIVATE_KEY found in environment variables")
+    return {
+        "type": os.getenv("FIREBASE_TYPE"),
+        "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+        "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+        "private_key": private_key.replace('\\n', '\n'),
+        "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+        "client_id": os.getenv("FIREBASE_CLIENT_ID"),
+        "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
+        "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
+        "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_X509_CERT_URL"),
+        "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL")
+    }
+
+def get_app():
+    """The default Firebase app, initialized on first use."""
+    global _app
+    if _app is None:
+        with _lock:
+            if _app is None:
+                import firebase_admin
+                from firebase_admin import credentials
+                _app = firebase_admin.initialize_app(credentials.Certificate(firebase_credentials()))
+    return _app
+
+def get_db():
+    """This process's Firestore client."""
+    global _db, _db_pid
+    if _db is None or _db_pid != os.getpid():
+        with _lock:
+            if _db is None or _db_pid != os.getpid():
+                from firebase_admin import firestore
+                _db = firestore.client(get_app())
+                _db_pid = os.getpid()
+    return _db
 
-cred = credentials.Certificate(firebase_credentials)
-firebase_admin.initialize_app(cred)
+def preload_modules():
+    """Import the Firebase Admin SDK without connecting, so forked workers share it."""
+    import firebase_admin.auth  # noqa: F401
+    import firebase_admin.firestore  # noqa: F401
 
-db = firestore.client()
+class _LazyAuth:
+    """``firebase_admin.auth`` with the default app initialized on first use."""
+
+    def __getattr__(self, name):
+        get_app()
+        from firebase_admin import auth as firebase_auth
+        return getattr(firebase_auth, name)
+
+auth = _LazyAuth()
+
+def __getattr__(name):
+    if name == 'db':
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_DELTA = datetime.timedelta(days=1)
 
+# Verified payloads by token, so repeat requests skip the HS256 decode.
+# Entries never outlive the token's own exp claim.
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 300))
+token_cache = TTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 10000)), ttl=TOKEN_CACHE_TTL)
+
 def create_custom_token(uid, additional_claims=None):
     """Generate a custom token for the specified UID"""
     payload = {
@@ -44,8 +103,16 @@ def create_custom_token(uid, additional_claims=None):
 
 def verify_custom_token(token):
     """Verify and decode a JWT token"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        if payload.get('exp', 0) > time.time():
+            return dict(payload)
+        token_cache.delete(token)
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        ttl = min(TOKEN_CACHE_TTL, payload.get('exp', 0) - time.time())
+        if ttl > 0:
+            token_cache.set(token, dict(payload), ttl=ttl)
         return payload
     except jwt.ExpiredSignatureError:
         raise Exception('Token expired')
@@ -0,0 +1,222 @@
+"""In-process full-text index over food descriptions and brand owners.
+
+Every query word is matched as a prefix of the indexed words (so "banan"
+finds "bananas"), all words must match, and hits are ranked with BM25.
+Exact word matches score a little higher than prefix expansions.
+
+Foods can be added at any time; postings are append-only arrays, and their
+NumPy copies are rebuilt lazily for the terms that changed.
+"""
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+
+import numpy as np
+
+from fdc_snapshot import search_payload
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Prefixes shorter than this only match whole words
+MIN_PREFIX = 2
+# Cap on how many indexed words a single prefix may expand to
+MAX_EXPANSIONS = 64
+# Score multiplier for words that only match as a prefix
+PREFIX_BOOST = 0.8
+# Merged postings kept per query word; typing "ba", "ban", "bana" reuses them
+TOKEN_CACHE_SIZE = 1024
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class FoodIndex:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = []
+        self.doc_ids = {}
+        self.doc_len = array('I')
+        self.total_len = 0
+        self.postings = {}
+        self.terms = []
+        self._arrays = {}
+        self._doc_len_array = None
+        self._token_cache = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, fdc_id):
+        return fdc_id in self.doc_ids
+
+    def _add(self, food, new_terms):
+        fdc_id = food.get('fdcId')
+        if fdc_id is None or fdc_id in self.doc_ids:
+            return
+        tokens = tokenize(food.get('description')) + tokenize(food.get('brandOwner'))
+        doc = len(self.docs)
+        self.docs.append({
+            'fdcId': fdc_id,
+            'description': food.get('description'),
+            'brandOwner': food.get('brandOwner'),
+            'dataType': food.get('dataType'),
+        })
+        self.doc_ids[fdc_id] = doc
+        self.doc_len.append(len(tokens))
+        self.total_len += len(tokens)
+        self._doc_len_array = None
+        self._token_cache.clear()
+
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = (array('I'), array('H'))
+                new_terms.append(token)
+            posting[0].append(doc)
+            posting[1].append(min(tf, 0xFFFF))
+            self._arrays.pop(token, None)
+
+    def add(self, food):
+        """Index one food dict with ``fdcId``, ``description``, ``brandOwner`` and ``dataType``."""
+        with self._lock:
+            new_terms = []
+            self._add(food, new_terms)
+            for term in new_terms:
+                insort(self.terms, term)
+
+    def add_many(self, foods):
+        with self._lock:
+            new_terms = []
+            for food in foods:
+                self._add(food, new_terms)
+            if len(new_terms) > 64:
+                self.terms = sorted(self.postings)
+            else:
+                for term in new_terms:
+                    insort(self.terms, term)
+
+    def _posting_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            docs, tfs = self.postings[term]
+            arrays = self._arrays[term] = (
+                np.array(docs, dtype=np.uint32),
+                np.array(tfs, dtype=np.float32),
+            )
+        return arrays
+
+    def _expand(self, token):
+        if len(token) < MIN_PREFIX:
+            return [token] if token in self.postings else []
+        start = bisect_left(self.terms, token)
+        expansions = []
+        for term in self.terms[start:start + MAX_EXPANSIONS * 4]:
+            if not term.startswith(token):
+                break
+            expansions.append(term)
+        if len(expansions) > MAX_EXPANSIONS:
+            expansions.sort(key=lambda t: len(self.postings[t][0]), reverse=True)
+            expansions = expansions[:MAX_EXPANSIONS]
+        return expansions
+
+    def _token_scores(self, token, doc_len, avgdl):
+        """Docs matching ``token`` and their best BM25 weight, sorted by doc."""
+        n_docs = len(self.docs)
+        all_docs, all_weights = [], []
+        for term in self._expand(token):
+            docs, tfs = self._posting_arrays(term)
+            df = len(docs)
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_len[docs] / avgdl)
+            weights = idf * tfs * (self.k1 + 1) / (tfs + norm)
+            if term != token:
+                weights *= PREFIX_BOOST
+            all_docs.append(docs)
+            all_weights.append(weights)
+        if not all_docs:
+            return None, None
+        if len(all_docs) == 1:
+            return all_docs[0], all_weights[0]
+
+        docs = np.concatenate(all_docs)
+        weights = np.concatenate(all_weights)
+        order = np.lexsort((-weights, docs))
+        docs, weights = docs[order], weights[order]
+        first = np.ones(len(docs), dtype=bool)
+        first[1:] = docs[1:] != docs[:-1]
+        return docs[first], weights[first]
+
+    def search(self, query, page_size=5, page_number=1):
+        """Return ``(total_hits, foods)`` for one page of ranked results."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self.docs:
+            return 0, []
+        with self._lock:
+            return self._search(tokens, page_size, page_number)
+
+    def _search(self, tokens, page_size, page_number):
+        if self._doc_len_array is None:
+            self._doc_len_array = np.array(self.doc_len, dtype=np.float32)
+        doc_len = self._doc_len_array
+        avgdl = max(self.total_len / len(self.docs), 1.0)
+
+        candidates, scores = None, None
+        for token in tokens:
+            cached = self._token_cache.get(token)
+            if cached is None:
+                if len(self._token_cache) >= TOKEN_CACHE_SIZE:
+                    self._token_cache.clear()
+                cached = self._token_cache[token] = self._token_scores(token, doc_len, avgdl)
+            docs, weights = cached
+            if docs is None:
+                return 0, []
+            if candidates is None:
+                candidates, scores = docs, weights
+                continue
+            candidates, left, right = np.intersect1d(
+                candidates, docs, assume_unique=True, return_indices=True
+            )
+            scores = scores[left] + weights[right]
+            if not len(candidates):
+                return 0, []
+
+        total = len(candidates)
+        end = page_number * page_size
+        if end < total:
+            top = np.argpartition(-scores, end - 1)[:end]
+        else:
+            top = np.arange(total)
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        page = top[(page_number - 1) * page_size:end]
+        return total, [self.docs[i] for i in candidates[page].tolist()]
+
+    def search_payload(self, query, page_size=5, page_number=1):
+        """Search results in the shape of ``GET /foods/search``."""
+        total, foods = self.search(query, page_size=page_size, page_number=page_number)
+        return search_payload(foods, total, page_size, page_number)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        index = cls()
+        index.add_many(
+            {
+                'fdcId': int(fdc_id),
+                'description': description,
+                'brandOwner': brand_owner or None,
+                'dataType': data_type,
+            }
+            for fdc_id, description, brand_owner, data_type in zip(
+                snapshot.fdc_ids.tolist(),
+                snapshot.descriptions,
+                snapshot.brand_owners,
+                snapshot.data_types,
+            )
+        )
+        return index
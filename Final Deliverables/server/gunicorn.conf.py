@@ -0,0 +1,50 @@
+"""Gunicorn settings, picked up by ``gunicorn app:app`` run from this directory.
+
+With ``preload_app`` the master imports the app once and forks the workers
+from it, so imported libraries and module-level read-only data (the FDC
+snapshot and food index, the dish catalog, nutrient tables) are shared
+copy-on-write instead of being loaded per worker. Clients that hold sockets
+or threads (Firestore, Gemini, the USDA session) are built lazily inside each
+worker; ``/readyz`` builds them before traffic arrives, and ``post_fork``
+drops any the master built while importing (the USDA session and batcher,
+the shared cache's SQLite connections). Caches are still per worker unless
+``SHARED_CACHE_PATH`` points them at a host-wide SQLite file (see
+``shared_cache``). Set ``GUNICORN_PRELOAD=0`` to import the app in each
+worker instead.
+
+Workers are ``gthread``: each serves ``GUNICORN_THREADS`` requests at once,
+which the LLM- and USDA-bound routes need since they mostly wait on I/O.
+"""
+import gc
+import os
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', 5000)}")
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from AI.llm import preload_modules as preload_llm_modules
+    from firebase_config import preload_modules as preload_firebase_modules
+
+    preload_llm_modules()
+    preload_firebase_modules()
+    # Objects loaded so far are never collected; freezing them keeps the
+    # workers' collector from writing to (and so copying) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    import NutriInsights
+    import shared_cache
+
+    NutriInsights.reset_after_fork()
+    shared_cache.reset_after_fork()
+
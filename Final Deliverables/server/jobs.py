@@ -0,0 +1,181 @@
+"""Background jobs for long-running requests.
+
+``JobQueue`` runs functions on a bounded thread pool and keeps their status
+in memory so clients can poll or subscribe to it. Jobs are submitted under a
+key (e.g. the user id); submitting again while a job with the same key is
+still queued or running returns that job instead of starting another one.
+With a ``claim`` hook the same holds across processes: a job another worker
+is running for the key comes back as a ``RemoteJob``.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED = (SUCCEEDED, FAILED)
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, key, owner=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.owner = owner
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.progress = {}
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def update(self, **fields):
+        with self._cond:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+            self.version += 1
+            self._cond.notify_all()
+
+    def report(self, name, value):
+        """Publish a partial result under ``progress[name]``."""
+        with self._cond:
+            self.progress = {**self.progress, name: value}
+            self.updated_at = time.time()
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, version, timeout=None):
+        """Block until the job changes after ``version`` or ``timeout`` passes; returns the new version."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def to_dict(self):
+        data = {
+            'jobId': self.id,
+            'status': self.status,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
+        }
+        if self.progress:
+            data['progress'] = self.progress
+        if self.status == SUCCEEDED:
+            data['result'] = self.result
+        if self.status == FAILED:
+            data['error'] = self.error
+        return data
+
+
+class RemoteJob:
+    """A job another process is running, as last reported in its mirrored status."""
+
+    def __init__(self, job_id, status):
+        self.id = job_id
+        self.status = status.get('status')
+        self._status = {name: value for name, value in status.items() if name != 'uid'}
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def to_dict(self):
+        return {'jobId': self.id, **self._status}
+
+
+class JobQueue:
+    """``claim(key, job)`` is called before a new job starts; it returns None to
+    run it, or the ``(job_id, status)`` of the job another process is running
+    for ``key``.
+    """
+
+    def __init__(self, max_workers=4, max_pending=32, ttl=3600, on_update=None, claim=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.on_update = on_update
+        self.claim = claim
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def pending(self):
+        return sum(1 for job in self._active.values() if not job.finished)
+
+    def submit(self, key, fn, *args, owner=None, **kwargs):
+        """Run ``fn(*args, job=job, **kwargs)`` in the background.
+
+        Returns ``(job, created)``. ``created`` is False when a job for ``key``
+        was already queued or running, here or (a ``RemoteJob``) in another
+        process, and is returned instead. Raises ``QueueFull`` when
+        ``max_pending`` jobs are already waiting or running.
+        """
+        with self._lock:
+            self._expire()
+            job = self._active.get(key)
+            if job is not None and not job.finished:
+                return job, False
+            if self.pending() >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs already pending")
+            job = Job(key, owner=owner)
+            if self.claim is not None:
+                # Under the lock, so a second submit here waits for the claim
+                try:
+                    other = self.claim(key, job)
+                except Exception as e:
+                    logger.error("Job %s claim failed, running it anyway: %s", job.id, e)
+                    other = None
+                if other is not None:
+                    return RemoteJob(*other), False
+            self._jobs[job.id] = job
+            self._active[key] = job
+        self._notify(job)
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job, True
+
+    def _run(self, job, fn, args, kwargs):
+        job.update(status=RUNNING)
+        self._notify(job)
+        try:
+            result = fn(*args, job=job, **kwargs)
+        except Exception as e:
+            logger.error("Job %s failed: %s", job.id, e)
+            job.update(status=FAILED, error=str(e))
+        else:
+            job.update(status=SUCCEEDED, result=result)
+        finally:
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+            self._notify(job)
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                logger.error("Job %s status hook failed: %s", job.id, e)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.updated_at < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,151 @@
+"""Meal log streaks and nutrition rollups.
+
+The ``mealLogs/<uid>`` document carries the streak and running totals next
+to the ``entries`` subcollection, so dashboards read one small document
+instead of scanning entries:
+
+- ``daily``: ``{'2026-10-18': {calories, protein, carbs, fat, meals}}`` for
+  the last ``DAILY_RETENTION_DAYS`` days,
+- ``weekly``: ``{'2026-W42': {..., daysLogged}}`` for the last
+  ``WEEKLY_RETENTION_WEEKS`` ISO weeks.
+
+``apply_log`` computes the new document from the old one; callers write it
+in the same transaction as the entry. History pages are addressed with
+opaque cursors made by ``encode_cursor``.
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+from coerce import to_number
+
+MACROS = ['calories', 'protein', 'carbs', 'fat']
+
+DAILY_RETENTION_DAYS = 35
+WEEKLY_RETENTION_WEEKS = 12
+
+
+def meal_macros(meal):
+    """Calories, protein, carbs and fat from a logged meal body, 0 where missing."""
+    if not isinstance(meal, dict):
+        return dict.fromkeys(MACROS, 0.0)
+    source = meal.get('nutrients') if isinstance(meal.get('nutrients'), dict) else meal
+    return {macro: to_number(source.get(macro), 0.0) for macro in MACROS}
+
+
+def parse_date(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def week_key(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def current_streak(data, today):
+    """The streak as of ``today``: 0 once a full day has passed without a log."""
+    if not data:
+        return 0
+    last_logged_date = parse_date(data.get('last_logged_date'))
+    if last_logged_date is None or last_logged_date < today - timedelta(days=1):
+        return 0
+    return data.get('current_streak', 0)
+
+
+def _add(totals, macros):
+    totals = dict(totals or {})
+    for macro in MACROS:
+        totals[macro] = round(totals.get(macro, 0) + macros[macro], 2)
+    totals['meals'] = totals.get('meals', 0) + 1
+    return totals
+
+
+def apply_log(data, today, macros):
+    """Return ``(new_data, streak, first_today)`` after logging a meal on ``today``."""
+    data = dict(data or {})
+    last_logged_date = parse_date(data.get('last_logged_date'))
+    streak = data.get('current_streak', 0)
+
+    first_today = last_logged_date != today
+    if first_today:
+        if last_logged_date == today - timedelta(days=1):
+            streak += 1
+        else:
+            streak = 1
+
+    daily = dict(data.get('daily') or {})
+    daily[today.isoformat()] = _add(daily.get(today.isoformat()), macros)
+    oldest_day = (today - timedelta(days=DAILY_RETENTION_DAYS - 1)).isoformat()
+    daily = {day: totals for day, totals in daily.items() if day >= oldest_day}
+
+    weekly = dict(data.get('weekly') or {})
+    week = week_key(today)
+    weekly[week] = _add(weekly.get(week), macros)
+    if first_today:
+        weekly[week]['daysLogged'] = weekly[week].get('daysLogged', 0) + 1
+    oldest_week = week_key(today - timedelta(weeks=WEEKLY_RETENTION_WEEKS - 1))
+    weekly = {key: totals for key, totals in weekly.items() if key >= oldest_week}
+
+    data.update({
+        'last_logged_date': today.isoformat(),
+        'current_streak': streak,
+        'longest_streak': max(data.get('longest_streak', 0), streak),
+        'total_meals': data.get('total_meals', 0) + 1,
+        'daily': daily,
+        'weekly': weekly,
+    })
+    return data, streak, first_today
+
+
+def summarize(data, today, days=7):
+    """Streak, today's and this week's totals, and the last ``days`` days."""
+    data = data or {}
+    daily = data.get('daily') or {}
+    weekly = data.get('weekly') or {}
+    empty = {**dict.fromkeys(MACROS, 0), 'meals': 0}
+    return {
+        'streak': current_streak(data, today),
+        'longestStreak': data.get('longest_streak', 0),
+        'totalMeals': data.get('total_meals', 0),
+        'today': daily.get(today.isoformat(), empty),
+        'week': weekly.get(week_key(today), {**empty, 'daysLogged': 0}),
+        'days': [
+            {'date': day, **daily.get(day, empty)}
+            for day in ((today - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1))
+        ],
+    }
+
+
+def encode_cursor(timestamp, entry_id):
+    raw = json.dumps([timestamp.isoformat(), entry_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """``(timestamp, entry_id)`` from ``encode_cursor``; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, entry_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(entry_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def date_range(start=None, end=None):
+    """UTC datetimes for inclusive ``YYYY-MM-DD`` dates: ``(start of start, start of the day after end)``."""
+    start_at = datetime.strptime(start, "%Y-%m-%d").replace(tzinfo=timezone.utc) if start else None
+    end_at = datetime.strptime(end, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1) if end else None
+    return start_at, end_at
+
+
+def entry_to_dict(entry_id, entry):
+    timestamp = entry.get('timestamp')
+    return {
+        'id': entry_id,
+        'timestamp': timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+        'meal': entry.get('meal', {}),
+    }
@@ -0,0 +1,337 @@
+"""Free-text meal parsing: "2 roti, 1 cup dal and a banana" -> foods, grams and macros.
+
+Food names and synonyms from ``COMMON_FOODS`` and the local planner's dish
+catalog are compiled once into an Aho-Corasick automaton, so one pass over
+the text finds every food phrase (whole words, leftmost-longest, so
+"brown rice" wins over "rice"). The words just before each phrase give the
+quantity and unit ("2", "1 cup", "half a bowl of", "200g"), or a weight can
+follow it ("rice 150 g"). Units are converted to grams with ``UNIT_GRAMS``
+and ``UNIT_ML``, or with the food's own serving sizes where it has them.
+
+Everything is local: a typical entry resolves in tens of microseconds with
+no USDA call. Macros are approximate per-100 g values for the common foods;
+catalog dishes use their per-portion values, with a portion taken as
+``DISH_PORTION_GRAMS`` when the amount is given by weight.
+"""
+import re
+import unicodedata
+
+from AI.dishCatalog import DISHES
+
+MACROS = ['calories', 'protein', 'carbs', 'fat']
+
+# key, synonyms, per 100 g (kcal, protein, carbs, fat), grams per piece or
+# serving, grams per unit where the food has its own (a cup of cooked rice
+# weighs less than a cup of milk)
+COMMON_FOODS = [
+    ('roti', ['chapati', 'chapatti', 'phulka', 'fulka'], (297, 9.8, 46, 7.5), 40, {}),
+    ('paratha', ['parantha', 'plain paratha'], (326, 6.4, 45, 13), 80, {}),
+    ('naan', [], (310, 9, 55, 6), 90, {}),
+    ('bread', ['toast', 'whole wheat bread', 'brown bread'], (252, 12.5, 43, 3.5), 32, {'slice': 32}),
+    ('white rice', ['rice', 'steamed rice', 'plain rice', 'chawal'], (130, 2.7, 28, 0.3), 160, {'cup': 160, 'bowl': 200, 'plate': 250}),
+    ('brown rice', [], (123, 2.7, 25.6, 1), 160, {'cup': 195, 'bowl': 200, 'plate': 250}),
+    ('dal', ['daal', 'dhal', 'lentils', 'lentil curry', 'toor dal', 'moong dal', 'masoor dal'], (116, 9, 20, 0.4), 200, {'cup': 200, 'bowl': 200}),
+    ('rajma', ['kidney beans'], (127, 8.7, 22.8, 0.5), 180, {'cup': 180, 'bowl': 200}),
+    ('chana', ['chole', 'chickpeas', 'chick peas'], (164, 8.9, 27.4, 2.6), 165, {'cup': 165, 'bowl': 200}),
+    ('sprouts', ['moong sprouts', 'bean sprouts'], (30, 3, 5.9, 0.2), 100, {'cup': 104, 'bowl': 150}),
+    ('idli', ['idly'], (146, 4.5, 30, 0.5), 40, {}),
+    ('dosa', ['plain dosa'], (168, 3.9, 29, 3.7), 80, {}),
+    ('poha', [], (180, 3.5, 30, 5), 200, {'cup': 120, 'bowl': 200, 'plate': 200}),
+    ('upma', [], (150, 4, 22, 5), 200, {'cup': 150, 'bowl': 200, 'plate': 200}),
+    ('oats', ['rolled oats', 'oatmeal'], (379, 13, 68, 6.5), 40, {'cup': 81, 'bowl': 40, 'tbsp': 5}),
+    ('pasta', ['spaghetti', 'macaroni'], (158, 5.8, 31, 0.9), 200, {'cup': 140, 'bowl': 200, 'plate': 250}),
+    ('noodles', [], (138, 4.5, 25, 2.1), 200, {'cup': 160, 'bowl': 200, 'plate': 250}),
+    ('pizza', [], (266, 11, 33, 10), 107, {'slice': 107}),
+    ('samosa', [], (262, 4, 32, 13), 100, {}),
+    ('egg', ['eggs', 'boiled egg', 'boiled eggs', 'anda', 'omelette', 'omelet'], (155, 12.6, 1.1, 10.6), 50, {}),
+    ('egg white', ['egg whites'], (52, 10.9, 0.7, 0.2), 33, {}),
+    ('chicken', ['chicken breast', 'grilled chicken', 'chicken curry'], (165, 31, 0, 3.6), 150, {'cup': 140, 'bowl': 200, 'piece': 60}),
+    ('fish', ['fish curry', 'grilled fish'], (136, 22, 0, 5), 150, {'piece': 100}),
+    ('paneer', ['cottage cheese'], (321, 21, 3.6, 25), 100, {'cup': 120, 'piece': 25}),
+    ('tofu', [], (76, 8, 1.9, 4.8), 100, {'cup': 250, 'piece': 25}),
+    ('milk', ['whole milk'], (61, 3.2, 4.8, 3.3), 250, {}),
+    ('curd', ['dahi', 'yogurt', 'yoghurt', 'plain yogurt'], (61, 3.5, 4.7, 3.3), 200, {'cup': 245, 'bowl': 200}),
+    ('greek yogurt', ['greek yoghurt'], (97, 9, 3.6, 5), 170, {'cup': 245, 'bowl': 200}),
+    ('cheese', ['cheddar'], (403, 25, 1.3, 33), 28, {'slice': 21}),
+    ('butter', [], (717, 0.9, 0.1, 81), 14, {}),
+    ('ghee', [], (900, 0, 0, 100), 13, {}),
+    ('oil', ['olive oil', 'cooking oil'], (884, 0, 0, 100), 14, {}),
+    ('sugar', [], (387, 0, 100, 0), 4, {}),
+    ('honey', [], (304, 0.3, 82, 0), 21, {}),
+    ('peanut butter', [], (588, 25, 20, 50), 32, {}),
+    ('almonds', ['almond', 'badam'], (579, 21, 22, 50), 28, {'piece': 1.2}),
+    ('peanuts', ['peanut', 'groundnuts'], (567, 26, 16, 49), 28, {'piece': 0.5}),
+    ('walnuts', ['walnut'], (654, 15, 14, 65), 28, {'piece': 4}),
+    ('banana', ['bananas'], (89, 1.1, 22.8, 0.3), 118, {}),
+    ('apple', ['apples'], (52, 0.3, 13.8, 0.2), 182, {}),
+    ('orange', ['oranges'], (47, 0.9, 11.8, 0.1), 130, {}),
+    ('mango', ['mangoes', 'mangos'], (60, 0.8, 15, 0.4), 200, {'cup': 165}),
+    ('grapes', [], (69, 0.7, 18, 0.2), 150, {'cup': 151}),
+    ('papaya', [], (43, 0.5, 11, 0.3), 150, {'cup': 145}),
+    ('watermelon', [], (30, 0.6, 7.6, 0.2), 280, {'cup': 152}),
+    ('dates', ['date', 'khajur'], (282, 2.5, 75, 0.4), 24, {'piece': 8}),
+    ('potato', ['potatoes', 'aloo', 'boiled potato'], (87, 1.9, 20, 0.1), 150, {'cup': 156}),
+    ('sweet potato', ['sweet potatoes'], (90, 2, 20.7, 0.2), 130, {'cup': 200}),
+    ('tomato', ['tomatoes'], (18, 0.9, 3.9, 0.2), 120, {'cup': 180}),
+    ('cucumber', ['cucumbers'], (15, 0.7, 3.6, 0.1), 300, {'cup': 120}),
+    ('salad', ['green salad', 'mixed salad'], (20, 1.5, 3.6, 0.2), 100, {'cup': 50, 'bowl': 100, 'plate': 150}),
+    ('sabzi', ['sabji', 'mixed vegetables', 'vegetables', 'veggies', 'vegetable curry'], (90, 2.5, 10, 4.5), 150, {'cup': 150, 'bowl': 150}),
+    ('soup', ['vegetable soup'], (40, 1.5, 6, 1.2), 250, {'cup': 245, 'bowl': 250}),
+    ('tea', ['chai', 'masala chai', 'milk tea'], (40, 1.3, 6.5, 1.1), 150, {}),
+    ('coffee', ['black coffee'], (1, 0.1, 0, 0), 240, {}),
+    ('juice', ['orange juice', 'fruit juice'], (45, 0.7, 10.4, 0.2), 250, {}),
+    ('whey protein', ['protein shake', 'whey'], (400, 80, 8, 6), 30, {'scoop': 30}),
+    ('biscuit', ['biscuits', 'cookie', 'cookies'], (480, 6.5, 68, 20), 10, {}),
+]
+
+# Catalog dishes have macros per portion; a portion is taken to weigh this much
+DISH_PORTION_GRAMS = 250
+
+UNIT_GRAMS = {'g': 1, 'kg': 1000, 'oz': 28.35, 'lb': 453.6, 'handful': 30}
+# Volume units, converted to grams at 1 g/ml unless the food lists the unit
+UNIT_ML = {'ml': 1, 'l': 1000, 'cup': 240, 'glass': 250, 'bowl': 250, 'tbsp': 15, 'tsp': 5}
+# Units meaning one of the food's servings unless the food lists the unit
+SERVING_UNITS = {'piece', 'serving', 'plate', 'slice', 'scoop'}
+
+UNIT_ALIASES = {
+    'gram': 'g', 'grams': 'g', 'gm': 'g', 'gms': 'g', 'gr': 'g',
+    'kgs': 'kg', 'kilogram': 'kg', 'kilograms': 'kg',
+    'ounce': 'oz', 'ounces': 'oz', 'pound': 'lb', 'pounds': 'lb', 'lbs': 'lb',
+    'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml', 'mls': 'ml',
+    'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l', 'ltr': 'l',
+    'cups': 'cup', 'glasses': 'glass', 'bowls': 'bowl', 'katori': 'bowl', 'katoris': 'bowl',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'tbsps': 'tbsp', 'tbs': 'tbsp',
+    'teaspoon': 'tsp', 'teaspoons': 'tsp', 'tsps': 'tsp',
+    'pieces': 'piece', 'pc': 'piece', 'pcs': 'piece',
+    'servings': 'serving', 'portion': 'serving', 'portions': 'serving', 'helping': 'serving', 'helpings': 'serving',
+    'plates': 'plate', 'slices': 'slice', 'handfuls': 'handful', 'scoops': 'scoop',
+}
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+    'nine': 9, 'ten': 10, 'half': 0.5, 'half a': 0.5, 'half an': 0.5, 'a half': 0.5, 'quarter': 0.25,
+    'a quarter': 0.25, 'quarter of a': 0.25, 'couple': 2, 'a couple': 2, 'a couple of': 2, 'few': 3, 'a few': 3,
+    'dozen': 12, 'a dozen': 12,
+}
+# Unicode vulgar fractions: ¼ ½ ¾, ⅐ to ⅞ and ↉
+FRACTIONS = {ch: unicodedata.numeric(ch)
+             for ch in ['\u00bc', '\u00bd', '\u00be', *map(chr, range(0x2150, 0x215f)), '\u2189']}
+SIZE_FACTORS = {'small': 0.7, 'medium': 1.0, 'large': 1.3, 'big': 1.3}
+
+# Words between foods that are not worth reporting as unmatched
+# A food preceded by one of these ("tea with no sugar") is left out
+NEGATIONS = {'no', 'without', 'zero', 'skipped', 'minus'}
+FILLER_WORDS = {'and', 'with', 'plus', 'some', 'of', 'a', 'an', 'the', 'had', 'ate', 'i', 'for', 'my', 'in', 'on'}
+
+_SEPARATOR = re.compile(r",|;|\+|&|\band\b|\bwith\b|\bplus\b")
+
+
+def _alternation(words):
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+_UNITS = _alternation(set(UNIT_GRAMS) | set(UNIT_ML) | SERVING_UNITS | set(UNIT_ALIASES))
+_FRACTION = f"[{''.join(FRACTIONS)}]"
+_NUMBER = rf"\d+\s+{_FRACTION}|\d+\s+\d+/\d+|\d+(?:\.\d+)?\s*/\s*\d+|\d*\.?\d+{_FRACTION}?|{_FRACTION}"
+_QUANTITY = rf"(?<![\w.])(?P<qty>{_NUMBER}|(?:{_alternation(NUMBER_WORDS)})\b)"
+_PREFIX = re.compile(
+    rf"(?:{_QUANTITY}\s*)?(?:(?P<size>{_alternation(SIZE_FACTORS)})\s+)?"
+    rf"(?:(?P<unit>{_UNITS})\b\.?\s*)?(?:of\s+)?(?:x\s*)?$"
+)
+_TRAILING = re.compile(r"^\s*\(?\s*(?P<qty>\d+(?:\.\d+)?)\s*(?P<unit>g|gm|gms|grams?|kg|ml|l|oz)\b\.?\)?")
+
+
+def normalize(text):
+    return ' '.join(str(text).lower().replace('-', ' ').split())
+
+
+def _plurals(phrase):
+    if phrase.endswith('s'):
+        return [phrase]
+    if phrase.endswith('o'):
+        return [phrase, phrase + 's', phrase + 'es']
+    if phrase.endswith('y') and phrase[-2:-1] not in 'aeiou':
+        return [phrase, phrase[:-1] + 'ies']
+    return [phrase, phrase + 's']
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over phrases, finding whole-word, leftmost-longest matches."""
+
+    def __init__(self, phrases):
+        # Per state: transitions, failure link and (length, value) of every phrase ending there
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for phrase, value in phrases.items():
+            state = 0
+            for ch in phrase:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = self._goto[state][ch] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(phrase), value))
+
+        # Breadth-first, so a state's failure link is final before its children need it
+        queue = [0]
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                if state == 0:
+                    continue
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """``[(start, end, value)]`` for non-overlapping matches in ``text``, in order."""
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] and (i + 1 == len(text) or not text[i + 1].isalnum()):
+                for length, value in out[state]:
+                    start = i + 1 - length
+                    if start == 0 or not text[start - 1].isalnum():
+                        matches.append((start, i + 1, value))
+
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        chosen = []
+        end = 0
+        for match in matches:
+            if match[0] >= end:
+                chosen.append(match)
+                end = match[1]
+        return chosen
+
+
+class Food:
+    __slots__ = ('key', 'name', 'per_100g', 'serving', 'units')
+
+    def __init__(self, key, name, per_100g, serving, units):
+        self.key = key
+        self.name = name
+        self.per_100g = per_100g
+        self.serving = serving
+        self.units = units
+
+    def grams(self, quantity, unit):
+        if unit in self.units:
+            return quantity * self.units[unit]
+        if unit in UNIT_GRAMS:
+            return quantity * UNIT_GRAMS[unit]
+        if unit in UNIT_ML:
+            return quantity * UNIT_ML[unit]
+        return quantity * self.serving
+
+
+def _slug(name):
+    return '-'.join(normalize(name).split())
+
+
+def _build_foods():
+    foods, phrases = {}, {}
+    for name, *dish in DISHES:
+        key = _slug(name)
+        calories, protein, carbs, fat = dish[-4:]
+        scale = 100 / DISH_PORTION_GRAMS
+        foods[key] = Food(key, name, (calories * scale, protein * scale, carbs * scale, fat * scale),
+                          DISH_PORTION_GRAMS, {})
+        phrases[normalize(name)] = foods[key]
+    # Common foods come last so their names and synonyms win over a dish with the same phrase
+    for key, synonyms, per_100g, serving, units in COMMON_FOODS:
+        food = foods[_slug(key)] = Food(_slug(key), key.title(), per_100g, serving, units)
+        for phrase in [key] + synonyms:
+            for variant in _plurals(normalize(phrase)):
+                phrases[variant] = food
+    return foods, phrases
+
+
+FOODS, _PHRASES = _build_foods()
+matcher = PhraseMatcher(_PHRASES)
+
+
+def _quantity(text):
+    text = re.sub(r"\s*/\s*", "/", text.strip())
+    if text in NUMBER_WORDS:
+        return float(NUMBER_WORDS[text])
+    if text in FRACTIONS:
+        return FRACTIONS[text]
+    if text[-1] in FRACTIONS:
+        return float(text[:-1] or 0) + FRACTIONS[text[-1]]
+    whole, _, fraction = text.rpartition(' ')
+    numerator, slash, denominator = fraction.partition('/')
+    if slash:
+        value = float(numerator) / float(denominator) if float(denominator) else 0.0
+        return value + (float(whole) if whole else 0.0)
+    return float(text)
+
+
+def _amount(prefix, suffix):
+    """``(quantity, unit, size factor)`` from the words before and after a food phrase; no number gives None."""
+    trailing = _TRAILING.match(suffix)
+    match = _PREFIX.search(_SEPARATOR.split(prefix)[-1])
+    quantity = _quantity(match.group('qty')) if match and match.group('qty') else None
+    unit = UNIT_ALIASES.get(match.group('unit'), match.group('unit')) if match and match.group('unit') else None
+    size = SIZE_FACTORS.get(match.group('size'), 1.0) if match and match.group('size') else 1.0
+    if trailing and unit is None:
+        unit = UNIT_ALIASES.get(trailing.group('unit'), trailing.group('unit'))
+        quantity = float(trailing.group('qty')) * (quantity or 1)
+    return quantity, unit, size, trailing.end() if trailing else 0
+
+
+def _unmatched(parts):
+    words = []
+    for part in parts:
+        part = part.strip(' .!?:()')
+        if re.search(r"[a-z]", part) and not set(re.findall(r"[a-z]+", part)) <= FILLER_WORDS | set(UNIT_ALIASES):
+            words.append(part)
+    return words
+
+
+def parse_meal_text(text):
+    """Foods, amounts and macros in a free-text meal description.
+
+    Returns ``{'items': [...], 'nutrients': {...}, 'unmatched': [...]}``; each
+    item has the ``dish`` (a slug of the food's name, not an FDC id) and ``name``, the ``quantity`` and ``unit`` as
+    written, the estimated ``grams`` and its calories, protein, carbs and fat.
+    ``unmatched`` lists the parts of the text no food was found in.
+    """
+    text = normalize(text)
+    matches = matcher.find(text)
+    items, unmatched = [], []
+    totals = dict.fromkeys(MACROS, 0.0)
+    position = 0
+    for i, (start, end, food) in enumerate(matches):
+        next_start = matches[i + 1][0] if i + 1 < len(matches) else len(text)
+        gap = text[position:start]
+        quantity, unit, size, consumed = _amount(gap, text[end:next_start])
+        # The last part of the gap holds this food's quantity
+        parts = _SEPARATOR.split(gap)
+        unmatched += _unmatched(parts[:-1])
+        position = end + consumed
+        if parts[-1].split()[-1:] and parts[-1].split()[-1] in NEGATIONS:
+            continue
+
+        if unit is None and quantity is not None and 'piece' in food.units:
+            # A bare count ("12 almonds") counts pieces; no number at all is one serving
+            unit = 'piece'
+        quantity = 1.0 if quantity is None else quantity
+        grams = food.grams(quantity, unit) * size
+        item = {'dish': food.key, 'name': food.name, 'quantity': round(quantity, 2), 'unit': unit or 'serving',
+                'grams': round(grams, 1)}
+        for macro, per_100g in zip(MACROS, food.per_100g):
+            item[macro] = round(per_100g * grams / 100, 1)
+            totals[macro] += item[macro]
+        items.append(item)
+    unmatched += _unmatched(_SEPARATOR.split(text[position:]))
+    return {'items': items, 'nutrients': {macro: round(value, 1) for macro, value in totals.items()},
+            'unmatched': unmatched}
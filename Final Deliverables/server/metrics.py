@@ -0,0 +1,232 @@
+"""Request tracing and Prometheus metrics.
+
+``span(name)`` times a block: the duration goes into the
+``nutrigen_span_duration_seconds`` histogram and onto the current request's
+trace, so a slow request can be broken down into JWT verification,
+Firestore, USDA and LLM time. ``Counter`` and ``Histogram`` are minimal
+thread-safe Prometheus metrics; ``render()`` produces the text exposition
+format served on ``/metrics``, including the hit ratios of every cache
+passed to ``register_cache``.
+
+Metrics live in the process that records them; with several gunicorn
+workers each one reports its own.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+_caches = {}
+_local = threading.local()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _labels(self.label_names, key, [('le', _format_number(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+http_request_duration = Histogram(
+    'nutrigen_http_request_duration_seconds', 'Time to produce a response, by route.',
+    labels=('method', 'route', 'status'))
+span_duration = Histogram(
+    'nutrigen_span_duration_seconds', 'Time spent in instrumented calls (auth, Firestore, USDA, LLM).',
+    labels=('span',))
+span_errors = Counter(
+    'nutrigen_span_errors_total', 'Instrumented calls that raised.', labels=('span',))
+llm_tokens = Counter(
+    'nutrigen_llm_tokens_total', 'LLM tokens reported by the model, by purpose and kind.',
+    labels=('purpose', 'kind'))
+llm_time_to_first_token = Histogram(
+    'nutrigen_llm_time_to_first_token_seconds', 'Time until a streamed LLM reply produced its first chunk.',
+    labels=('purpose',))
+meal_plan_repaired_slots = Counter(
+    'nutrigen_meal_plan_repaired_slots_total', 'Meal plan slots missing or invalid in the LLM reply, by how they were filled.',
+    labels=('source',))
+meal_plan_day_retries = Counter(
+    'nutrigen_meal_plan_day_retries_total', 'Meal plan days requested again after their day request failed, by how they were filled.',
+    labels=('source',))
+
+
+def start_trace():
+    """Start collecting spans for the request handled by this thread."""
+    _local.trace = []
+    return _local.trace
+
+
+def end_trace():
+    """The ``[(span, seconds)]`` recorded since ``start_trace``."""
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    return trace or []
+
+
+def propagate(fn):
+    """Wrap ``fn`` so spans it records on another thread land on the caller's trace."""
+    trace = getattr(_local, 'trace', None)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, 'trace', None)
+        _local.trace = trace
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.trace = previous
+    return wrapper
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        span_errors.inc(span=name)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        span_duration.observe(duration, span=name)
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.append((name, duration))
+
+
+def traced(name):
+    """Decorator form of ``span``."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(purpose, message):
+    """Count the tokens in a LangChain message's ``usage_metadata``, if the model reported any."""
+    usage = getattr(message, 'usage_metadata', None) or {}
+    if usage.get('input_tokens'):
+        llm_tokens.inc(usage['input_tokens'], purpose=purpose, kind='prompt')
+    if usage.get('output_tokens'):
+        llm_tokens.inc(usage['output_tokens'], purpose=purpose, kind='completion')
+
+
+def summarize_trace(trace):
+    """``'llm.chat=1.204s firestore.get=0.031s x2'``: total time per span name, slowest first."""
+    totals = {}
+    for name, duration in trace:
+        total, count = totals.get(name, (0.0, 0))
+        totals[name] = (total + duration, count + 1)
+    parts = []
+    for name, (total, count) in sorted(totals.items(), key=lambda item: -item[1][0]):
+        parts.append(f"{name}={total:.3f}s" + (f" x{count}" if count > 1 else ''))
+    return ' '.join(parts)
+
+
+def register_cache(name, cache):
+    """Report ``cache.stats()`` (hits, misses, evictions, size, hit_ratio) on ``/metrics``."""
+    _caches[name] = cache
+
+
+def _collect_caches():
+    stats = {name: cache.stats() for name, cache in sorted(_caches.items())}
+    lines = []
+    for metric, key, kind, documentation in [
+        ('nutrigen_cache_hits_total', 'hits', 'counter', 'Cache lookups that found an entry.'),
+        ('nutrigen_cache_misses_total', 'misses', 'counter', 'Cache lookups that found nothing.'),
+        ('nutrigen_cache_evictions_total', 'evictions', 'counter', 'Entries evicted to stay within the size limit.'),
+        ('nutrigen_cache_size', 'size', 'gauge', 'Entries currently cached.'),
+        ('nutrigen_cache_hit_ratio', 'hit_ratio', 'gauge', 'Hits divided by lookups since start.'),
+        ('nutrigen_cache_shared_hits_total', 'shared_hits', 'counter', 'Hits answered by the host-wide shared cache.'),
+        ('nutrigen_cache_shared_size', 'shared_size', 'gauge', 'Entries in the host-wide shared cache.'),
+        ('nutrigen_cache_shared_errors_total', 'shared_errors', 'counter', 'Failed shared cache operations.'),
+    ]:
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} {kind}"]
+        for name, values in stats.items():
+            if key in values:
+                lines.append(f"{metric}{_labels(('cache',), (name,))} {_format_number(values[key])}")
+    return lines
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines += metric.collect()
+    lines += _collect_caches()
+    return '\n'.join(lines) + '\n'
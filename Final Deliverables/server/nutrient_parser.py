@@ -0,0 +1,232 @@
+"""Nutrient parsing for USDA food records.
+
+Nutrients are matched by USDA nutrient id (or nutrient number for the
+abridged formats) through a precomputed lookup table instead of by name.
+``parse_foods`` turns many food records into one dense ``NutrientMatrix``
+(foods x nutrients, masses normalized to grams, NaN where a food does not
+report a nutrient), so totals and comparisons are array operations.
+``NutrientMatrix.to_dict`` renders a row in the ``parse_food_details`` shape.
+"""
+import numpy as np
+
+# Output key, USDA nutrient id, nutrient number
+MACRONUTRIENTS = [
+    ('calories', 1008, '208'),
+    ('protein', 1003, '203'),
+    ('fat', 1004, '204'),
+    ('carbs', 1005, '205'),
+    ('fiber', 1079, '291'),
+]
+
+# Micronutrients that always get a column, in this order, so matrices from
+# different batches line up. Anything else a food reports gets a column
+# appended after these.
+MICRONUTRIENTS = [
+    (2000, '269', 'Sugars, total including NLEA', 'g'),
+    (1258, '606', 'Fatty acids, total saturated', 'g'),
+    (1253, '601', 'Cholesterol', 'mg'),
+    (1087, '301', 'Calcium, Ca', 'mg'),
+    (1089, '303', 'Iron, Fe', 'mg'),
+    (1090, '304', 'Magnesium, Mg', 'mg'),
+    (1091, '305', 'Phosphorus, P', 'mg'),
+    (1092, '306', 'Potassium, K', 'mg'),
+    (1093, '307', 'Sodium, Na', 'mg'),
+    (1095, '309', 'Zinc, Zn', 'mg'),
+    (1106, '320', 'Vitamin A, RAE', 'µg'),
+    (1162, '401', 'Vitamin C, total ascorbic acid', 'mg'),
+    (1114, '328', 'Vitamin D (D2 + D3)', 'µg'),
+    (1109, '323', 'Vitamin E (alpha-tocopherol)', 'mg'),
+    (1185, '430', 'Vitamin K (phylloquinone)', 'µg'),
+    (1165, '404', 'Thiamin', 'mg'),
+    (1166, '405', 'Riboflavin', 'mg'),
+    (1167, '406', 'Niacin', 'mg'),
+    (1175, '415', 'Vitamin B-6', 'mg'),
+    (1190, '435', 'Folate, DFE', 'µg'),
+    (1178, '418', 'Vitamin B-12', 'µg'),
+]
+
+# Energy reported other ways; used for calories when 1008 (kcal) is missing
+ENERGY_FALLBACKS = [(2048, '958', 1.0), (2047, '957', 1.0), (1062, '268', 1 / 4.184)]
+
+# Multiplier from a USDA unit name to the unit stored in the matrix
+UNIT_FACTORS = {
+    'g': 1.0,
+    'mg': 1e-3,
+    'µg': 1e-6,
+    'ug': 1e-6,
+    'mcg': 1e-6,
+}
+
+MACRO_INDEX = {key: i for i, (key, _, _) in enumerate(MACRONUTRIENTS)}
+ENERGY_IDS = {1008} | {nutrient_id for nutrient_id, _, _ in ENERGY_FALLBACKS}
+
+
+class Column:
+    __slots__ = ('key', 'name', 'unit', 'factor')
+
+    def __init__(self, key, name, unit):
+        self.key = key
+        self.name = name
+        self.unit = unit
+        self.factor = UNIT_FACTORS.get(unit.lower(), 1.0) if unit else 1.0
+
+    def __repr__(self):
+        return f"Column({self.key!r}, {self.name!r}, {self.unit!r})"
+
+
+def _base_columns():
+    columns = [Column(nutrient_id, key, 'kcal' if key == 'calories' else 'g')
+               for key, nutrient_id, _ in MACRONUTRIENTS]
+    columns += [Column(nutrient_id, name, unit) for nutrient_id, _, name, unit in MICRONUTRIENTS]
+    columns += [Column(nutrient_id, 'Energy', 'kcal' if factor == 1.0 else 'kJ')
+                for nutrient_id, _, factor in ENERGY_FALLBACKS]
+    return columns
+
+
+# Nutrient number -> id for records that only carry the number
+NUMBER_TO_ID = {number: nutrient_id for _, nutrient_id, number in MACRONUTRIENTS}
+NUMBER_TO_ID.update((number, nutrient_id) for nutrient_id, number, _, _ in MICRONUTRIENTS)
+NUMBER_TO_ID.update((number, nutrient_id) for nutrient_id, number, _ in ENERGY_FALLBACKS)
+
+
+def read_nutrient(entry):
+    """Return ``(key, name, unit, amount)`` for any USDA foodNutrients entry format."""
+    nutrient = entry.get('nutrient')
+    if nutrient:
+        # GET /food/{fdcId} and POST /foods (full format)
+        key = nutrient.get('id')
+        number = nutrient.get('number')
+        name = nutrient.get('name')
+        unit = nutrient.get('unitName')
+        amount = entry.get('amount')
+    elif 'nutrientId' in entry or 'nutrientName' in entry:
+        # /foods/search results
+        key = entry.get('nutrientId')
+        number = entry.get('nutrientNumber')
+        name = entry.get('nutrientName')
+        unit = entry.get('unitName')
+        amount = entry.get('value')
+    else:
+        # /foods/list and abridged format
+        key = None
+        number = entry.get('number')
+        name = entry.get('name')
+        unit = entry.get('unitName')
+        amount = entry.get('amount')
+    if key is None:
+        key = NUMBER_TO_ID.get(str(number)) if number is not None else None
+        if key is None:
+            key = f"#{number}" if number else name
+    return key, name, unit or '', amount
+
+
+class NutrientMatrix:
+    """Nutrient values for a batch of foods.
+
+    ``values[i, j]`` is the amount of ``columns[j]`` in food ``i``, per the
+    record's reference amount (100 g for USDA foods), in grams for mass units,
+    kcal for energy and the USDA unit otherwise.
+    """
+
+    def __init__(self, foods, columns, values):
+        self.foods = foods
+        self.columns = columns
+        self.values = values
+        self._column_index = {column.key: j for j, column in enumerate(columns)}
+
+    def __len__(self):
+        return len(self.foods)
+
+    @property
+    def fdc_ids(self):
+        return [food['fdcId'] for food in self.foods]
+
+    def column(self, key):
+        """Values of one nutrient across all foods, 0 where missing.
+
+        ``key`` is a macronutrient name (``'protein'``) or a USDA nutrient id.
+        """
+        if key in MACRO_INDEX:
+            j = MACRO_INDEX[key]
+        else:
+            j = self._column_index[key]
+        return np.nan_to_num(self.values[:, j])
+
+    def macros(self):
+        """``(n_foods, 5)`` array of calories, protein, fat, carbs and fiber."""
+        return np.nan_to_num(self.values[:, :len(MACRONUTRIENTS)])
+
+    def scaled(self, factors):
+        """Values with row ``i`` multiplied by ``factors[i]`` (e.g. grams / 100)."""
+        return self.values * np.asarray(factors, dtype=np.float64)[:, None]
+
+    def totals(self, factors=None):
+        """Column sums over all foods (optionally scaled per food); NaN if no food reports it."""
+        values = self.values if factors is None else self.scaled(factors)
+        reported = ~np.isnan(values).all(axis=0)
+        sums = np.nansum(values, axis=0)
+        return np.where(reported, sums, np.nan)
+
+    def format_row(self, row, food=None):
+        """Render a row of values in the ``parse_food_details`` shape."""
+        food = food or {}
+        macros = np.nan_to_num(row[:len(MACRONUTRIENTS)])
+        nutrients = {key: round(float(macros[i]), 2) for i, (key, _, _) in enumerate(MACRONUTRIENTS)}
+        micronutrients = {}
+        for j in np.flatnonzero(~np.isnan(row)).tolist():
+            column = self.columns[j]
+            if j < len(MACRONUTRIENTS) or column.key in ENERGY_IDS:
+                continue
+            micronutrients[column.name] = f"{round(float(row[j]) / column.factor, 6)} {column.unit.lower()}"
+        nutrients['micronutrients'] = micronutrients
+        return {
+            'fdcId': food.get('fdcId'),
+            'name': food.get('name'),
+            'brand': food.get('brand'),
+            'nutrients': nutrients,
+        }
+
+    def to_dict(self, i):
+        return self.format_row(self.values[i], self.foods[i])
+
+    def to_dicts(self):
+        return [self.to_dict(i) for i in range(len(self.foods))]
+
+
+def parse_foods(food_records):
+    """Parse USDA food records into a ``NutrientMatrix``."""
+    columns = _base_columns()
+    column_index = {column.key: j for j, column in enumerate(columns)}
+
+    foods, rows, cols, amounts, factors = [], [], [], [], []
+    for i, food in enumerate(food_records):
+        foods.append({
+            'fdcId': food.get('fdcId'),
+            'name': food.get('description'),
+            'brand': food.get('brandOwner'),
+        })
+        for entry in food.get('foodNutrients') or []:
+            key, name, unit, amount = read_nutrient(entry)
+            if amount is None or key is None:
+                continue
+            j = column_index.get(key)
+            if j is None:
+                j = column_index[key] = len(columns)
+                columns.append(Column(key, name, unit))
+            rows.append(i)
+            cols.append(j)
+            amounts.append(amount)
+            factors.append(UNIT_FACTORS.get(unit.lower(), 1.0))
+
+    values = np.full((len(foods), len(columns)), np.nan)
+    if rows:
+        values[rows, cols] = np.array(amounts, dtype=np.float64) * np.array(factors)
+
+        calories = values[:, 0]
+        for nutrient_id, _, factor in ENERGY_FALLBACKS:
+            missing = np.isnan(calories)
+            if not missing.any():
+                break
+            calories[missing] = values[missing, column_index[nutrient_id]] * factor
+
+    return NutrientMatrix(foods, columns, values)
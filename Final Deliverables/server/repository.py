@@ -0,0 +1,554 @@
+"""Data access for users, meal plans, meal logs and meal plan jobs.
+
+Routes talk to a ``DataStore`` instead of calling ``db.collection(...)``
+directly. A store sits on a backend that reads and writes documents by slash
+path (``'users/<uid>'``, ``'mealLogs/<uid>/entries'``):
+
+- ``FirestoreBackend`` wraps a ``google.cloud.firestore`` client,
+- ``MemoryBackend`` keeps documents in a dict with the same semantics
+  (merge, field masks, server timestamps, batches, transactions) for tests
+  and benchmarks.
+
+``DATA_BACKEND=memory`` selects the in-memory backend; the default is
+Firestore. Reads of users and meal plans go through a read-through
+``TTLCache`` that writes made through the store invalidate; with
+``SHARED_CACHE_PATH`` set it is shared by the workers on the host (see
+``shared_cache``).
+"""
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from cache import SingleFlight, MISSING
+from jobs import FINISHED
+from meal_logs import apply_log
+from metrics import span, traced
+from shared_cache import make_cache, SHARED_CACHE_LOCAL_TTL
+
+logger = logging.getLogger(__name__)
+
+
+def _project(data, fields):
+    """Keep only ``fields`` (dotted paths allowed) of a document dict."""
+    if data is None or fields is None:
+        return data
+    result = {}
+    for field in fields:
+        parts = field.split('.')
+        value = data
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = result
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = copy.deepcopy(value)
+    return result
+
+
+class FirestoreBackend:
+    """``get_db()`` returns the Firestore client; it is called per operation so
+    the client can be built lazily and per process."""
+
+    def __init__(self, get_db):
+        self.get_db = get_db
+
+    @property
+    def db(self):
+        return self.get_db()
+
+    @property
+    def SERVER_TIMESTAMP(self):
+        from firebase_admin import firestore
+        return firestore.SERVER_TIMESTAMP
+
+    def ready(self):
+        """Build the client, which fails fast on missing or malformed credentials."""
+        self.get_db()
+
+    @traced('firestore.get')
+    def get(self, path, fields=None):
+        doc = self.db.document(path).get(field_paths=fields)
+        return doc.to_dict() if doc.exists else None
+
+    @traced('firestore.get_all')
+    def get_all(self, paths, fields=None):
+        """Documents for ``paths`` in one round trip, in order, None where missing."""
+        refs = [self.db.document(path) for path in paths]
+        found = {doc.reference.path: doc.to_dict() for doc in self.db.get_all(refs, field_paths=fields) if doc.exists}
+        return [found.get(path) for path in paths]
+
+    @traced('firestore.set')
+    def set(self, path, data, merge=False):
+        self.db.document(path).set(data, merge=merge)
+
+    @traced('firestore.update')
+    def update(self, path, data):
+        self.db.document(path).update(data)
+
+    @traced('firestore.add')
+    def add(self, collection, data):
+        _, ref = self.db.collection(collection).add(data)
+        return ref.id
+
+    @traced('firestore.query')
+    def query(self, collection, order_by, descending=False, start=None, end=None, after=None, limit=None):
+        """``[(doc_id, data)]`` under ``collection`` ordered by ``order_by`` then document id.
+
+        ``start`` (inclusive) and ``end`` (exclusive) bound ``order_by``;
+        ``after`` is the ``(value, doc_id)`` of the last document of the
+        previous page.
+        """
+        from firebase_admin import firestore
+
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        query = self.db.collection(collection)
+        if start is not None:
+            query = query.where(order_by, '>=', start)
+        if end is not None:
+            query = query.where(order_by, '<', end)
+        query = query.order_by(order_by, direction=direction).order_by('__name__', direction=direction)
+        if after is not None:
+            query = query.start_after(list(after))
+        if limit:
+            query = query.limit(limit)
+        return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+    def batch(self):
+        return FirestoreBatch(self.db)
+
+    @traced('firestore.transaction')
+    def transaction(self, fn):
+        """Run ``fn(txn)`` in a Firestore transaction; it is retried on contention,
+        so ``fn`` must not have side effects besides its ``txn`` writes."""
+        from firebase_admin import firestore
+
+        attempts = []
+
+        @firestore.transactional
+        def run(transaction):
+            txn = FirestoreTransaction(self.db, transaction)
+            attempts.append(txn)
+            return fn(txn)
+
+        result = run(self.db.transaction())
+        for callback in attempts[-1]._on_commit:
+            callback()
+        return result
+
+
+class FirestoreBatch:
+    """Writes collected and committed in one request (at most 500 per batch)."""
+
+    def __init__(self, db):
+        self.db = db
+        self._batch = db.batch()
+        self._on_commit = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+
+    def set(self, path, data, merge=False):
+        self._batch.set(self.db.document(path), data, merge=merge)
+
+    def update(self, path, data):
+        self._batch.update(self.db.document(path), data)
+
+    def add(self, collection, data):
+        ref = self.db.collection(collection).document()
+        self._batch.set(ref, data)
+        return ref.id
+
+    def after_commit(self, fn):
+        self._on_commit.append(fn)
+
+    def commit(self):
+        with span('firestore.commit'):
+            self._batch.commit()
+        for fn in self._on_commit:
+            fn()
+
+
+class FirestoreTransaction(FirestoreBatch):
+    """Reads and writes inside ``FirestoreBackend.transaction``; reads must come first."""
+
+    def __init__(self, db, transaction):
+        self.db = db
+        self._batch = transaction
+        self._on_commit = []
+
+    @traced('firestore.transaction_get')
+    def get(self, path, fields=None):
+        doc = self.db.document(path).get(field_paths=fields, transaction=self._batch)
+        return doc.to_dict() if doc.exists else None
+
+    def commit(self):
+        raise RuntimeError("Transactions commit when the transaction function returns")
+
+
+class MemoryBackend:
+    """Dict-backed stand-in for Firestore, safe to share between threads."""
+
+    SERVER_TIMESTAMP = object()
+
+    def __init__(self):
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def ready(self):
+        pass
+
+    def _resolve(self, value, now):
+        if value is self.SERVER_TIMESTAMP:
+            return now
+        if isinstance(value, dict):
+            return {k: self._resolve(v, now) for k, v in value.items()}
+        return copy.deepcopy(value)
+
+    def _merge(self, target, data):
+        for key, value in data.items():
+            if isinstance(value, dict) and isinstance(target.get(key), dict):
+                self._merge(target[key], value)
+            else:
+                target[key] = value
+
+    def get(self, path, fields=None):
+        with self._lock:
+            data = self.documents.get(path)
+            return _project(data, fields) if fields is not None else copy.deepcopy(data)
+
+    def get_all(self, paths, fields=None):
+        return [self.get(path, fields) for path in paths]
+
+    def set(self, path, data, merge=False):
+        with self._lock:
+            self._write(path, 'set', data, merge)
+
+    def update(self, path, data):
+        with self._lock:
+            self._write(path, 'update', data)
+
+    def add(self, collection, data):
+        doc_id = uuid.uuid4().hex[:20]
+        self.set(f"{collection}/{doc_id}", data)
+        return doc_id
+
+    def query(self, collection, order_by, descending=False, start=None, end=None, after=None, limit=None):
+        docs = [(doc_id, data) for doc_id, data in self.collection(collection).items() if order_by in data]
+        if start is not None:
+            docs = [doc for doc in docs if doc[1][order_by] >= start]
+        if end is not None:
+            docs = [doc for doc in docs if doc[1][order_by] < end]
+        docs.sort(key=lambda doc: (doc[1][order_by], doc[0]), reverse=descending)
+        if after is not None:
+            after = tuple(after)
+            if descending:
+                docs = [doc for doc in docs if (doc[1][order_by], doc[0]) < after]
+            else:
+                docs = [doc for doc in docs if (doc[1][order_by], doc[0]) > after]
+        return docs[:limit] if limit else docs
+
+    def batch(self):
+        return MemoryBatch(self)
+
+    def transaction(self, fn):
+        """Run ``fn(txn)`` with the store locked, then apply its writes atomically."""
+        with self._lock:
+            txn = MemoryTransaction(self)
+            result = fn(txn)
+            txn._apply()
+        txn._committed()
+        return result
+
+    def _write(self, path, op, data, merge=False):
+        data = self._resolve(data, datetime.now(timezone.utc))
+        if op == 'set':
+            if merge and path in self.documents:
+                self._merge(self.documents[path], data)
+            else:
+                self.documents[path] = data
+        else:
+            doc = self.documents.get(path)
+            if doc is None:
+                raise KeyError(f"No document to update: {path}")
+            for field, value in data.items():
+                *parents, last = field.split('.')
+                target = doc
+                for part in parents:
+                    target = target.setdefault(part, {})
+                target[last] = value
+
+    def collection(self, collection):
+        """``{doc_id: data}`` for the documents directly under ``collection``."""
+        prefix = collection.rstrip('/') + '/'
+        with self._lock:
+            return {
+                path[len(prefix):]: copy.deepcopy(data)
+                for path, data in self.documents.items()
+                if path.startswith(prefix) and '/' not in path[len(prefix):]
+            }
+
+
+class MemoryBatch:
+    def __init__(self, backend):
+        self.backend = backend
+        self._writes = []
+        self._on_commit = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+
+    def set(self, path, data, merge=False):
+        self._writes.append((path, 'set', data, merge))
+
+    def update(self, path, data):
+        self._writes.append((path, 'update', data, False))
+
+    def add(self, collection, data):
+        doc_id = uuid.uuid4().hex[:20]
+        self.set(f"{collection}/{doc_id}", data)
+        return doc_id
+
+    def after_commit(self, fn):
+        self._on_commit.append(fn)
+
+    def commit(self):
+        with self.backend._lock:
+            self._apply()
+        self._committed()
+
+    def _apply(self):
+        # All writes apply together, or none do: the only write that can fail
+        # is an update of a missing document, so check those first
+        created = set()
+        for path, op, _, _ in self._writes:
+            if op == 'update' and path not in created and path not in self.backend.documents:
+                raise KeyError(f"No document to update: {path}")
+            created.add(path)
+        for path, op, data, merge in self._writes:
+            self.backend._write(path, op, data, merge)
+        self._writes = []
+
+    def _committed(self):
+        for fn in self._on_commit:
+            fn()
+
+
+class MemoryTransaction(MemoryBatch):
+    def get(self, path, fields=None):
+        # The backend lock is already held by MemoryBackend.transaction
+        data = self.backend.documents.get(path)
+        return _project(data, fields) if fields is not None else copy.deepcopy(data)
+
+    def commit(self):
+        raise RuntimeError("Transactions commit when the transaction function returns")
+
+
+class Collection:
+    """Documents of one top-level collection, keyed by user id."""
+
+    name = None
+
+    def __init__(self, backend, cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.flight = SingleFlight()
+        self._masks = set()
+
+    def path(self, doc_id):
+        return f"{self.name}/{doc_id}"
+
+    def get(self, doc_id, fields=None, transaction=None):
+        """The document as a dict, or None; ``fields`` limits what is fetched.
+
+        Reads inside a ``transaction`` always go to the backend.
+        """
+        if transaction is not None:
+            return transaction.get(self.path(doc_id), fields)
+        if self.cache is None:
+            return self.backend.get(self.path(doc_id), fields)
+
+        fields = tuple(fields) if fields else None
+        if fields is not None:
+            full = self.cache.get(doc_id, MISSING, count=False)
+            if full is not MISSING:
+                return _project(full, fields) if full is not None else None
+            self._masks.add(fields)
+        key = (doc_id, fields) if fields else doc_id
+
+        data = self.cache.get(key, MISSING)
+        if data is MISSING:
+            def fetch():
+                data = self.backend.get(self.path(doc_id), list(fields) if fields else None)
+                self.cache.set(key, data)
+                return data
+            data = self.flight.do(key, fetch)
+        return copy.deepcopy(data)
+
+    def get_many(self, doc_ids, fields=None):
+        """``{doc_id: data or None}`` fetched in one round trip."""
+        docs = self.backend.get_all([self.path(doc_id) for doc_id in doc_ids], fields)
+        return dict(zip(doc_ids, docs))
+
+    def set(self, doc_id, data, merge=False, batch=None):
+        (batch or self.backend).set(self.path(doc_id), data, merge=merge)
+        self._written(doc_id, batch)
+
+    def update(self, doc_id, data, batch=None):
+        (batch or self.backend).update(self.path(doc_id), data)
+        self._written(doc_id, batch)
+
+    def _written(self, doc_id, batch):
+        if batch is None:
+            self.invalidate(doc_id)
+        else:
+            batch.after_commit(lambda: self.invalidate(doc_id))
+
+    def invalidate(self, doc_id):
+        # Written documents may hold server timestamps that only resolve on
+        # read, so the next read goes to the backend instead of caching ``data``
+        if self.cache is not None:
+            self.cache.delete(doc_id)
+            for fields in list(self._masks):
+                self.cache.delete((doc_id, fields))
+
+
+class Users(Collection):
+    name = 'users'
+
+
+class MealPlans(Collection):
+    name = 'mealPlans'
+
+
+class MealPlanJobs(Collection):
+    name = 'mealPlanJobs'
+    # <uid> -> {'jobId': ...}, the job last started for the user by any worker
+    owners = 'mealPlanJobOwners'
+
+    def claim(self, user_id, job_id, status, stale_after):
+        """Make ``job_id`` the user's job unless another worker's job is still live.
+
+        The claim and the job's first ``status`` are written in one
+        transaction. Returns None when claimed, otherwise ``(job_id, status)``
+        of the live job. A job whose status is finished, missing or older
+        than ``stale_after`` seconds (its worker died) no longer counts.
+        """
+        def run(txn):
+            owner = txn.get(f"{self.owners}/{user_id}")
+            if owner and owner.get('jobId') != job_id:
+                current = txn.get(self.path(owner['jobId']))
+                if (current is not None and current.get('status') not in FINISHED
+                        and current.get('updatedAt', 0) > time.time() - stale_after):
+                    return owner['jobId'], current
+            txn.set(f"{self.owners}/{user_id}", {'jobId': job_id})
+            txn.set(self.path(job_id), status)
+            return None
+
+        return self.backend.transaction(run)
+
+
+class MealLogs(Collection):
+    name = 'mealLogs'
+
+    def entries_path(self, user_id):
+        return f"{self.path(user_id)}/entries"
+
+    def add_entry(self, user_id, entry, batch=None):
+        return (batch or self.backend).add(self.entries_path(user_id), entry)
+
+    def entries(self, user_id, start=None, end=None, after=None, limit=20, descending=True):
+        """One page of ``[(entry_id, entry)]`` ordered by timestamp; see ``query`` for the arguments."""
+        return self.backend.query(self.entries_path(user_id), 'timestamp', descending=descending,
+                                  start=start, end=end, after=after, limit=limit)
+
+    def iter_entries(self, user_id, start=None, end=None, descending=False, page_size=500):
+        """Yield every ``(entry_id, entry)`` in range, fetching ``page_size`` at a time."""
+        after = None
+        while True:
+            page = self.entries(user_id, start, end, after, page_size, descending)
+            yield from page
+            if len(page) < page_size:
+                return
+            entry_id, entry = page[-1]
+            after = (entry['timestamp'], entry_id)
+
+    def log(self, user_id, entry, today, macros):
+        """Add ``entry`` and roll ``macros`` into the streak and totals in one transaction.
+
+        Returns ``(streak, first_today)``.
+        """
+        def run(txn):
+            data = self.get(user_id, transaction=txn)
+            data, streak, first_today = apply_log(data, today, macros)
+            self.set(user_id, data, batch=txn)
+            self.add_entry(user_id, entry, batch=txn)
+            return streak, first_today
+
+        return self.backend.transaction(run)
+
+
+class DataStore:
+    def __init__(self, backend, user_cache=None, plan_cache=None):
+        self.backend = backend
+        self.users = Users(backend, user_cache)
+        self.meal_plans = MealPlans(backend, plan_cache)
+        # Logs and job status change on every request and are read from
+        # other workers, so they are always read from the backend
+        self.meal_logs = MealLogs(backend)
+        self.meal_plan_jobs = MealPlanJobs(backend)
+
+    @property
+    def SERVER_TIMESTAMP(self):
+        return self.backend.SERVER_TIMESTAMP
+
+    def transaction(self, fn):
+        """Run ``fn(txn)`` atomically; pass ``txn`` as ``transaction=`` to reads and ``batch=`` to writes."""
+        return self.backend.transaction(fn)
+
+    def batch(self):
+        """Group writes into one commit: ``with store.batch() as batch: store.users.set(..., batch=batch)``."""
+        return self.backend.batch()
+
+
+def create_store(backend=None):
+    """Build the store for ``DATA_BACKEND`` (``firestore`` or ``memory``)."""
+    backend = backend or os.getenv('DATA_BACKEND', 'firestore').lower()
+    if backend == 'memory':
+        logger.info("Using the in-memory data backend")
+        backend = MemoryBackend()
+    elif backend == 'firestore':
+        from firebase_config import get_db
+        backend = FirestoreBackend(get_db)
+    else:
+        raise ValueError(f"Unknown DATA_BACKEND: {backend}")
+
+    return DataStore(
+        backend,
+        user_cache=make_cache(
+            'users',
+            maxsize=int(os.getenv('USER_CACHE_SIZE', 10000)),
+            ttl=int(os.getenv('USER_CACHE_TTL', 300)),
+            local_ttl=SHARED_CACHE_LOCAL_TTL,
+        ),
+        plan_cache=make_cache(
+            'meal_plans',
+            maxsize=int(os.getenv('MEAL_PLAN_DOC_CACHE_SIZE', 10000)),
+            ttl=int(os.getenv('MEAL_PLAN_DOC_CACHE_TTL', 60)),
+            local_ttl=SHARED_CACHE_LOCAL_TTL,
+        ),
+    )
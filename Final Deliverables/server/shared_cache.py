@@ -0,0 +1,270 @@
+"""Host-wide cache tier shared by the gunicorn workers.
+
+Set ``SHARED_CACHE_PATH`` (e.g. ``/dev/shm/nutrigen-cache.db``) and the
+caches built with ``make_cache`` become a ``TieredCache``: the worker's own
+``TTLCache`` in front of a ``SharedCache``, one namespace of a SQLite file in
+WAL mode that every worker on the host reads and writes. A USDA food, a
+profile or a generated plan fetched by one worker is then a local read for
+the others, and stays warm across worker restarts.
+
+Values are stored pickled, so a shared hit is one indexed read plus
+``pickle.loads`` (no JSON parsing), and the in-process tier keeps the
+loaded object for repeat hits. Only this app should be able to write the
+file. The file is capped at ``SHARED_CACHE_MAX_MB``: expired entries are
+dropped first, then the least recently used. A broken or locked file makes
+lookups miss instead of failing requests.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from cache import TTLCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH')
+SHARED_CACHE_MAX_BYTES = int(float(os.getenv('SHARED_CACHE_MAX_MB', 256)) * 1024 * 1024)
+# Longest a worker keeps its own copy of a mutable entry (profiles, saved
+# plans), bounding how long another worker's write can go unseen
+SHARED_CACHE_LOCAL_TTL = int(os.getenv('SHARED_CACHE_LOCAL_TTL', 30))
+
+# Seconds to wait for another worker's write lock
+BUSY_TIMEOUT = 2.0
+# A hit refreshes the entry's LRU time at most this often, so reads rarely write
+TOUCH_INTERVAL = 60
+# Writes between checks of the size cap
+EVICT_EVERY = 256
+# Fraction of the cap to shrink to when evicting
+EVICT_TARGET = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+"""
+
+_local = threading.local()
+# SQLite allows one writer per file; threads of a worker queue here instead of
+# in SQLite's busy handler, which sleeps in steps of several milliseconds
+_write_lock = threading.Lock()
+
+
+def _connect(path):
+    # One connection per file, thread and process; connections must not cross a fork
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        connections[path] = conn
+    return conn
+
+
+def reset_after_fork():
+    """Drop the connections and write lock inherited from the parent process.
+
+    SQLite connections must not be used across ``fork``; the child opens its
+    own on first use. Called from gunicorn's ``post_fork`` hook.
+    """
+    global _local, _write_lock
+    _local = threading.local()
+    _write_lock = threading.Lock()
+
+
+def _key(key):
+    # Keys are strings, numbers and tuples of them, whose repr is stable across processes
+    return repr(key)
+
+
+class SharedCache:
+    """One namespace of the SQLite cache file at ``path``."""
+
+    def __init__(self, path, namespace, ttl=300, max_bytes=SHARED_CACHE_MAX_BYTES):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._writes = 0
+
+    def _failed(self, action, error):
+        self.errors += 1
+        if self.errors == 1 or self.errors % 1000 == 0:
+            logger.warning(f"Shared cache {self.namespace} {action} failed ({self.errors} so far): {str(error)}")
+
+    def lookup(self, key, count=True):
+        """``(value, expires_at)`` for ``key``, or ``(MISSING, None)``."""
+        now = time.time()
+        try:
+            conn = _connect(self.path)
+            row = conn.execute('SELECT value, expires, accessed FROM entries WHERE ns = ? AND key = ?',
+                               (self.namespace, _key(key))).fetchone()
+            if row is not None and row[1] > now:
+                value = pickle.loads(row[0])
+                if row[2] < now - TOUCH_INTERVAL:
+                    with _write_lock:
+                        conn.execute('UPDATE entries SET accessed = ? WHERE ns = ? AND key = ?',
+                                     (now, self.namespace, _key(key)))
+                if count:
+                    self.hits += 1
+                return value, row[1]
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            self._failed('read', e)
+        if count:
+            self.misses += 1
+        return MISSING, None
+
+    def get(self, key, default=None, count=True):
+        value, _ = self.lookup(key, count=count)
+        return default if value is MISSING else value
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self._failed('serialize', e)
+            return
+        try:
+            conn = _connect(self.path)
+            with _write_lock:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (ns, key, value, expires, accessed) VALUES (?, ?, ?, ?, ?)',
+                    (self.namespace, _key(key), data, now + (self.ttl if ttl is None else ttl), now))
+                self._writes += 1
+                if self._writes % EVICT_EVERY == 0:
+                    self.evict()
+        except sqlite3.Error as e:
+            self._failed('write', e)
+
+    def delete(self, key):
+        """Delete ``key`` and every tuple key that starts with it, e.g. ``(doc_id, fields)``."""
+        prefix = '(' + _key(key) + ','
+        try:
+            conn = _connect(self.path)
+            with _write_lock:
+                conn.execute('DELETE FROM entries WHERE ns = ? AND (key = ? OR (key >= ? AND key < ?))',
+                             (self.namespace, _key(key), prefix, prefix + '\U0010ffff'))
+        except sqlite3.Error as e:
+            self._failed('delete', e)
+
+    def clear(self):
+        try:
+            conn = _connect(self.path)
+            with _write_lock:
+                conn.execute('DELETE FROM entries WHERE ns = ?', (self.namespace,))
+        except sqlite3.Error as e:
+            self._failed('clear', e)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the file is under its cap."""
+        conn = _connect(self.path)
+        conn.execute('DELETE FROM entries WHERE expires <= ?', (time.time(),))
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        for _ in range(20):
+            used = (conn.execute('PRAGMA page_count').fetchone()[0]
+                    - conn.execute('PRAGMA freelist_count').fetchone()[0]) * page_size
+            if used <= self.max_bytes * EVICT_TARGET:
+                return
+            rows = conn.execute('SELECT count(*) FROM entries').fetchone()[0]
+            if not rows:
+                return
+            conn.execute('DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY accessed LIMIT ?)',
+                         (max(rows // 20, 1),))
+
+    def size(self):
+        try:
+            return _connect(self.path).execute('SELECT count(*) FROM entries WHERE ns = ? AND expires > ?',
+                                               (self.namespace, time.time())).fetchone()[0]
+        except sqlite3.Error as e:
+            self._failed('count', e)
+            return 0
+
+
+class TieredCache:
+    """A worker's ``TTLCache`` in front of a ``SharedCache``, usable wherever a ``TTLCache`` is.
+
+    ``local_ttl`` caps how long the worker keeps its own copy of an entry.
+    """
+
+    def __init__(self, local, shared, local_ttl=None):
+        self.local = local
+        self.shared = shared
+        self.local_ttl = local_ttl
+        self.maxsize = local.maxsize
+        self.ttl = shared.ttl
+
+    def __len__(self):
+        return len(self.local)
+
+    def __contains__(self, key):
+        return self.get(key, MISSING, count=False) is not MISSING
+
+    def _local_ttl(self, ttl):
+        return min(ttl, self.local_ttl) if self.local_ttl else ttl
+
+    def get(self, key, default=None, count=True):
+        value = self.local.get(key, MISSING, count=count)
+        if value is not MISSING:
+            return value
+        value, expires_at = self.shared.lookup(key, count=count)
+        if value is MISSING:
+            return default
+        self.local.set(key, value, ttl=self._local_ttl(expires_at - time.time()))
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl=self._local_ttl(ttl))
+        self.shared.set(key, value, ttl=ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        local = self.local.stats()
+        hits = local['hits'] + self.shared.hits
+        lookups = hits + self.shared.misses
+        return {
+            **local,
+            'hits': hits,
+            'misses': self.shared.misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'shared_hits': self.shared.hits,
+            'shared_size': self.shared.size(),
+            'shared_errors': self.shared.errors,
+        }
+
+
+def make_cache(namespace, maxsize, ttl, local_ttl=None):
+    """A ``TTLCache``, or with ``SHARED_CACHE_PATH`` set a ``TieredCache`` shared by the workers on this host.
+
+    Pass ``local_ttl`` for data other workers can change, so a worker's own
+    copy is refreshed from the shared tier at least that often.
+    """
+    local = TTLCache(maxsize=maxsize, ttl=ttl)
+    if not SHARED_CACHE_PATH:
+        return local
+    return TieredCache(local, SharedCache(SHARED_CACHE_PATH, namespace, ttl=ttl), local_ttl=local_ttl)
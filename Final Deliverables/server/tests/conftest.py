@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests import the server modules the way the app does, from the server directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Routes and jobs run against the in-memory backend instead of Firestore
+os.environ.setdefault('DATA_BACKEND', 'memory')
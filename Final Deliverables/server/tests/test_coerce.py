@@ -0,0 +1,22 @@
+import pytest
+
+from coerce import normalize_text, to_number
+
+
+@pytest.mark.parametrize('value, expected', [
+    (12, 12.0), (2.5, 2.5), ('450 kcal', 450.0), ('12.5g', 12.5), ('1,200', 1200.0), (' -3 ', -3.0),
+])
+def test_to_number(value, expected):
+    assert to_number(value) == expected
+
+
+@pytest.mark.parametrize('value', [None, '', 'lots', True, [1]])
+def test_to_number_without_a_number(value):
+    assert to_number(value, 0.0) == 0.0
+    with pytest.raises(ValueError):
+        to_number(value)
+
+
+def test_normalize_text():
+    assert normalize_text(' Moderately-Active\n') == 'moderately active'
+    assert normalize_text(None) == ''
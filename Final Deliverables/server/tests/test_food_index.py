@@ -0,0 +1,50 @@
+from food_index import FoodIndex
+
+
+def _index(*descriptions):
+    index = FoodIndex()
+    index.add_many({'fdcId': 100 + i, 'description': description} for i, description in enumerate(descriptions))
+    return index
+
+
+def _ids(index, query, **kwargs):
+    return [food['fdcId'] for food in index.search(query, **kwargs)[1]]
+
+
+def test_prefix_matches_whole_words_only_from_the_start():
+    index = _index('Bananas, raw', 'Plantains, raw', 'Apple juice')
+    assert _ids(index, 'banan') == [100]
+    assert _ids(index, 'nanas') == []
+
+
+def test_every_query_word_must_match():
+    index = _index('Milk, whole', 'Milk, chocolate', 'Chocolate bar')
+    assert _ids(index, 'milk choc') == [101]
+    assert _ids(index, 'milk cheese') == []
+
+
+def test_exact_word_outranks_prefix_expansion():
+    index = _index('Riceberry pudding', 'Rice, white')
+    assert _ids(index, 'rice') == [101, 100]
+
+
+def test_shorter_description_ranks_first():
+    index = _index('Oats, rolled, dry, with added sugar and salt', 'Oats')
+    assert _ids(index, 'oats') == [101, 100]
+
+
+def test_ties_keep_insertion_order_across_pages():
+    index = _index('Egg, boiled', 'Egg, fried', 'Egg, poached', 'Egg, scrambled')
+    total, first = index.search('egg', page_size=2, page_number=1)
+    _, second = index.search('egg', page_size=2, page_number=2)
+    assert total == 4
+    assert [food['fdcId'] for food in first + second] == [100, 101, 102, 103]
+
+
+def test_foods_added_later_are_searchable_and_not_duplicated():
+    index = _index('Lentils, boiled')
+    assert _ids(index, 'lentil') == [100]
+    index.add({'fdcId': 200, 'description': 'Lentil soup'})
+    index.add({'fdcId': 200, 'description': 'Lentil soup'})
+    assert len(index) == 2
+    assert sorted(_ids(index, 'lentil')) == [100, 200]
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+import shared_cache
+from usda_client import USDAClient, MicroBatcher
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+
+
+def _in_child(check):
+    """Run ``check`` in a forked child, the way gunicorn starts a preloaded worker."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os._exit(0 if check() else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+def test_shared_cache_reopens_connections(tmp_path):
+    cache = shared_cache.SharedCache(str(tmp_path / 'cache.db'), 'ns')
+    cache.set('key', 'parent')
+    parent_conn = shared_cache._connect(cache.path)
+
+    def check():
+        shared_cache.reset_after_fork()
+        cache.set('key', 'child')
+        return shared_cache._connect(cache.path) is not parent_conn and cache.errors == 0
+
+    assert _in_child(check) == 0
+    assert cache.get('key') == 'child'
+
+
+def test_usda_session_is_rebuilt():
+    client = USDAClient('key', 'https://example.invalid')
+    parent_session = client.session
+
+    def check():
+        client.reset()
+        return client.session is not parent_session
+
+    assert _in_child(check) == 0
+    assert client.session is parent_session
+
+
+def test_batcher_restarts_its_threads():
+    batcher = MicroBatcher(lambda ids: [{'fdcId': fdc_id} for fdc_id in ids], window=0.001)
+    assert batcher.get(1, timeout=1) == {'fdcId': 1}
+
+    def check():
+        batcher.reset()
+        return batcher.get(2, timeout=1) == {'fdcId': 2}
+
+    assert _in_child(check) == 0
@@ -0,0 +1,92 @@
+import threading
+import time
+
+from jobs import JobQueue, RemoteJob, RUNNING, SUCCEEDED
+from repository import MealPlanJobs, MemoryBackend
+
+STALE = 600
+
+
+def _status(job):
+    return {'uid': job.owner, 'status': job.status, 'updatedAt': job.updated_at}
+
+
+def _wait_for(mirror, job, status):
+    # The mirror is written after the job's own status changes
+    deadline = time.time() + 5
+    while (mirror.get(job.id) or {}).get('status') != status and time.time() < deadline:
+        time.sleep(0.01)
+    assert mirror.get(job.id)['status'] == status
+
+
+def _worker(mirror):
+    """A JobQueue as one gunicorn worker sets it up, sharing ``mirror`` with the others."""
+    return JobQueue(
+        max_workers=2,
+        on_update=lambda job: mirror.set(job.id, _status(job)),
+        claim=lambda key, job: mirror.claim(key, job.id, _status(job), STALE),
+    )
+
+
+def test_same_key_in_one_process_returns_the_running_job():
+    queue = JobQueue(max_workers=1)
+    release = threading.Event()
+    job, created = queue.submit('u1', lambda job=None: release.wait(5))
+    again, created_again = queue.submit('u1', lambda job=None: None)
+    release.set()
+    assert created and not created_again
+    assert again is job
+
+
+def test_two_workers_racing_start_one_job():
+    mirror = MealPlanJobs(MemoryBackend())
+    workers = [_worker(mirror) for _ in range(2)]
+    release = threading.Event()
+    barrier = threading.Barrier(len(workers))
+    results = [None] * len(workers)
+
+    def submit(i):
+        barrier.wait()
+        results[i] = workers[i].submit('u1', lambda job=None: release.wait(5), owner='u1')
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+
+    created = [job for job, was_created in results if was_created]
+    remote = [job for job, was_created in results if not was_created]
+    assert len(created) == 1 and len(remote) == 1
+    assert isinstance(remote[0], RemoteJob)
+    assert remote[0].id == created[0].id
+    assert 'uid' not in remote[0].to_dict()
+
+
+def test_finished_or_stale_jobs_do_not_block_a_new_one():
+    mirror = MealPlanJobs(MemoryBackend())
+    first, second = _worker(mirror), _worker(mirror)
+
+    job, _ = first.submit('u1', lambda job=None: 'plan', owner='u1')
+    _wait_for(mirror, job, SUCCEEDED)
+    _, created = second.submit('u1', lambda job=None: 'plan', owner='u1')
+    assert created
+
+    release = threading.Event()
+    job, _ = first.submit('u2', lambda job=None: release.wait(5), owner='u2')
+    _wait_for(mirror, job, RUNNING)
+    # Its worker died: the mirrored status stops changing
+    mirror.set(job.id, {'uid': 'u2', 'status': 'running', 'updatedAt': time.time() - 2 * STALE})
+    _, created = second.submit('u2', lambda job=None: None, owner='u2')
+    release.set()
+    assert created
+
+
+def test_a_failing_claim_still_runs_the_job():
+    def claim(key, job):
+        raise RuntimeError('backend unavailable')
+
+    queue = JobQueue(max_workers=1, claim=claim)
+    job, created = queue.submit('u1', lambda job=None: 'plan')
+    assert created and not isinstance(job, RemoteJob)
@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import pytest
+
+import app as server
+import asgi
+from AI.planCache import DAYS, MEALS
+
+USER = {'name': 'Sam', 'healthDetails': {'age': 30, 'gender': 'female', 'height': 165, 'weight': 60,
+                                         'dietPreference': 'vegetarian', 'goal': 'maintain',
+                                         'activityLevel': 'moderate', 'allergies': ''}}
+PLAN = {'mealPlan': {day: {slot: {'name': f'LLM {slot}', 'ingredients': 'oats', 'portionSize': '1 bowl',
+                                  'calories': 400, 'protein': 20, 'carbs': 50, 'fat': 10}
+                           for slot in MEALS} for day in DAYS}}
+
+
+def _broken_verifier(plan, profile):
+    raise ConnectionError('USDA unreachable')
+
+
+def _no_local_plan(**profile):
+    raise AssertionError('the LLM plan should have been kept')
+
+
+@pytest.fixture(autouse=True)
+def unverifiable(monkeypatch):
+    monkeypatch.setattr(server, 'verify_meal_plan', _broken_verifier)
+    monkeypatch.setattr(asgi, 'verify_meal_plan', _broken_verifier)
+    monkeypatch.setattr(server, 'generate_local_meal_plan', _no_local_plan)
+    monkeypatch.setattr(asgi, 'generate_local_meal_plan', _no_local_plan)
+
+
+def test_unverified_llm_plan_is_served_and_saved(monkeypatch):
+    monkeypatch.setattr(server, 'generate_meal_plan', lambda name, **profile: json.dumps(PLAN))
+
+    plan = server.generate_and_save_meal_plan('user-a', USER, fresh=True, parallel=False)
+
+    assert plan == PLAN
+    assert server.store.meal_plans.get('user-a') == PLAN
+
+
+def test_unverified_llm_plan_is_served_and_saved_async(monkeypatch):
+    async def agenerate_meal_plan(name, **profile):
+        return json.dumps(PLAN)
+
+    monkeypatch.setattr(asgi, 'agenerate_meal_plan', agenerate_meal_plan)
+
+    plan = asyncio.run(asgi.agenerate_and_save_meal_plan('user-b', USER, fresh=True, parallel=False))
+
+    assert plan == PLAN
+    assert server.store.meal_plans.get('user-b') == PLAN
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import AI.mealPlanner as planner
+from metrics import meal_plan_day_retries, meal_plan_repaired_slots
+
+PROFILE = dict(name='Asha', age=30, gender='female', height=165, weight=60, diet_preference='vegetarian',
+               goal='maintain', activity_level='moderate', allergies='')
+
+
+def _meal(day, slot):
+    return {'name': f"{day} {slot}", 'ingredients': 'rice, dal', 'portionSize': '1 bowl',
+            'calories': 450, 'protein': 20, 'carbs': 60, 'fat': 12}
+
+
+def _count(counter, source):
+    return counter._values.get((source,), 0)
+
+
+@pytest.fixture
+def days(monkeypatch):
+    """Tuesday's first request fails; Monday's first reply lacks a valid Snack."""
+    calls = []
+
+    def generate_day(day, details, avoid, slots=None):
+        calls.append((day, slots))
+        if day == 'Tuesday' and slots is None:
+            raise RuntimeError('429 Too Many Requests')
+        slots = slots or planner.MEALS
+        if day == 'Monday' and len(slots) == len(planner.MEALS):
+            slots = [slot for slot in slots if slot != 'Snack']
+        return {slot: _meal(day, slot) for slot in slots}
+
+    monkeypatch.setattr(planner, 'generate_day', generate_day)
+    return calls
+
+
+def test_failed_day_is_retried_and_accepted_days_are_kept(days):
+    reported = []
+    plan = json.loads(planner.generate_meal_plan_parallel(**PROFILE, on_day=lambda day, meals: reported.append(day)))
+
+    assert plan['mealPlan']['Tuesday']['Lunch']['name'] == 'Tuesday Lunch'
+    assert 'Tuesday' not in reported and len(reported) == 6
+    assert [call for call in days if call[0] != 'Tuesday' and call[1] is not None] == [('Monday', ['Snack'])]
+
+
+def test_day_retries_are_not_counted_as_repaired_slots(days):
+    repaired = _count(meal_plan_repaired_slots, 'llm')
+    retries = _count(meal_plan_day_retries, 'llm')
+
+    planner.generate_meal_plan_parallel(**PROFILE)
+
+    assert _count(meal_plan_repaired_slots, 'llm') - repaired == 1
+    assert _count(meal_plan_day_retries, 'llm') - retries == 1
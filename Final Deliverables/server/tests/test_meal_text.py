@@ -0,0 +1,55 @@
+import pytest
+
+from meal_text import FRACTIONS, PhraseMatcher, parse_meal_text
+
+
+def _items(text):
+    return [(item['dish'], item['quantity'], item['unit']) for item in parse_meal_text(text)['items']]
+
+
+def test_fractions_cover_the_unicode_vulgar_fractions():
+    assert FRACTIONS['½'] == 0.5
+    assert FRACTIONS['⅛'] == 0.125
+    assert FRACTIONS['⅞'] == 0.875
+    assert len(FRACTIONS) == 19
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('⅛ cup milk', ('milk', 0.12, 'cup')),
+    ('1⅜ cup rice', ('white-rice', 1.38, 'cup')),
+    ('2 ⅔ cups dal', ('dal', 2.67, 'cup')),
+    ('2 ⅔ roti', ('roti', 2.67, 'serving')),
+    ('1 1/2 cup rice', ('white-rice', 1.5, 'cup')),
+])
+def test_fraction_quantities(text, expected):
+    assert _items(text) == [expected]
+
+
+def test_items_name_the_dish_not_an_fdc_id():
+    item = parse_meal_text('1⅜ cup rice')['items'][0]
+    assert item['dish'] == 'white-rice'
+    assert 'id' not in item
+    assert item['grams'] == 220.0
+
+
+def test_matcher_prefers_the_longest_phrase():
+    matcher = PhraseMatcher({'peanut butter': 'pb', 'butter': 'b', 'peanut': 'p'})
+
+    assert matcher.find('peanut butter toast with butter') == [(0, 13, 'pb'), (25, 31, 'b')]
+
+
+def test_matcher_prefers_the_leftmost_phrase():
+    matcher = PhraseMatcher({'brown rice': 'br', 'rice bowl': 'rb'})
+
+    assert matcher.find('brown rice bowl') == [(0, 10, 'br')]
+
+
+def test_matcher_only_matches_whole_words():
+    matcher = PhraseMatcher({'butter': 'b', 'milk': 'm'})
+
+    assert matcher.find('buttermilk') == []
+    assert matcher.find('butter, milk') == [(0, 6, 'b'), (8, 12, 'm')]
+
+
+def test_peanut_butter_is_not_also_butter():
+    assert _items('2 tbsp peanut butter and butter') == [('peanut-butter', 2.0, 'tbsp'), ('butter', 1.0, 'serving')]
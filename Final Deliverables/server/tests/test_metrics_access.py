@@ -0,0 +1,34 @@
+import pytest
+
+import app as server
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/api/chat/cache-stats'])
+def test_disabled_without_a_token(client, monkeypatch, path):
+    monkeypatch.setattr(server, 'METRICS_TOKEN', None)
+    monkeypatch.setattr(server, 'METRICS_PUBLIC', False)
+
+    assert client.get(path).status_code == 403
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/api/chat/cache-stats'])
+def test_token_required_when_set(client, monkeypatch, path):
+    monkeypatch.setattr(server, 'METRICS_TOKEN', 'scrape')
+
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer scrape'}).status_code == 200
+
+
+def test_public_opt_in(client, monkeypatch):
+    monkeypatch.setattr(server, 'METRICS_TOKEN', None)
+    monkeypatch.setattr(server, 'METRICS_PUBLIC', True)
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'nutrigen_http_request_duration_seconds' in response.data
@@ -0,0 +1,22 @@
+import NutriInsights
+
+
+def _details(monkeypatch, record):
+    monkeypatch.setattr(NutriInsights, 'get_food_details', lambda fdc_id: record)
+
+
+def test_get_nutrients_by_name_reads_nested_records(monkeypatch):
+    _details(monkeypatch, {'fdcId': 1, 'foodNutrients': [
+        {'nutrient': {'id': 1003, 'number': '203', 'name': 'Protein', 'unitName': 'g'}, 'amount': 3.2},
+        {'nutrient': {'id': 1008, 'number': '208', 'name': 'Energy', 'unitName': 'kcal'}, 'amount': 61},
+        {'type': 'FoodNutrient'},
+    ]})
+    assert NutriInsights.get_nutrients_by_name(1, 'protein') == {'Protein': {'value': 3.2, 'unit': 'g'}}
+
+
+def test_get_nutrients_by_name_reads_search_records(monkeypatch):
+    _details(monkeypatch, {'fdcId': 1, 'foodNutrients': [
+        {'nutrientId': 1003, 'nutrientName': 'Protein', 'unitName': 'G', 'value': 3.2},
+        {'nutrientId': 1004, 'nutrientName': 'Total lipid (fat)', 'unitName': 'G', 'value': 1.0},
+    ]})
+    assert NutriInsights.get_nutrients_by_name(1, 'lipid') == {'Total lipid (fat)': {'value': 1.0, 'unit': 'G'}}
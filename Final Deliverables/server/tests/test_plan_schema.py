@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from AI.planCache import DAYS, MEALS
+from AI.planSchema import loads, parse_day, parse_meal_plan, repair_json
+
+
+def _meal(name):
+    return {'name': name, 'ingredients': 'oats, milk', 'portionSize': '1 bowl',
+            'calories': 350, 'protein': 12, 'carbs': 55, 'fat': 8}
+
+
+def test_valid_json_is_untouched():
+    assert loads('{"a": [1, 2], "b": "x, y"}') == {'a': [1, 2], 'b': 'x, y'}
+
+
+def test_trailing_commas():
+    assert loads('{"a": [1, 2,], "b": {"c": 3,},}') == {'a': [1, 2], 'b': {'c': 3}}
+    assert loads('{"a": [1, 2 ,\n ]\n,\n}') == {'a': [1, 2]}
+
+
+def test_prose_and_fences_around_the_object():
+    reply = 'Here is your plan:\n```json\n{"a": 1}\n```\nEnjoy! {"b": 2}'
+    assert loads(reply) == {'a': 1}
+
+
+def test_braces_and_commas_inside_strings():
+    assert loads('{"a": "x}, {y", "b": "say \\"hi,\\"",}') == {'a': 'x}, {y', 'b': 'say "hi,"'}
+
+
+def test_raw_newline_inside_string():
+    assert loads('{"a": "line one\nline two",}') == {'a': 'line one\nline two'}
+
+
+def test_truncated_reply_keeps_complete_members():
+    assert loads('{"a": 1, "b": {"c": 2, "d": "tru') == {'a': 1, 'b': {'c': 2}}
+    assert loads('{"a": [1, 2, 3') == {'a': [1, 2]}
+    assert repair_json('{"a": {"b": 1}, "c": [') == '{"a": {"b": 1}}'
+
+
+def test_truncated_after_a_closed_member():
+    assert loads('{"a": {"b": 1}') == {'a': {'b': 1}}
+
+
+@pytest.mark.parametrize('text', ['no json here', '{"a": "unfinished', '{"a'])
+def test_unrecoverable_replies_raise(text):
+    with pytest.raises(ValueError):
+        loads(text)
+
+
+def test_mismatched_closer_stops_the_object():
+    assert loads('{"a": [1, 2}, "b": 3}') == {'a': [1]}
+
+
+def test_truncated_week_reports_missing_slots():
+    plan = {'mealPlan': {day: {slot: _meal(f'{day} {slot}') for slot in MEALS} for day in DAYS}}
+    text = json.dumps(plan)
+    # Cut the reply inside Saturday's Dinner
+    cut = text.index('"Saturday Dinner"')
+
+    days, missing = parse_meal_plan(text[:cut])
+
+    assert missing == [('Saturday', 'Dinner'), ('Saturday', 'Snack')]
+    assert days['Saturday']['Lunch']['name'] == 'Saturday Lunch'
+    assert all(len(days[day]) == 4 for day in DAYS[:-1])
+
+
+def test_day_with_an_invalid_meal():
+    reply = json.dumps({'breakfast': _meal('Oats'), 'Lunch': {**_meal('Soup'), 'calories': 'lots'},
+                        'Dinner': {**_meal('Rice'), 'protein': '30 g'}})
+
+    meals = parse_day(reply + ' trailing words')
+
+    assert set(meals) == {'Breakfast', 'Dinner'}
+    assert meals['Dinner']['protein'] == 30
+
+
+def test_unparseable_reply_misses_everything():
+    days, missing = parse_meal_plan('Sorry, I cannot help with that.')
+
+    assert days == {day: {} for day in DAYS}
+    assert len(missing) == len(DAYS) * len(MEALS)
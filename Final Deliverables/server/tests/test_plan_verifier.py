@@ -0,0 +1,92 @@
+import pytest
+
+import NutriInsights
+from AI import planVerifier
+from AI.planCache import DAYS, MEALS
+from cache import TTLCache
+from food_index import FoodIndex
+
+OATS = {'fdcId': 1, 'description': 'Oats', 'dataType': 'Foundation'}
+
+
+def _record(fdc_id, protein, carbs, fat):
+    return {'fdcId': fdc_id, 'foodNutrients': [
+        {'nutrientId': 1008, 'nutrientName': 'Energy', 'unitName': 'KCAL',
+         'value': 4 * (protein + carbs) + 9 * fat},
+        {'nutrientId': 1003, 'nutrientName': 'Protein', 'unitName': 'G', 'value': protein},
+        {'nutrientId': 1005, 'nutrientName': 'Carbohydrate, by difference', 'unitName': 'G', 'value': carbs},
+        {'nutrientId': 1004, 'nutrientName': 'Total lipid (fat)', 'unitName': 'G', 'value': fat},
+    ]}
+
+
+RECORDS = {1: _record(1, 13, 68, 7), 2: _record(2, 3, 5, 3)}
+
+
+@pytest.fixture
+def usda(monkeypatch):
+    """Empty food index, fresh ingredient cache and a fake USDA search; returns the call log."""
+    calls = {'search': [], 'get_foods': []}
+    found = {'oats': [OATS], 'milk': [{'fdcId': 2, 'description': 'Milk', 'dataType': 'Branded'}]}
+
+    def search_food(query, page_size=5, page_number=1):
+        calls['search'].append(query)
+        if query == 'broken':
+            raise ConnectionError('USDA unreachable')
+        return {'totalHits': len(found.get(query, [])), 'foods': found.get(query, [])}
+
+    def get_foods(fdc_ids):
+        calls['get_foods'].append(list(fdc_ids))
+        return {fdc_id: RECORDS[fdc_id] for fdc_id in fdc_ids if fdc_id in RECORDS}
+
+    monkeypatch.setattr(NutriInsights, 'food_index', FoodIndex())
+    monkeypatch.setattr(NutriInsights, 'search_food', search_food)
+    monkeypatch.setattr(NutriInsights, 'get_foods', get_foods)
+    monkeypatch.setattr(planVerifier, 'ingredient_cache', TTLCache(maxsize=100, ttl=3600))
+    return calls
+
+
+def test_index_misses_fall_back_to_usda_search(usda):
+    profiles = planVerifier.resolve_ingredients(['oats', 'milk', 'unobtainium'])
+
+    assert profiles['oats'] == pytest.approx((4 * 81 + 63, 13, 68, 7))
+    assert profiles['milk'] is not None
+    assert profiles['unobtainium'] is None
+    assert sorted(usda['search']) == ['milk', 'oats', 'unobtainium']
+    assert usda['get_foods'] == [[1, 2]]
+
+
+def test_index_hits_skip_the_search(usda):
+    NutriInsights.food_index.add(OATS)
+
+    planVerifier.resolve_ingredients(['oats'])
+
+    assert usda['search'] == []
+    assert usda['get_foods'] == [[1]]
+
+
+def test_only_real_misses_are_negative_cached(usda):
+    planVerifier.resolve_ingredients(['unobtainium', 'broken'])
+    planVerifier.resolve_ingredients(['unobtainium', 'broken'])
+
+    assert usda['search'].count('unobtainium') == 1
+    assert usda['search'].count('broken') == 2
+
+
+def test_failed_food_lookup_is_not_cached(usda, monkeypatch):
+    monkeypatch.setattr(NutriInsights, 'get_foods', lambda fdc_ids: {})
+    assert planVerifier.resolve_ingredients(['oats']) == {'oats': None}
+
+    monkeypatch.setattr(NutriInsights, 'get_foods', lambda fdc_ids: {1: RECORDS[1]})
+    assert planVerifier.resolve_ingredients(['oats'])['oats'] is not None
+
+
+def test_verification_reports_unresolved_fraction(usda):
+    meal = {'name': 'Porridge', 'ingredients': 'oats, milk, unobtainium, broken', 'portionSize': '1 bowl',
+            'calories': 400, 'protein': 15, 'carbs': 60, 'fat': 10}
+    plan = {'mealPlan': {day: {slot: dict(meal) for slot in MEALS} for day in DAYS}}
+    profile = {'age': 30, 'gender': 'female', 'height': 165, 'weight': 60, 'diet_preference': 'vegetarian',
+               'goal': 'maintain', 'activity_level': 'moderate', 'allergies': ''}
+
+    plan = planVerifier.verify_meal_plan(plan, profile, mode='flag')
+
+    assert plan['verification']['ingredients'] == {'total': 4, 'resolved': 2, 'unresolved': 0.5}
@@ -0,0 +1,138 @@
+import time
+
+import pytest
+
+import shared_cache
+from cache import TTLCache
+from shared_cache import SharedCache, TieredCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.db')
+
+
+def _used_bytes(path):
+    conn = shared_cache._connect(path)
+    pages = conn.execute('PRAGMA page_count').fetchone()[0] - conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return pages * conn.execute('PRAGMA page_size').fetchone()[0]
+
+
+def test_values_are_shared_per_namespace(path):
+    SharedCache(path, 'foods').set(('food', 1), {'fdcId': 1})
+
+    assert SharedCache(path, 'foods').get(('food', 1)) == {'fdcId': 1}
+    assert SharedCache(path, 'plans').get(('food', 1)) is None
+
+
+def test_entries_expire(path):
+    cache = SharedCache(path, 'ns', ttl=300)
+    cache.set('short', 1, ttl=0.05)
+    cache.set('long', 2)
+
+    time.sleep(0.1)
+
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+    assert cache.size() == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_delete_removes_related_tuple_keys(path):
+    cache = SharedCache(path, 'ns')
+    for key in ['doc', ('doc', 'name'), ('doc', ('age', 'weight')), ('docs', 'name'), 'other']:
+        cache.set(key, key)
+
+    cache.delete('doc')
+
+    assert [cache.get(key) for key in ['doc', ('doc', 'name'), ('doc', ('age', 'weight'))]] == [None] * 3
+    assert cache.get(('docs', 'name')) == ('docs', 'name')
+    assert cache.get('other') == 'other'
+
+
+def test_evict_keeps_the_file_under_its_cap(path):
+    cache = SharedCache(path, 'ns', max_bytes=256 * 1024)
+    for i in range(300):
+        cache.set(i, 'x' * 2000)
+        time.sleep(0.0005)
+    assert _used_bytes(path) > cache.max_bytes
+
+    cache.evict()
+
+    assert _used_bytes(path) <= cache.max_bytes
+    # Least recently used entries go first
+    assert cache.get(0) is None
+    assert cache.get(299) == 'x' * 2000
+
+
+def test_evict_drops_expired_entries_first(path):
+    cache = SharedCache(path, 'ns', max_bytes=1024 * 1024)
+    cache.set('stale', 1, ttl=0.01)
+    cache.set('fresh', 2)
+    time.sleep(0.05)
+
+    cache.evict()
+
+    count = shared_cache._connect(path).execute('SELECT count(*) FROM entries').fetchone()[0]
+    assert count == 1
+    assert cache.get('fresh') == 2
+
+
+def test_writes_evict_periodically(path, monkeypatch):
+    monkeypatch.setattr(shared_cache, 'EVICT_EVERY', 50)
+    cache = SharedCache(path, 'ns', max_bytes=128 * 1024)
+
+    for i in range(400):
+        cache.set(i, 'x' * 2000)
+
+    # Never more than EVICT_EVERY writes past the cap
+    assert _used_bytes(path) <= cache.max_bytes + 50 * 2500
+
+
+def test_unusable_file_misses_instead_of_failing(tmp_path):
+    cache = SharedCache(str(tmp_path), 'ns')
+
+    cache.set('key', 1)
+
+    assert cache.get('key', default='missing') == 'missing'
+    assert cache.errors == 2
+
+
+def test_tiered_cache_fills_the_local_tier_from_the_shared_one(path):
+    writer = TieredCache(TTLCache(maxsize=10, ttl=300), SharedCache(path, 'ns', ttl=300))
+    reader = TieredCache(TTLCache(maxsize=10, ttl=300), SharedCache(path, 'ns', ttl=300))
+    writer.set('key', 'value')
+
+    assert reader.get('key') == 'value'
+    assert reader.get('key') == 'value'
+    assert 'key' in reader.local
+    stats = reader.stats()
+    assert (stats['hits'], stats['shared_hits'], stats['misses']) == (2, 1, 0)
+
+
+def test_local_ttl_bounds_how_long_a_stale_copy_is_served(path):
+    worker = TieredCache(TTLCache(maxsize=10, ttl=300), SharedCache(path, 'ns', ttl=300), local_ttl=0.05)
+    other = TieredCache(TTLCache(maxsize=10, ttl=300), SharedCache(path, 'ns', ttl=300), local_ttl=0.05)
+    worker.set('profile', 'old')
+    assert worker.get('profile') == 'old'
+
+    other.set('profile', 'new')
+    assert worker.get('profile') == 'old'
+    time.sleep(0.1)
+
+    assert worker.get('profile') == 'new'
+
+
+def test_tiered_delete_reaches_other_workers_field_masks(path):
+    # Collection.invalidate deletes the keys this worker knows; the shared tier
+    # also drops the (doc_id, fields) entries other workers cached
+    worker = TieredCache(TTLCache(maxsize=10, ttl=300), SharedCache(path, 'ns', ttl=300))
+    other = TieredCache(TTLCache(maxsize=10, ttl=300), SharedCache(path, 'ns', ttl=300))
+    worker.set('doc', {'name': 'Sam'})
+    other.set(('doc', ('streak',)), {'streak': 3})
+
+    worker.delete('doc')
+
+    assert worker.get('doc') is None
+    assert worker.get(('doc', ('streak',))) is None
+    assert other.shared.get(('doc', ('streak',))) is None
@@ -0,0 +1,256 @@
+"""HTTP client for the USDA FoodData Central API.
+
+``USDAClient`` keeps one keep-alive ``requests.Session`` per process with a
+bounded connection pool, timeouts and retries with exponential backoff on
+429/5xx. ``AsyncUSDAClient`` does the same with an ``httpx.AsyncClient`` for
+the ASGI routes. ``MicroBatcher`` collects single-food lookups that arrive within a
+few milliseconds of each other and sends them as one ``POST /foods`` call.
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# POST /foods accepts at most this many fdcIds per request
+MAX_FOODS_PER_REQUEST = 20
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_ID_SEGMENT = re.compile(r"/\d+")
+
+
+def _span_name(method, path):
+    # '/food/1750340' -> 'usda.GET /food/{id}', one series per route
+    return f"usda.{method} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+def _decode(response):
+    try:
+        return response.json()
+    except ValueError:
+        return {'error': f"USDA API returned HTTP {response.status_code}"}
+
+
+def _with_api_key(client, params):
+    if not client.api_key:
+        raise ValueError("No USDA_API_KEY found in environment variables")
+    params['api_key'] = client.api_key
+    return params
+
+
+class USDAClient:
+    def __init__(self, api_key, base_url, timeout=(3.05, 10), retries=3, backoff=0.3, pool_size=20):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        # Sessions hold sockets, so every forked worker builds its own
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    self._session = self._new_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def reset(self):
+        """Forget the parent's session after ``fork``; the next request opens a new pool."""
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _new_session(self):
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'POST']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    _params = _with_api_key
+
+    def get(self, path, **params):
+        params = self._params(params)
+        with span(_span_name('GET', path)):
+            response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        return _decode(response)
+
+    def post(self, path, payload, **params):
+        params = self._params(params)
+        with span(_span_name('POST', path)):
+            response = self.session.post(f"{self.base_url}{path}", params=params, json=payload, timeout=self.timeout)
+        return _decode(response)
+
+
+class AsyncUSDAClient:
+    """``USDAClient`` for coroutines: one ``httpx.AsyncClient`` per event loop."""
+
+    def __init__(self, api_key, base_url, timeout=(3.05, 10), retries=3, backoff=0.3, pool_size=100):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._client = None
+        self._loop = None
+
+    _params = _with_api_key
+
+    @property
+    def client(self):
+        # httpx clients are bound to the loop (and process) that created them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+            self._loop = loop
+        return self._client
+
+    async def _request(self, method, path, params, payload=None):
+        import httpx
+
+        params = self._params(params)
+        with span(_span_name(method, path)):
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await self.client.request(method, f"{self.base_url}{path}", params=params, json=payload)
+                except httpx.TransportError:
+                    if attempt == self.retries:
+                        raise
+                    delay = self.backoff * 2 ** attempt
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        break
+                    retry_after = response.headers.get('Retry-After', '')
+                    delay = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+                await asyncio.sleep(delay)
+        return _decode(response)
+
+    async def get(self, path, **params):
+        return await self._request('GET', path, params)
+
+    async def post(self, path, payload, **params):
+        return await self._request('POST', path, params, payload)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class MicroBatcher:
+    """Coalesce single-id lookups into bulk ``fetch_many(ids)`` calls.
+
+    ``fetch_many`` must return a list of food dicts carrying ``fdcId``; ids it
+    does not return resolve to a not-found error for their callers.
+    """
+
+    def __init__(self, fetch_many, window=0.005, max_batch=MAX_FOODS_PER_REQUEST, max_workers=4):
+        self.fetch_many = fetch_many
+        self.window = window
+        self.max_batch = max_batch
+        self.max_workers = max_workers
+        self.batches = 0
+        self.lookups = 0
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._pid = None
+        self._executor = None
+
+    def _start(self):
+        # Threads do not survive fork, so start them in the process that uses them
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = {}
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='usda-batch')
+            threading.Thread(target=self._run, name='usda-batcher', daemon=True).start()
+
+    def reset(self):
+        """Forget the parent's threads and queue after ``fork``; ``submit`` starts new ones."""
+        self._pid = None
+        self._executor = None
+        self._pending = {}
+        self._cond = threading.Condition()
+
+    def submit(self, fdc_id):
+        fdc_id = int(fdc_id)
+        future = Future()
+        with self._cond:
+            self._start()
+            self._pending.setdefault(fdc_id, []).append(future)
+            self.lookups += 1
+            self._cond.notify()
+        return future
+
+    def get(self, fdc_id, timeout=None):
+        return self.submit(fdc_id).result(timeout=timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            deadline = time.monotonic() + self.window
+            with self._cond:
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                ids = list(self._pending)[:self.max_batch]
+                batch = {fdc_id: self._pending.pop(fdc_id) for fdc_id in ids}
+            self.batches += 1
+            self._executor.submit(self._flush, batch)
+
+    def _flush(self, batch):
+        try:
+            foods = self.fetch_many(list(batch))
+        except Exception as e:
+            logger.error("USDA batch lookup failed: %s", e)
+            for futures in batch.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        if isinstance(foods, list):
+            found = {food.get('fdcId'): food for food in foods if isinstance(food, dict)}
+        else:
+            found = {}
+        for fdc_id, futures in batch.items():
+            if fdc_id in found:
+                result = found[fdc_id]
+            elif isinstance(foods, dict):
+                result = foods
+            else:
+                result = {'error': 'Food not found'}
+            for future in futures:
+                future.set_result(result)